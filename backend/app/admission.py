@@ -0,0 +1,158 @@
+"""
+Admission control for CPU-bound endpoints.
+Each AdmissionPool admits at most `limit` requests at once, parks up to
+`queue_size` more for at most `max_wait_ms`, and sheds the rest immediately
+(the route turns Overloaded into a 503 with Retry-After). Waiting happens
+on the event loop before the request is dispatched to the threadpool, so
+queued requests hold no AnyIO worker thread.
+The limit adapts AIMD-style: +1 per window of requests finishing under
+`target_ms`, x0.75 (at most once per window) when they run slower.
+Separate pools keep PDF rendering from starving interactive advise; the
+advise run behind a PDF counts against the advise pool.
+"""
+import os, time, asyncio, threading
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, retry_after_s: int):
+        super().__init__(f"{pool} overloaded")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+
+
+def _resolve(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AdmissionPool:
+    def __init__(self, name: str, limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 queue_size: int = 16, max_wait_ms: float = 1000.0, target_ms: float = 1500.0):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.max_wait_ms = max_wait_ms
+        self.target_ms = target_ms
+        self._limit = float(limit)
+        self._in_flight = 0
+        self._admitted = 0
+        self._shed = 0
+        self._latency_ewma = 0.0
+        self._last_decrease = 0.0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Take a slot, waiting on the event loop (not on a worker thread) while
+        the pool is full; raises Overloaded when the queue is full or the wait
+        exceeds max_wait_ms. Call before dispatching work to the threadpool.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                self._admitted += 1
+                return
+            if len(self._waiters) >= self.queue_size:
+                self._shed += 1
+                raise Overloaded(self.name, self._retry_after())
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.max_wait_ms / 1000.0)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as ex:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+                    if isinstance(ex, asyncio.TimeoutError):
+                        self._shed += 1
+            if queued:
+                if isinstance(ex, asyncio.CancelledError):
+                    raise
+                raise Overloaded(self.name, self._retry_after())
+            # granted while timing out: the slot is ours
+            if isinstance(ex, asyncio.CancelledError):
+                self._give_back()
+                raise
+
+    def _grant_waiters(self) -> None:
+        # with self._lock held: hand free slots to queued requests, oldest first
+        while self._waiters and self._in_flight < self.limit:
+            loop, fut = self._waiters.popleft()
+            self._in_flight += 1
+            self._admitted += 1
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    def _give_back(self) -> None:
+        """Return a slot that was granted but never used (no latency sample)."""
+        with self._lock:
+            self._in_flight -= 1
+            self._grant_waiters()
+
+    def release(self, latency_ms: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._latency_ewma = latency_ms if not self._latency_ewma else 0.8 * self._latency_ewma + 0.2 * latency_ms
+            if latency_ms <= self.target_ms:
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(1.0, self._limit))
+            else:
+                now = time.monotonic()
+                # one decrease per "window" (~ the time a request takes) to avoid collapsing on a burst
+                if (now - self._last_decrease) * 1000.0 >= latency_ms:
+                    self._limit = max(float(self.min_limit), self._limit * 0.75)
+                    self._last_decrease = now
+            self._grant_waiters()
+
+    def _retry_after(self) -> int:
+        # rough time for the queue ahead to drain, at least 1 s
+        per_req = (self._latency_ewma or self.target_ms) / 1000.0
+        return max(1, int(round(per_req * (len(self._waiters) + 1) / max(1, self.limit))))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "queue_size": self.queue_size,
+                "admitted": self._admitted,
+                "shed": self._shed,
+                "latency_ewma_ms": round(self._latency_ewma, 1),
+            }
+
+
+def _pool_from_env(name: str, prefix: str, **defaults) -> AdmissionPool:
+    def env(key, cast, default):
+        return cast(os.getenv(f"{prefix}_{key}", default))
+    return AdmissionPool(
+        name,
+        limit=env("LIMIT", int, defaults.get("limit", 4)),
+        min_limit=env("MIN_LIMIT", int, defaults.get("min_limit", 1)),
+        max_limit=env("MAX_LIMIT", int, defaults.get("max_limit", 32)),
+        queue_size=env("QUEUE", int, defaults.get("queue_size", 16)),
+        max_wait_ms=env("MAX_WAIT_MS", float, defaults.get("max_wait_ms", 1000)),
+        target_ms=env("TARGET_MS", float, defaults.get("target_ms", 1500)),
+    )
+
+
+ADVISE_POOL = _pool_from_env("advise", "ADVISE_ADMIT", limit=4, max_limit=32, queue_size=16, target_ms=1500)
+PDF_POOL = _pool_from_env("pdf", "PDF_ADMIT", limit=2, max_limit=4, queue_size=4, max_wait_ms=2000, target_ms=3000)
+
+POOLS = {p.name: p for p in (ADVISE_POOL, PDF_POOL)}
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: p.metrics() for name, p in POOLS.items()}
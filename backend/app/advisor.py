@@ -1,22 +1,39 @@
+import os, time
 from typing import List, Dict, Tuple, Any
-from .retrieval import hybrid, rerank, bootstrap_courses
-from .store import get_jd
-from . import store
-
-
-def _norm(s: str) -> str:
-    return "".join(ch.lower() for ch in (s or "") if ch.isalnum())
-
-def compute_gaps(user_skills: List[str], goal_role: str) -> Tuple[List[str], Dict[str, int]]:
-    """
-    Build the missing skills list and a display-friendly gap map using the JD.
-    If no JD exists for the requested role, return empty gaps.
-    """
-    jd = get_jd(goal_role)
-    if not jd:
-        return [], {}
-
-    have = {_norm(s) for s in (user_skills or [])}
+from .retrieval import bm25_scores, vector_candidates, rerank, bootstrap_courses
+from .store import get_jd, resolve_role
+from .deadline import Deadline, CircuitBreaker, StageTimeout, run_with_timeout, breaker_for
+from .observability import logger
+from . import store, planner, skills, scoring
+
+ADVISE_DEADLINE_MS = float(os.getenv("ADVISE_DEADLINE_MS", "2000"))
+VECTOR_BUDGET_MS = float(os.getenv("VECTOR_BUDGET_MS", "600"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "900"))
+RERANK_MIN_MS = float(os.getenv("RERANK_MIN_MS", "150"))   # don't start a rerank with less than this left
+
+# Retrieval knobs; advise(params=...) overrides them per call (see notebooks/param_sweep.py)
+RETRIEVAL_PARAMS: Dict[str, float] = {
+    "k": 20,              # fused candidates
+    "w_bm25": 0.5,
+    "w_vec": 0.5,
+    "rerank_k": 10,       # cross-encoder depth
+    "level_step": 0.25,   # level-bias penalty per difficulty step
+    "level_cap": 0.60,    # max level-bias penalty
+}
+
+_vector_breaker = CircuitBreaker(
+    "vector",
+    max_failures=int(os.getenv("VECTOR_BREAKER_FAILURES", "3")),
+    cooldown_s=float(os.getenv("VECTOR_BREAKER_COOLDOWN_S", "30")),
+)
+
+
+def _canon(s: str) -> str:
+    return skills.canonical(s)
+
+def _jd_needs(jd) -> Tuple[List[Tuple[str, int]], Dict[str, str]]:
+    """(canonical skill, level) per JD requirement in JD order, and canonical -> JD label."""
+    taxonomy = skills.index()
 
     # Normalize skills_required into a list of {"skill": str, "level": int}
     if hasattr(jd, "skills_required"):
@@ -31,42 +48,75 @@ def compute_gaps(user_skills: List[str], goal_role: str) -> Tuple[List[str], Dic
             if x.get("skill")
         ]
 
-    need_pairs = [(_norm(x["skill"]), x["level"]) for x in skills_required]
-    missing_norm = [s for s, _ in need_pairs if s not in have]
+    need_pairs = [(taxonomy.resolve(x["skill"]), x["level"]) for x in skills_required]
+    label_map = { taxonomy.resolve(x["skill"]): x["skill"] for x in skills_required }
+    return need_pairs, label_map
 
-    label_map = { _norm(x["skill"]): x["skill"] for x in skills_required }
+def _gaps_for(need_pairs: List[Tuple[str, int]], label_map: Dict[str, str],
+              user_skills: List[str]) -> Tuple[List[str], Dict[str, int]]:
+    taxonomy = skills.index()
+    have = {taxonomy.resolve(s) for s in (user_skills or [])}
+    missing_norm = [s for s, _ in need_pairs if s not in have]
     gap_map = { label_map[s]: 1 for s in missing_norm }
     return missing_norm, gap_map
 
+def compute_gaps(user_skills: List[str], goal_role: str) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Build the missing skills list and a display-friendly gap map using the JD.
+    If no JD exists for the requested role, return empty gaps.
+    """
+    jd = get_jd(goal_role)
+    if not jd:
+        return [], {}
+    need_pairs, label_map = _jd_needs(jd)
+    return _gaps_for(need_pairs, label_map, user_skills)
+
+def split_skills(user_skills: List[str], goal_role: str) -> Tuple[List[str], List[str]]:
+    """
+    (JD labels of the held JD skills, in JD order; the other skills as given).
+    The first part is what the profile looks like to the JD: "js" and
+    "JavaScript" both read as the JD's label, once.
+    """
+    jd = get_jd(goal_role)
+    if not jd:
+        return [], list(user_skills or [])
+    need_pairs, label_map = _jd_needs(jd)
+    return _split_for(need_pairs, label_map, user_skills)
+
+def _split_for(need_pairs: List[Tuple[str, int]], label_map: Dict[str, str],
+               user_skills: List[str]) -> Tuple[List[str], List[str]]:
+    taxonomy = skills.index()
+    have = {taxonomy.resolve(s) for s in (user_skills or [])}
+    held = [label_map[s] for s in dict.fromkeys(s for s, _ in need_pairs) if s in have]
+    other = [s for s in (user_skills or []) if taxonomy.resolve(s) not in label_map]
+    return held, other
+
+def edit_skills(user_skills: List[str], add: List[str], remove: List[str]) -> List[str]:
+    """user_skills without `remove` and with `add`, compared by canonical skill ("k8s" removes "Kubernetes")."""
+    taxonomy = skills.index()
+    drop = {taxonomy.resolve(s) for s in (remove or [])}
+    out = [s for s in (user_skills or []) if taxonomy.resolve(s) not in drop]
+    have = {taxonomy.resolve(s) for s in out}
+    for s in add or []:
+        n = taxonomy.resolve(s)
+        if n not in have:
+            have.add(n)
+            out.append(s)
+    return out
+
 def _citations_for_course(idx: int, missing_norm: List[str]) -> List[Dict[str, Any]]:
     c = store.COURSES[idx].model_dump() if hasattr(store.COURSES[idx], "model_dump") else store.COURSES[idx].dict()
     spans = []
     mset = set(missing_norm or [])
     for s in (c.get("skills", []) or []) + (c.get("outcomes", []) or []):
-        if _norm(s) in mset:
+        if _canon(s) in mset:
             spans.append({"source_id": c.get("course_id"), "span": s, "score": 1.0})
     if not spans:
         spans.append({"source_id": c.get("course_id"), "span": c.get("title"), "score": 0.5})
     return spans
 
-_DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
-
 def _difficulty_of_idx(idx: int) -> str:
-    c = store.COURSES[idx].model_dump() if hasattr(store.COURSES[idx], "model_dump") else store.COURSES[idx].dict()
-    return str(c.get("difficulty", "intermediate")).lower().strip()
-
-def bias_by_level(ranked: List[Tuple[int, float]], target_level: str) -> List[Tuple[int, float]]:
-    """
-    Apply a bias penalty so irrelevant levels get pushed down.
-    Stronger penalty: 25% per step away (cap 60%).
-    """
-    out = []
-    for idx, score in ranked:
-        d = _difficulty_of_idx(idx)
-        dist = abs(_DIFFICULTY_RANK.get(d, 1) - _DIFFICULTY_RANK.get(target_level, 1))
-        penalty = min(0.60, 0.25 * dist)
-        out.append((idx, score * (1.0 - penalty)))
-    return sorted(out, key=lambda kv: kv[1], reverse=True)
+    return scoring.arrays().difficulty[idx]
 
 def choose_three_ordered(ranked_idxs: List[int], missing_norm: List[str], level: str) -> List[Dict]:
     """
@@ -108,10 +158,10 @@ def choose_three_ordered(ranked_idxs: List[int], missing_norm: List[str], level:
                 continue
 
             c = store.COURSES[idx].model_dump() if hasattr(store.COURSES[idx], "model_dump") else store.COURSES[idx].dict()
-            cskills = {_norm(s) for s in (c.get("skills") or [])}
+            cskills = {_canon(s) for s in (c.get("skills") or [])}
             hit = sorted(list((cskills & mset) - covered))
             why = f"Covers missing JD skills: {', '.join(hit)}" if hit else "High overall relevance"
-            extras = hit if hit else [s for s in (c.get("skills") or []) if _norm(s) not in covered][:4]
+            extras = hit if hit else [s for s in (c.get("skills") or []) if _canon(s) not in covered][:4]
 
             picked.append(build_item(idx, why, extras))
             seen.add(idx)
@@ -119,21 +169,44 @@ def choose_three_ordered(ranked_idxs: List[int], missing_norm: List[str], level:
 
     return picked[:3]
 
+def plan_from_optimizer(result: Dict, missing_norm: List[str]) -> List[Dict]:
+    """Plan items for planner.optimize() output, in schedule order."""
+    mset = set(missing_norm or [])
+    covered = set()
+    items = []
+    for pos, idx in enumerate(result["courses"]):
+        c = store.COURSES[idx]
+        hit = sorted({_canon(s) for s in (c.skills or [])} & mset - covered)
+        if hit:
+            why = f"Covers missing JD skills: {', '.join(hit)}"
+        else:
+            later = [store.COURSES[j].title for j in result["courses"][pos + 1:]
+                     if idx in planner.graph().closure(j)]
+            why = f"Prerequisite for {later[0]}" if later else "High overall relevance"
+        covered |= set(hit)
+        items.append({
+            "course_id": c.course_id,
+            "title": c.title,
+            "difficulty": c.difficulty,
+            "why": why,
+            "citations": _citations_for_course(idx, missing_norm),
+            "covered_skills": hit,
+        })
+    return items
+
 def estimate_timeline(plan_items: List[Dict]) -> int:
-    id2c = {c.course_id: c for c in store.COURSES}
-    return sum((id2c[p["course_id"]].duration_weeks if p["course_id"] in id2c else 3) for p in plan_items)
+    return sum(getattr(store.get_course(p["course_id"]), "duration_weeks", 3) for p in plan_items)
 
 def build_structured_timeline(plan_items: List[Dict]) -> List[Dict]:
     """
     Produce [{course_id, title, difficulty, weeks, start_week, end_week}]
     based on the order of plan_items and durations in store.COURSES.
     """
-    id2c = {c.course_id: c for c in store.COURSES}
     week_ptr = 1
     schedule = []
     for p in plan_items:
         cid = p["course_id"]
-        weeks = getattr(id2c.get(cid, None), "duration_weeks", 3)
+        weeks = getattr(store.get_course(cid), "duration_weeks", 3)
         start = week_ptr
         end = week_ptr + weeks - 1
         week_ptr = end + 1
@@ -147,20 +220,141 @@ def build_structured_timeline(plan_items: List[Dict]) -> List[Dict]:
         })
     return schedule
 
+def retrieve_and_rank(q: str, level: str, k: int, deadline: Deadline, rerank_k: int = 10,
+                      w_bm25: float = 0.5, w_vec: float = 0.5, level_step: float = 0.25,
+                      level_cap: float = 0.60, cross_encoder: str = None, on_candidates=None,
+                      fusion: str = None) -> Tuple[List[Tuple[int, float]], List[int], Dict[str, Any]]:
+    """
+    BM25 → vector → fuse → level bias → rerank, each stage inside its slice of
+    the request deadline. BM25 scores the whole catalog; fusion and level bias
+    run over it as arrays (scoring.rank_catalog) and keep the top k.
+    A stage that fails or runs out of budget degrades:
+      - vector search: skipped (BM25 only); repeated timeouts open the breaker
+      - rerank: skipped (hybrid order)
+    cross_encoder: rerank with this model instead of CROSS_ENCODER.
+    fusion: a scoring.FUSIONS method instead of FUSION_METHOD ("weighted" | "rrf").
+    on_candidates(candidates): called with the fused, level-biased list before reranking.
+    Returns (candidates, ranked_idxs, {"stages_ms": ..., "degraded": [...]}).
+    """
+    vector_breaker = breaker_for(_vector_breaker)
+    stages: Dict[str, int] = {}
+    degraded: List[str] = []
+
+    t = time.perf_counter()
+    bm = bm25_scores(q)
+    stages["bm25"] = int((time.perf_counter() - t) * 1000)
+
+    vc: List[Tuple[int, float]] = []
+    t = time.perf_counter()
+    if not vector_breaker.allow():
+        degraded.append("vector_breaker_open")
+    else:
+        try:
+            vc = run_with_timeout(vector_candidates, deadline.slice_ms(VECTOR_BUDGET_MS), q,
+                                  max(k, scoring.VECTOR_DEPTH), level=level)
+            vector_breaker.record_success()
+        except StageTimeout:
+            vector_breaker.record_failure()
+            degraded.append("vector_timeout")
+        except Exception as ex:
+            vector_breaker.record_failure()
+            degraded.append("vector_error")
+            logger.warning("vector_candidates failed", error=repr(ex))
+    stages["vector"] = int((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    candidates = scoring.rank_catalog(bm, vc, level, k, w_bm25, w_vec, level_step, level_cap, method=fusion)
+    stages["fuse"] = int((time.perf_counter() - t) * 1000)
+    if on_candidates is not None:
+        on_candidates(candidates)
+
+    t = time.perf_counter()
+    budget = deadline.slice_ms(RERANK_BUDGET_MS)
+    ranked_idxs = None
+    if budget < RERANK_MIN_MS:
+        degraded.append("rerank_skipped")
+    else:
+        try:
+            ranked_idxs = run_with_timeout(rerank, budget, q, candidates, k=rerank_k, model=cross_encoder)
+        except StageTimeout:
+            degraded.append("rerank_timeout")
+        except Exception as ex:
+            degraded.append("rerank_error")
+            logger.warning("rerank failed", error=repr(ex))
+    if ranked_idxs is None:
+        ranked_idxs = [i for i, _ in candidates[:rerank_k]]
+    stages["rerank"] = int((time.perf_counter() - t) * 1000)
+
+    return candidates, ranked_idxs, {"stages_ms": stages, "degraded": degraded}
+
 def make_query(profile_skills: List[str], goal_role: str, missing: List[str]) -> str:
     return f"Goal:{goal_role}. Missing:{', '.join(missing)}. User:{', '.join(profile_skills)}"
 
-def advise(user_skills: List[str], level: str, goal_role: str, k: int = 20) -> Dict:
+def _plan_items_out(plan_items: List[Dict]) -> List[Dict]:
+    return [
+        {
+            "course_id": p["course_id"],
+            "why": p["why"],
+            "citations": p["citations"],
+            "difficulty": p.get("difficulty", "intermediate")
+        } for p in plan_items
+    ]
+
+def build_plan(missing_norm: List[str], user_skills: List[str], level: str, prefs: Dict,
+               ranked_idxs: List[int]) -> Tuple[List[Dict], int, List[Dict], Dict]:
+    """
+    Cheapest prerequisite-respecting set of courses closing the gap; ranked
+    courses win ties. Nothing to close → 3 most relevant courses.
+    Returns (plan_items, total_weeks, schedule, optimizer result or None).
+    """
+    opt = planner.optimize(
+        missing_norm, user_skills, level,
+        max_weeks=prefs.get("max_weeks"),
+        parallel_tracks=prefs.get("parallel_tracks", 1),
+        preferred=ranked_idxs,
+    ) if missing_norm else None
+    if opt and opt["courses"]:
+        plan_items = plan_from_optimizer(opt, missing_norm)
+        total_weeks = opt["weeks"]
+        schedule = [{k_: v for k_, v in e.items() if k_ != "idx"} for e in opt["schedule"]]
+    else:
+        plan_items = choose_three_ordered(ranked_idxs, missing_norm, level)
+        total_weeks = estimate_timeline(plan_items)
+        schedule = build_structured_timeline(plan_items)
+    return plan_items, total_weeks, schedule, opt
+
+def advise(user_skills: List[str], level: str, goal_role: str, k: int = 20,
+           deadline_ms: float = None, prefs: Dict = None, params: Dict = None,
+           on_event=None, state: Dict = None) -> Dict:
     """
     Main planner:
       - If JD not found: stop early.
-      - Else: hybrid retrieve → level bias → rerank → ordered chooser
+      - Else: hybrid retrieve → level bias → rerank → plan optimizer
+        (planner.optimize; the ordered chooser when there is no gap to close)
         → structured timeline (weeks + per-course schedule).
+    prefs: optional {"max_weeks": int, "parallel_tracks": int}.
+    params: overrides for RETRIEVAL_PARAMS (a "k" here wins over the k argument),
+            plus an optional "cross_encoder" model name for the rerank stage and
+            an optional "fusion" method ("weighted" | "rrf").
+    Retrieval runs against a deadline (ADVISE_DEADLINE_MS by default) and
+    degrades instead of stalling; degradations are listed in usage.
+    on_event(name, data): progress for streaming clients, in order
+      "gaps" {gap_map, role_match}, "provisional" {plan, timeline} (plan from
+      the hybrid order, before reranking), "plan" {plan, timeline, notes}.
+    The return value is the same with or without on_event.
+    state: if given, filled with what replan() needs to answer a skill delta
+      for this profile without retrieval (left empty when no JD matches).
     """
+    prefs = prefs or {}
+    p = {**RETRIEVAL_PARAMS, "k": k, **(params or {})}
+    deadline = Deadline(deadline_ms if deadline_ms is not None else ADVISE_DEADLINE_MS)
     bootstrap_courses()
 
-    jd_obj = get_jd(goal_role)
+    jd_obj, role_confidence = resolve_role(goal_role)
+    role_match = {"role": jd_obj.role if jd_obj else None, "confidence": role_confidence}
     if jd_obj is None:
+        if on_event is not None:
+            on_event("gaps", {"gap_map": {}, "role_match": role_match})
         return {
             "plan": [],
             "gap_map": {},
@@ -169,26 +363,68 @@ def advise(user_skills: List[str], level: str, goal_role: str, k: int = 20) -> D
             "usage": {
                 "retrieval": {"candidates": 0, "reranked": 0},
                 "models": {"embed": "all-MiniLM-L6-v2", "cross_encoder": "ms-marco-MiniLM-L-6-v2"},
-                "jd_found": False
+                "jd_found": False,
+                "role_match": role_match
             }
         }
 
-    missing_norm, gap_map = compute_gaps(user_skills, goal_role)
-    q = make_query(user_skills, goal_role, missing_norm)
-
-    # Retrieve + bias + rerank
-    candidates = hybrid(q, k)                 
-    candidates = bias_by_level(candidates, level)
-    ranked_idxs = rerank(q, candidates, k=10) 
+    need_pairs, label_map = _jd_needs(jd_obj)
+    missing_norm, gap_map = _gaps_for(need_pairs, label_map, user_skills)
+    if on_event is not None:
+        on_event("gaps", {"gap_map": gap_map, "role_match": role_match})
+    # held JD skills by their JD label and the role as the JD names it, so the query
+    # (and so the result) is the same however the profile spells them; plan_table
+    # relies on this
+    held, other = _split_for(need_pairs, label_map, user_skills)
+    q = make_query(held + other, jd_obj.role, missing_norm)
+
+    def provisional(candidates):
+        # what the plan would be if reranking were skipped
+        items, weeks, sched, _ = build_plan(missing_norm, user_skills, level, prefs,
+                                            [i for i, _ in candidates[:int(p["rerank_k"])]])
+        on_event("provisional", {"plan": _plan_items_out(items),
+                                 "timeline": {"weeks": weeks, "schedule": sched}})
+
+    # Retrieve + bias + rerank (deadline-aware)
+    candidates, ranked_idxs, stage_info = retrieve_and_rank(
+        q, level, int(p["k"]), deadline, rerank_k=int(p["rerank_k"]),
+        w_bm25=p["w_bm25"], w_vec=p["w_vec"], level_step=p["level_step"], level_cap=p["level_cap"],
+        cross_encoder=p.get("cross_encoder"), fusion=p.get("fusion"),
+        on_candidates=provisional if on_event is not None else None,
+    )
+
+    t = time.perf_counter()
+    plan_items, total_weeks, schedule, opt = build_plan(missing_norm, user_skills, level, prefs, ranked_idxs)
+    stage_info["stages_ms"]["plan"] = int((time.perf_counter() - t) * 1000)
 
-    # Choose 3 respecting (1) gaps first and (2) chosen level order
-    plan_items = choose_three_ordered(ranked_idxs, missing_norm, level)
-
-    # Timeline: total weeks + structured per-course schedule
-    total_weeks = estimate_timeline(plan_items)
-    schedule = build_structured_timeline(plan_items)
-
-    # Notes
+    usage = {
+        "retrieval": {"candidates": len(candidates), "reranked": len(ranked_idxs)},
+        "models": _models_usage(p),
+        "jd_found": True,
+        "role_match": role_match,
+        "stages_ms": stage_info["stages_ms"],
+        "degraded": stage_info["degraded"],
+        "deadline_ms": int(deadline.budget_ms),
+    }
+    out = _assemble(plan_items, total_weeks, schedule, opt, missing_norm, level, gap_map, usage)
+    if state is not None:
+        state.update(
+            skills=list(user_skills), level=level, goal_role=goal_role, prefs=dict(prefs), params=p,
+            role_match=role_match, need=need_pairs, labels=label_map, missing=missing_norm,
+            candidates=candidates, ranked=ranked_idxs, degraded=list(stage_info["degraded"]),
+            version=store.CATALOG_VERSION,
+        )
+    if on_event is not None:
+        on_event("plan", {k_: out[k_] for k_ in ("plan", "timeline", "notes")})
+    return out
+
+def _models_usage(p: Dict) -> Dict[str, str]:
+    return {"embed": "all-MiniLM-L6-v2",
+            "cross_encoder": (p.get("cross_encoder") or "ms-marco-MiniLM-L-6-v2").rsplit("/", 1)[-1]}
+
+def _assemble(plan_items: List[Dict], total_weeks: int, schedule: List[Dict], opt: Dict,
+              missing_norm: List[str], level: str, gap_map: Dict[str, int], usage: Dict) -> Dict:
+    """The advise() response for a built plan: notes, planner usage, output shape."""
     notes = []
     if level == "beginner":
         notes.append("Starting from fundamentals; courses are biased to beginner tracks.")
@@ -197,26 +433,23 @@ def advise(user_skills: List[str], level: str, goal_role: str, k: int = 20) -> D
     else:
         notes.append("Geared to advanced topics and performance/architecture.")
 
-    if missing_norm:
+    if opt and opt.get("off_level"):
+        notes.append(f"No {level} course teaches {', '.join(opt['off_level'])}; the closest level is used.")
+    if opt and opt["uncovered"]:
+        notes.append(f"Not covered by this plan: {', '.join(opt['uncovered'])}.")
+    if opt and opt["courses"]:
+        notes.append("Plan covers missing JD skills in the fewest weeks, prerequisites first.")
+    elif missing_norm:
         notes.append("Plan prioritizes missing JD skills; later courses add breadth.")
     else:
         notes.append("You already cover most JD skills; plan builds tooling and depth.")
 
-    usage = {
-        "retrieval": {"candidates": len(candidates), "reranked": len(ranked_idxs)},
-        "models": {"embed": "all-MiniLM-L6-v2", "cross_encoder": "ms-marco-MiniLM-L-6-v2"},
-        "jd_found": True
-    }
+    if opt:
+        usage["planner"] = {k_: opt[k_] for k_ in ("objective", "optimal", "tracks", "covered", "uncovered",
+                                                  "off_level", "elapsed_ms")}
 
     return {
-        "plan": [
-            {
-                "course_id": p["course_id"],
-                "why": p["why"],
-                "citations": p["citations"],
-                "difficulty": p.get("difficulty", "intermediate")
-            } for p in plan_items
-        ],
+        "plan": _plan_items_out(plan_items),
         "gap_map": gap_map,
         "timeline": {
             "weeks": total_weeks,
@@ -224,4 +457,72 @@ def advise(user_skills: List[str], level: str, goal_role: str, k: int = 20) -> D
         },
         "notes": " ".join(notes),
         "usage": usage
-    }
\ No newline at end of file
+    }
+
+def _course_skills(idx: int) -> set:
+    return {_canon(s) for s in (store.COURSES[idx].skills or [])}
+
+def replan(state: Dict, add: List[str], remove: List[str], new_state: Dict = None) -> Dict:
+    """
+    advise() for the profile in `state` (filled by advise(state=...)) with
+    skills added / removed, reusing that run's retrieval:
+      - gaps: the JD needs in `state` minus the new skills (no role lookup);
+      - the candidate pool and rerank order are kept; only candidates that
+        teach a skill which is no longer missing are re-scored (by their
+        remaining gap coverage), and those that now cover none move behind
+        the rest;
+      - build_plan runs as usual on the new missing set.
+    Returns None when the previous pool can't answer the new profile: no
+    candidates were kept (plan-table hit) or the missing set grew (a removed
+    skill needs courses the old query didn't look for). Callers then run advise().
+    new_state: filled like advise(state=...), so deltas can be chained.
+    """
+    t0 = time.perf_counter()
+    candidates = state.get("candidates")
+    if not candidates:
+        return None
+    user_skills = edit_skills(state["skills"], add, remove)
+    missing_norm, gap_map = _gaps_for(state["need"], state["labels"], user_skills)
+    mset, old_mset = set(missing_norm), set(state["missing"])
+    if mset - old_mset:
+        return None
+    dropped = old_mset - mset
+    p, level, prefs = state["params"], state["level"], state["prefs"]
+
+    # only courses teaching a now-held skill change coverage
+    demoted = set()
+    rescored: List[Tuple[int, float]] = []
+    n_rescored = 0
+    for idx, score in candidates:
+        cskills = _course_skills(idx) if dropped else ()
+        if cskills and cskills & dropped:
+            n_rescored += 1
+            now, before = len(cskills & mset), len(cskills & old_mset)
+            score *= (1.0 + now) / (1.0 + before)
+            if not now:
+                demoted.add(idx)
+        rescored.append((idx, score))
+    rescored.sort(key=lambda kv: kv[1], reverse=True)
+
+    # reranked order first, then the rest of the pool; demoted courses last
+    seen = set(state["ranked"])
+    ranked = state["ranked"] + [i for i, _ in rescored if i not in seen]
+    ranked.sort(key=lambda i: i in demoted)
+    ranked_idxs = ranked[:int(p["rerank_k"])]
+
+    plan_items, total_weeks, schedule, opt = build_plan(missing_norm, user_skills, level, prefs, ranked_idxs)
+    elapsed = int((time.perf_counter() - t0) * 1000)
+    usage = {
+        "retrieval": {"candidates": len(rescored), "reranked": len(ranked_idxs)},
+        "models": _models_usage(p),
+        "jd_found": True,
+        "role_match": state["role_match"],
+        "stages_ms": {"plan": elapsed},
+        "degraded": list(state.get("degraded") or []),
+        "delta": {"mode": "incremental", "added": len(add or []), "removed": len(remove or []),
+                  "rescored": n_rescored},
+    }
+    out = _assemble(plan_items, total_weeks, schedule, opt, missing_norm, level, gap_map, usage)
+    if new_state is not None:
+        new_state.update(state, skills=user_skills, missing=missing_norm, candidates=rescored, ranked=ranked_idxs)
+    return out
@@ -0,0 +1,217 @@
+"""
+Approximate nearest-neighbour index for course embeddings (CPU only).
+- IVF: a k-means coarse quantizer splits the vectors into `nlist` inverted lists;
+  a query scans only the `nprobe` lists whose centroids are closest.
+- Vectors are L2-normalized (inner product == cosine) and stored as
+  float32, float16 or int8 (per-vector symmetric scale).
+- `updated` assigns new or changed vectors to the existing centroids and
+  drops removed ids without re-running k-means, so one edited course costs
+  one embedding; callers retrain (build) once enough rows were assigned so.
+- `exact_search` / `recall_at_k` measure the recall/latency trade-off against
+  brute force, so nprobe can be tuned per deployment.
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _kmeans(x: np.ndarray, nlist: int, iters: int, seed: int) -> np.ndarray:
+    """Spherical k-means on normalized rows; returns (nlist, d) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = x[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:                       # re-seed empty clusters
+                centroids[c] = x[rng.integers(len(x))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, nlist: int = 64, nprobe: int = 8, quantization: str = "int8"):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.ids: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None   # (nlist + 1,) into the sorted rows
+        self.rows: Optional[np.ndarray] = None           # row -> position in self.ids
+        self.codes: Optional[np.ndarray] = None          # quantized vectors, list-contiguous
+        self.scales: Optional[np.ndarray] = None         # int8 only
+        self.tag = ""                                    # caller-defined, e.g. catalog fingerprint
+        self.hashes: Dict[str, str] = {}                 # caller-defined content hash per id, saved
+        self.untrained = 0                               # rows assigned by updated() since build()
+        self.version = None                              # caller-defined, not saved: e.g. catalog version
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ---------- build ----------
+    def build(self, vectors: np.ndarray, ids: Sequence[str], iters: int = 10, seed: int = 0) -> "IVFIndex":
+        x = _normalize(vectors)
+        if len(x) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+        self.ids = list(ids)
+        self.nlist = max(1, min(self.nlist, len(x)))
+        self.centroids = _kmeans(x, self.nlist, iters, seed) if len(x) else np.zeros((0, x.shape[-1]), np.float32)
+        assign = np.argmax(x @ self.centroids.T, axis=1) if len(x) else np.zeros(0, np.int64)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.rows = order.astype(np.int64)
+        self.codes, self.scales = self._encode(x[order])
+        self.untrained = 0
+        return self
+
+    def _encode(self, x: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.quantization == "float32":
+            return x, None
+        if self.quantization == "float16":
+            return x.astype(np.float16), None
+        scale = np.abs(x).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        return np.round(x / scale[:, None]).astype(np.int8), scale.astype(np.float32)
+
+    def updated(self, vectors: np.ndarray, ids: Sequence[str], removed: Sequence[str] = ()) -> "IVFIndex":
+        """
+        A copy with `ids` (new or changed) assigned to the nearest existing
+        centroid and `removed` dropped; self is left as is, so it can keep
+        serving until the copy is published. Needs a built, non-empty index.
+        """
+        drop = set(ids) | set(removed)
+        lists = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        keep = np.fromiter((self.ids[p] not in drop for p in self.rows), dtype=bool, count=len(self.rows))
+        x = _normalize(vectors).reshape(len(ids), self.centroids.shape[1])
+        codes, scales = self._encode(x)
+        assign = np.concatenate([lists[keep], np.argmax(x @ self.centroids.T, axis=1)]) if len(ids) else lists[keep]
+        order = np.argsort(assign, kind="stable")
+
+        out = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, quantization=self.quantization)
+        out.centroids = self.centroids
+        out.ids = [self.ids[p] for p in self.rows[keep]] + list(ids)
+        out.rows = order.astype(np.int64)
+        out.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))]).astype(np.int64)
+        out.codes = np.concatenate([self.codes[keep], codes])[order]
+        out.scales = np.concatenate([self.scales[keep], scales])[order] if scales is not None else None
+        out.tag, out.hashes = self.tag, dict(self.hashes)
+        out.untrained = self.untrained + len(ids) + len(removed)
+        return out
+
+    def _scores(self, q: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        s = self.codes[lo:hi].astype(np.float32) @ q
+        if self.scales is not None:
+            s *= self.scales[lo:hi]
+        return s
+
+    # ---------- query ----------
+    def search(self, query: np.ndarray, k: int = 20, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k (id, cosine) over the `nprobe` closest inverted lists."""
+        if not self.ids:
+            return []
+        q = _normalize(query).reshape(-1)
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        coarse = self.centroids @ q
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        rows, scores = [], []
+        for c in probe:
+            lo, hi = int(self.list_offsets[c]), int(self.list_offsets[c + 1])
+            if hi > lo:
+                rows.append(self.rows[lo:hi])
+                scores.append(self._scores(q, lo, hi))
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    # ---------- persistence ----------
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            ids=np.array(self.ids, dtype=object),
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            rows=self.rows,
+            codes=self.codes,
+            scales=self.scales if self.scales is not None else np.zeros(0, np.float32),
+            meta=np.array([self.nlist, self.nprobe, QUANTIZATIONS.index(self.quantization)]),
+            tag=np.array(self.tag),
+            hashes=np.array([self.hashes.get(i, "") for i in self.ids], dtype=object),
+            untrained=np.array(self.untrained),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        z = np.load(path, allow_pickle=True)
+        nlist, nprobe, quant = (int(v) for v in z["meta"])
+        idx = cls(nlist=nlist, nprobe=nprobe, quantization=QUANTIZATIONS[quant])
+        idx.ids = [str(i) for i in z["ids"]]
+        idx.centroids = z["centroids"]
+        idx.list_offsets = z["list_offsets"]
+        idx.rows = z["rows"]
+        idx.codes = z["codes"]
+        idx.scales = z["scales"] if idx.quantization == "int8" else None
+        idx.tag = str(z["tag"])
+        if "hashes" in z.files:
+            idx.hashes = {i: str(h) for i, h in zip(idx.ids, z["hashes"]) if h}
+            idx.untrained = int(z["untrained"])
+        return idx
+
+
+def exact_search(vectors: np.ndarray, ids: Sequence[str], query: np.ndarray, k: int = 20) -> List[Tuple[str, float]]:
+    """Brute-force cosine top-k; the ground truth for recall."""
+    x = _normalize(vectors)
+    s = x @ _normalize(query).reshape(-1)
+    k = min(k, len(s))
+    top = np.argpartition(-s, k - 1)[:k]
+    top = top[np.argsort(-s[top])]
+    return [(ids[i], float(s[i])) for i in top]
+
+
+def recall_at_k(index: IVFIndex, vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict[str, float]]:
+    """
+    For each nprobe: mean recall@k of index.search vs exact_search and
+    mean per-query latency of both, one row per setting.
+    """
+    ids = index.ids
+    vectors = _normalize(vectors)
+    truth, exact_ms = [], 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        truth.append({i for i, _ in exact_search(vectors, ids, q, k)})
+        exact_ms += (time.perf_counter() - t0) * 1000
+    rows = []
+    for nprobe in nprobes:
+        hits, ann_ms = 0, 0.0
+        for q, gt in zip(queries, truth):
+            t0 = time.perf_counter()
+            got = index.search(q, k=k, nprobe=nprobe)
+            ann_ms += (time.perf_counter() - t0) * 1000
+            hits += len(gt & {i for i, _ in got})
+        n = max(1, len(queries))
+        rows.append({
+            "nprobe": nprobe,
+            f"recall@{k}": hits / max(1, sum(len(g) for g in truth)),
+            "ann_ms": ann_ms / n,
+            "exact_ms": exact_ms / n,
+        })
+    return rows
@@ -0,0 +1,91 @@
+import os, hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from .. import diagnostics, shadow, jd_ingest
+from ..models import JDIngestRequest
+from ..diagnostics import DiagnosticsError
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are off without ADMIN_TOKEN and need a matching X-Admin-Token header."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(403, "Admin token required")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+def _call(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except DiagnosticsError as ex:
+        raise HTTPException(ex.status_code, str(ex))
+
+
+@router.get("/memory")
+def memory():
+    """RSS plus per-component estimates: tenant catalogs/indexes, caches, models, PDF temp files."""
+    return diagnostics.memory_report()
+
+
+@router.post("/tracemalloc/start")
+def tracemalloc_start(frames: int = diagnostics.DIAG_TRACE_FRAMES):
+    return diagnostics.start_tracing(frames)
+
+
+@router.post("/tracemalloc/stop")
+def tracemalloc_stop():
+    return diagnostics.stop_tracing()
+
+
+@router.post("/tracemalloc/snapshots")
+def tracemalloc_snapshot():
+    return _call(diagnostics.take_snapshot)
+
+
+@router.get("/tracemalloc/snapshots/{snap_id}")
+def tracemalloc_top(snap_id: int, group_by: str = "lineno", limit: int = 25):
+    _check_group(group_by)
+    return _call(diagnostics.top_allocations, snap_id, group_by, limit)
+
+
+@router.get("/tracemalloc/diff")
+def tracemalloc_diff(a: int, b: Optional[int] = None, group_by: str = "lineno", limit: int = 25):
+    """Growth from snapshot a to snapshot b (or to a snapshot taken now)."""
+    _check_group(group_by)
+    return _call(diagnostics.diff, a, b, group_by, limit)
+
+
+@router.get("/profile")
+async def profile(seconds: float = 10.0, interval_ms: float = 10.0, idle: bool = False, format: str = "text"):
+    """Wall-clock sample of every thread for `seconds`; collapsed stacks (flamegraph.pl / speedscope)."""
+    out = await run_in_threadpool(_call, diagnostics.profile, seconds, interval_ms, idle)
+    if format == "json":
+        return out
+    return PlainTextResponse(out["collapsed"] + "\n",
+                             headers={"X-Profile-Samples": str(out["samples"]),
+                                      "X-Profile-Seconds": str(out["seconds"])})
+
+
+@router.post("/jds/ingest")
+def ingest_jds(req: JDIngestRequest):
+    """Extract skills from free-text JDs and merge them into this tenant's roles (by normalized role)."""
+    records = [r.model_dump() for r in req.jds]
+    return jd_ingest.ingest(records, dry_run=req.dry_run, persist=req.persist)
+
+
+@router.post("/shadow/reset")
+def shadow_reset():
+    shadow.reset()
+    return shadow.report()
+
+
+def _check_group(group_by: str):
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(422, "group_by must be lineno, filename or traceback")
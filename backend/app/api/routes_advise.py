@@ -1,8 +1,14 @@
-import time
+import os, json, time, queue, tempfile, threading, contextvars
+from contextlib import asynccontextmanager
+from typing import Dict
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import FileResponse
-from ..models import Profile, AdviseResponse
-from ..advisor import advise
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from ..models import Profile, AdviseResponse, DeltaRequest
+from ..advisor import advise, replan, edit_skills
+from .. import plan_table, shadow, readvise, store
+from ..admission import ADVISE_POOL, PDF_POOL, Overloaded
 from ..safety import is_malicious, redact_pii
 from ..observability import logger
 
@@ -10,41 +16,226 @@ from ..observability import logger
 router = APIRouter()
 
 
+async def _admit(pool) -> None:
+    try:
+        await pool.acquire()
+    except Overloaded as ex:
+        logger.warning("shed", pool=ex.pool, retry_after_s=ex.retry_after_s)
+        raise HTTPException(503, f"Server busy ({ex.pool}); retry later",
+                            headers={"Retry-After": str(ex.retry_after_s)})
+
+
+@asynccontextmanager
+async def _admitted(pool):
+    """
+    Run inside an admission slot; shed with 503 + Retry-After when the pool
+    is full. The wait is on the event loop: routes admit first, then hand the
+    CPU-bound work to the threadpool.
+    """
+    await _admit(pool)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        pool.release((time.perf_counter() - t0) * 1000.0)
+
+
+def _plan_prefs(profile: Profile) -> Dict[str, int]:
+    """Planner options from profile.prefs; anything else in prefs is ignored here."""
+    out: Dict[str, int] = {}
+    for key, lo, hi in (("max_weeks", 1, 520), ("parallel_tracks", 1, 8)):
+        v = (profile.prefs or {}).get(key)
+        if v is None:
+            continue
+        try:
+            v = int(v)
+        except (TypeError, ValueError):
+            raise HTTPException(422, f"prefs.{key} must be an integer")
+        if not lo <= v <= hi:
+            raise HTTPException(422, f"prefs.{key} must be between {lo} and {hi}")
+        out[key] = v
+    return out
+
+
 @router.post("/advise", response_model=AdviseResponse)
-def post_advise(profile: Profile, request: Request):
+async def post_advise(profile: Profile, request: Request):
     guard_text = " ".join(profile.skills + [profile.goal_role])
     if is_malicious(guard_text):
         raise HTTPException(400, "Potentially unsafe input")
 
     t0 = time.perf_counter()
     safe_skills = [redact_pii(s) for s in profile.skills]
-    out = advise(safe_skills, profile.level.value, redact_pii(profile.goal_role)) 
+    goal_role = redact_pii(profile.goal_role)
+    prefs = _plan_prefs(profile)
+    out, token = await _full_advise(safe_skills, profile.level.value, goal_role, prefs)
     latency = int((time.perf_counter() - t0) * 1000)
 
     logger.info("advise", trace_id=getattr(request, "trace_id", None), latency_ms=latency, usage=out.get("usage"))
-    return {**out, "latency_ms": latency}
+    shadow.maybe_run(safe_skills, profile.level.value, goal_role, prefs, out, latency)
+    return {**out, "latency_ms": latency, "result_token": token}
+
+
+async def _full_advise(safe_skills, level: str, goal_role: str, prefs: Dict):
+    """Plan-table hit or an admitted pipeline run; returns (result, result_token)."""
+    state = {"skills": list(safe_skills), "level": level, "goal_role": goal_role, "prefs": dict(prefs),
+             "version": store.CATALOG_VERSION}
+    # the table holds default-preference plans only
+    out = None if prefs else await run_in_threadpool(plan_table.lookup, safe_skills, level, goal_role)
+    if out is None:
+        async with _admitted(ADVISE_POOL):
+            out = await run_in_threadpool(advise, safe_skills, level, goal_role, prefs=prefs, state=state)
+    return out, readvise.remember(state)
+
+
+@router.post("/advise/delta", response_model=AdviseResponse)
+async def post_advise_delta(req: DeltaRequest, request: Request):
+    """
+    /advise for the profile behind result_token with skills added / removed.
+    Small edits that only close gaps reuse the earlier run's candidates
+    (usage.delta.mode = "incremental", no admission slot needed); larger
+    edits, a removed JD skill, a changed catalog or a plan-table result
+    run the full pipeline (usage.delta.mode = "full"). 410 when the token
+    is unknown or expired: call /advise again.
+    """
+    state = readvise.lookup(req.result_token)
+    if state is None:
+        raise HTTPException(410, "Unknown or expired result_token; call /advise")
+    if is_malicious(" ".join(req.add)):
+        raise HTTPException(400, "Potentially unsafe input")
+
+    t0 = time.perf_counter()
+    add = [redact_pii(s) for s in req.add]
+    level, goal_role, prefs = state["level"], state["goal_role"], state["prefs"]
+    out = None
+    if (len(add) + len(req.remove) <= readvise.DELTA_MAX_CHANGES
+            and state.get("version") == store.CATALOG_VERSION):
+        new_state: Dict = {}
+        out = await run_in_threadpool(replan, state, add, req.remove, new_state=new_state)
+        if out is not None:
+            safe_skills, token = new_state["skills"], readvise.remember(new_state)
+    if out is None:
+        safe_skills = edit_skills(state["skills"], add, req.remove)
+        out, token = await _full_advise(safe_skills, level, goal_role, prefs)
+        out["usage"]["delta"] = {"mode": "full", "added": len(add), "removed": len(req.remove)}
+    latency = int((time.perf_counter() - t0) * 1000)
+
+    logger.info("advise", trace_id=getattr(request, "trace_id", None), latency_ms=latency,
+                usage=out.get("usage"), delta=True)
+    shadow.maybe_run(safe_skills, level, goal_role, prefs, out, latency)
+    return {**out, "latency_ms": latency, "result_token": token}
+
+
+def _frame(event: str, data: Dict, sse: bool) -> bytes:
+    body = json.dumps(data, separators=(",", ":"))
+    if sse:
+        return f"event: {event}\ndata: {body}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, "data": data}, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+@router.post("/advise/stream")
+async def post_advise_stream(profile: Profile, request: Request):
+    """
+    /advise, delivered progressively as NDJSON lines {"event", "data"} (or
+    Server-Sent Events with Accept: text/event-stream):
+      gaps        {gap_map, role_match}         as soon as the JD is matched
+      provisional {plan, timeline}              plan from the hybrid ranking, before reranking
+      plan        {plan, timeline, notes}       final plan, identical to /advise
+      usage       {usage, latency_ms, result_token}   last
+      error       {detail}                      instead of the rest if the pipeline fails
+    gap_map + plan + usage together are exactly the /advise response.
+    """
+    guard_text = " ".join(profile.skills + [profile.goal_role])
+    if is_malicious(guard_text):
+        raise HTTPException(400, "Potentially unsafe input")
+
+    t0 = time.perf_counter()
+    safe_skills = [redact_pii(s) for s in profile.skills]
+    goal_role = redact_pii(profile.goal_role)
+    level = profile.level.value
+    prefs = _plan_prefs(profile)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    trace_id = getattr(request, "trace_id", None)
+
+    state = {"skills": list(safe_skills), "level": level, "goal_role": goal_role, "prefs": dict(prefs),
+             "version": store.CATALOG_VERSION}
+    out = None if prefs else await run_in_threadpool(plan_table.lookup, safe_skills, level, goal_role)
+    if out is None:
+        await _admit(ADVISE_POOL)     # shed before the stream starts, so clients still get a 503
+    events: "queue.Queue" = queue.Queue()
+
+    def run():
+        result, admitted_at = out, time.perf_counter()
+        try:
+            if result is None:
+                try:
+                    result = advise(safe_skills, level, goal_role, prefs=prefs, state=state,
+                                    on_event=lambda e, d: events.put((e, d)))
+                finally:
+                    ADVISE_POOL.release((time.perf_counter() - admitted_at) * 1000.0)
+            else:
+                events.put(("gaps", {"gap_map": result["gap_map"], "role_match": result["usage"].get("role_match")}))
+            latency = int((time.perf_counter() - t0) * 1000)
+            events.put(("result", result))
+            events.put(("usage", {"usage": result["usage"], "latency_ms": latency,
+                                  "result_token": readvise.remember(state)}))
+            logger.info("advise", trace_id=trace_id, latency_ms=latency, usage=result.get("usage"), stream=True)
+            shadow.maybe_run(safe_skills, level, goal_role, prefs, result, latency)
+        except Exception as ex:
+            logger.warning("advise stream failed", error=repr(ex))
+            events.put(("error", {"detail": "Failed to build a plan"}))
+        finally:
+            events.put(None)
+
+    # the pipeline runs on its own thread (with the request's tenant) while this generator writes
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), name="advise-stream", daemon=True).start()
+
+    def frames():
+        sent_plan = False
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            event, data = item
+            if event == "result":
+                if not sent_plan:     # plan-table hit or unknown role: no progress events came first
+                    yield _frame("plan", {k: data[k] for k in ("plan", "timeline", "notes")}, sse)
+                continue
+            sent_plan |= event == "plan"
+            yield _frame(event, data, sse)
+
+    media = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.post("/advise/pdf")
-def post_advise_pdf(profile: Profile):
+async def post_advise_pdf(profile: Profile):
     notes = profile.prefs.get("notes") if profile.prefs else ""
     skills = profile.skills
-    level = profile.level
-
-    r = advise(skills, level, profile.goal_role)
+    level = profile.level.value
+    prefs = _plan_prefs(profile)
 
     from ..pdf_plan import generate_pdf
 
-    path = "plan.pdf"
-    generate_pdf(
-        path,
-        goal=profile.goal_role,
-        plan=r["plan"],
-        gap_map=r["gap_map"],
-        weeks=r["timeline"]["weeks"],
-        level=level,
-        skills=skills,
-        notes=notes,
-        timeline=r["timeline"]["schedule"], 
-    )
-    return FileResponse(path, media_type='application/pdf', filename="UpskillPlan.pdf", background=None)
+    # the pipeline run counts against the advise pool, the render against the PDF pool
+    async with _admitted(ADVISE_POOL):
+        r = await run_in_threadpool(advise, skills, level, profile.goal_role, prefs=prefs)
+
+    # one file per request: several renders can now run concurrently
+    fd, path = tempfile.mkstemp(prefix="plan-", suffix=".pdf")
+    os.close(fd)
+    async with _admitted(PDF_POOL):
+        await run_in_threadpool(
+            generate_pdf,
+            path,
+            goal=profile.goal_role,
+            plan=r["plan"],
+            gap_map=r["gap_map"],
+            weeks=r["timeline"]["weeks"],
+            level=level,
+            skills=skills,
+            notes=notes,
+            timeline=r["timeline"]["schedule"],
+        )
+    return FileResponse(path, media_type='application/pdf', filename="UpskillPlan.pdf",
+                        background=BackgroundTask(os.remove, path))
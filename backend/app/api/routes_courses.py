@@ -1,11 +1,147 @@
-from fastapi import APIRouter, HTTPException
-from .. import store
+import os, json, bisect, hashlib
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from .. import store, tenants, course_graph
 
 router = APIRouter()
 
+CATALOG_MAX_AGE_S = int(os.getenv("CATALOG_MAX_AGE_S", "60"))
+MAX_PAGE = 500
+MAX_BULK_IDS = 500
+
+def _ids_in_order() -> List[str]:
+    """course_ids sorted, cached per tenant and catalog version (stable keyset for cursors)."""
+    cat = store.catalog()
+    cached = cat.index("sorted_ids")
+    if cached is None or cached[0] != cat.version:
+        cached = tenants.attach("sorted_ids", (cat.version, sorted(cat.course_pos)), cat)
+    return cached[1]
+
+
+def _etag(request: Request) -> str:
+    # weak: same tenant + catalog version + same query → same body. The /t/<tenant>/
+    # prefix is stripped before routing, so the path alone doesn't tell tenants apart
+    cat = store.catalog()
+    q = hashlib.sha1(str(request.url.path + "?" + str(request.query_params)).encode("utf-8")).hexdigest()[:10]
+    return f'W/"{cat.tenant}-{cat.version}-{q}"'
+
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    # the same URL serves every tenant's catalog, picked by the X-Tenant header
+    return {"ETag": etag, "Cache-Control": f"public, max-age={CATALOG_MAX_AGE_S}, must-revalidate",
+            "Vary": "X-Tenant"}
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return None
+
+
+def _project(course, fields: Optional[List[str]]) -> Dict:
+    c = course.model_dump()
+    if not fields:
+        return c
+    return {"course_id": c["course_id"], **{f: c[f] for f in fields if f in c}}
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+@router.get("/courses")
+def list_courses(request: Request, response: Response,
+                 ids: Optional[str] = Query(None, description="comma-separated course ids (bulk fetch)"),
+                 cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+                 limit: int = Query(50, ge=1, le=MAX_PAGE),
+                 fields: Optional[str] = Query(None, description="comma-separated fields to return")):
+    """
+    Bulk fetch (`?ids=a,b,c`) or cursor-paginated listing ordered by course_id.
+    Responses carry an ETag derived from the catalog version; send it back in
+    If-None-Match to get a 304.
+    """
+    etag = _etag(request)
+    nm = _not_modified(request, etag)
+    if nm is not None:
+        return nm
+    response.headers.update(_cache_headers(etag))
+    proj = _parse_fields(fields)
+
+    if ids is not None:
+        wanted = [i for i in dict.fromkeys(x.strip() for x in ids.split(",")) if i]
+        if len(wanted) > MAX_BULK_IDS:
+            raise HTTPException(400, f"At most {MAX_BULK_IDS} ids per request")
+        got = {i: store.get_course(i) for i in wanted}
+        return {
+            "courses": [_project(c, proj) for c in got.values() if c is not None],
+            "missing": [i for i, c in got.items() if c is None],
+        }
+
+    order = _ids_in_order()
+    start = bisect.bisect_right(order, cursor) if cursor else 0
+    page = order[start:start + limit]
+    nxt = page[-1] if start + limit < len(order) and page else None
+    return {
+        "courses": [_project(c, proj) for c in map(store.get_course, page) if c is not None],
+        "next_cursor": nxt,
+        "total": len(order),
+        "catalog_version": store.CATALOG_VERSION,
+    }
+
+
+@router.get("/courses/export.ndjson")
+def export_courses(request: Request, fields: Optional[str] = None):
+    """Whole catalog as NDJSON, streamed one course per line."""
+    etag = _etag(request)
+    nm = _not_modified(request, etag)
+    if nm is not None:
+        return nm
+    proj = _parse_fields(fields)
+    order = list(_ids_in_order())
+
+    def lines():
+        buf = []
+        for cid in order:
+            c = store.get_course(cid)       # None if removed since the export started
+            if c is not None:
+                buf.append(json.dumps(_project(c, proj), separators=(",", ":")))
+            if len(buf) >= 256:
+                yield "\n".join(buf) + "\n"
+                buf = []
+        if buf:
+            yield "\n".join(buf) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=_cache_headers(etag))
+
+
 @router.get("/courses/{cid}")
-def get_course(cid: str):
+def get_course(cid: str, request: Request, response: Response):
     c = store.get_course(cid)
     if not c:
         raise HTTPException(404, "Course not found")
+    etag = _etag(request)
+    nm = _not_modified(request, etag)
+    if nm is not None:
+        return nm
+    response.headers.update(_cache_headers(etag))
     return c
+
+
+@router.get("/courses/{cid}/alternatives")
+def course_alternatives(cid: str,
+                        difficulty: Optional[str] = Query(None, description="comma-separated, e.g. beginner,intermediate"),
+                        max_weeks: Optional[int] = Query(None, ge=1),
+                        limit: int = Query(5, ge=1, le=50)):
+    """
+    Substitutes for a course from the precomputed similarity graph
+    (scripts/build_course_graph.py), optionally at other levels or shorter.
+    """
+    if store.get_course(cid) is None:
+        raise HTTPException(404, "Course not found")
+    graph = course_graph.current()
+    if graph is None:
+        raise HTTPException(503, "Course graph not built; run scripts/build_course_graph.py")
+    levels = [d.strip() for d in difficulty.split(",") if d.strip()] if difficulty else None
+    return course_graph.alternatives(cid, limit=limit, difficulty=levels, max_weeks=max_weeks, graph=graph)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .. import store
+from .. import store, admission, deadline, tenants, shadow
 
 router = APIRouter()
 
@@ -10,3 +10,18 @@ def catalog():
 @router.get("/debug/jds")
 def jds():
     return {"count": len(store.JDS), "roles": [j.role for j in store.JDS]}
+
+@router.get("/debug/admission")
+def admission_metrics():
+    """Per-pool concurrency limit, in-flight, queue depth and shed counts; stage-pool load."""
+    return {**admission.metrics(), "stages": deadline.stage_load()}
+
+@router.get("/debug/tenants")
+def tenant_metrics():
+    """Resident tenants (most recent first), memory estimates, loads and evictions."""
+    return {"available": tenants.available(), **tenants.REGISTRY.metrics()}
+
+@router.get("/debug/shadow")
+def shadow_report():
+    """Shadow configuration vs served plans: latency deltas, top-3 overlap, Jaccard, errors."""
+    return shadow.report()
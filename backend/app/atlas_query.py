@@ -0,0 +1,150 @@
+"""
+Atlas Vector Search query layer.
+- One pooled MongoClient per process (get_client), reused by every request.
+- `$vectorSearch` pipeline with tunable numCandidates, an optional difficulty
+  pre-filter pushed down to the index, and a projection that returns only
+  course_id + score (no 384-float embedding on the wire).
+- LocalVectorCollection: an in-memory stand-in implementing the same
+  aggregate() subset, for tests and offline development.
+"""
+import os, threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGODB_ATLAS_URI")
+MONGO_MAX_POOL = int(os.getenv("MONGODB_MAX_POOL", "20"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "2000"))
+NUM_CANDIDATES_FACTOR = int(os.getenv("ATLAS_NUM_CANDIDATES_FACTOR", "10"))
+EMBED_PATH = "embedding"
+
+# difficulties kept by the optional pre-filter, per learner level
+LEVEL_DIFFICULTIES = {
+    "beginner": ["beginner", "intermediate"],
+    "intermediate": None,                     # no filter: every level is useful
+    "advanced": ["intermediate", "advanced"],
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide MongoClient (it owns the connection pool); None without a URI."""
+    global _client
+    if _client is None and MONGO_URI:
+        with _client_lock:
+            if _client is None:
+                from pymongo import MongoClient
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL,
+                    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                    socketTimeoutMS=MONGO_TIMEOUT_MS,
+                )
+    return _client
+
+
+def level_filter(level: Optional[str]) -> Optional[Dict[str, Any]]:
+    diffs = LEVEL_DIFFICULTIES.get((level or "").lower())
+    return {"difficulty": {"$in": diffs}} if diffs else None
+
+
+def vector_search_pipeline(query_vector: Sequence[float], k: int, index_name: str,
+                           num_candidates: Optional[int] = None,
+                           filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    stage: Dict[str, Any] = {
+        "index": index_name,
+        "path": EMBED_PATH,
+        "queryVector": [float(x) for x in query_vector],
+        "numCandidates": max(k, num_candidates or NUM_CANDIDATES_FACTOR * k),
+        "limit": k,
+    }
+    if filter:
+        stage["filter"] = filter
+    return [
+        {"$vectorSearch": stage},
+        {"$project": {"_id": 0, "course_id": 1, "score": {"$meta": "vectorSearchScore"}}},
+    ]
+
+
+def search(coll, query_vector: Sequence[float], k: int, index_name: str,
+           num_candidates: Optional[int] = None, level: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Run the pipeline on `coll` (pymongo Collection or LocalVectorCollection)."""
+    pipeline = vector_search_pipeline(query_vector, k, index_name, num_candidates, level_filter(level))
+    return [(d["course_id"], float(d["score"])) for d in coll.aggregate(pipeline) if d.get("course_id")]
+
+
+# ---------- local stand-in ----------
+def _matches(doc: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    for field, cond in (flt or {}).items():
+        v = doc.get(field)
+        if isinstance(cond, dict):
+            if "$in" in cond and v not in cond["$in"]:
+                return False
+            if "$eq" in cond and v != cond["$eq"]:
+                return False
+        elif v != cond:
+            return False
+    return True
+
+
+class LocalVectorCollection:
+    """
+    Exact-search stand-in for an Atlas collection with a cosine vector index.
+    Supports the `$vectorSearch` + `$project` pipeline built above, and
+    vectorSearchScore uses Atlas' cosine normalization (1 + cos) / 2.
+    """
+
+    def __init__(self, docs: Iterable[Dict[str, Any]] = ()):
+        self.docs: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.insert_many(docs)
+
+    def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    def insert_many(self, docs: Iterable[Dict[str, Any]]) -> None:
+        self.docs.extend(dict(d) for d in docs)
+        self._matrix = None
+
+    def _vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            m = np.asarray([d[EMBED_PATH] for d in self.docs], dtype=np.float32).reshape(len(self.docs), -1)
+            norms = np.linalg.norm(m, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._matrix = m / norms
+        return self._matrix
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        scores: List[float] = []
+        for stage in pipeline:
+            if "$vectorSearch" in stage:
+                vs = stage["$vectorSearch"]
+                if not self.docs:
+                    continue
+                q = np.asarray(vs["queryVector"], dtype=np.float32)
+                q = q / (np.linalg.norm(q) or 1.0)
+                cos = self._vectors() @ q
+                keep = [i for i, d in enumerate(self.docs) if _matches(d, vs.get("filter"))]
+                keep.sort(key=lambda i: cos[i], reverse=True)
+                keep = keep[: vs["limit"]]
+                results = [dict(self.docs[i]) for i in keep]
+                scores = [float((1.0 + cos[i]) / 2.0) for i in keep]
+            elif "$project" in stage:
+                proj = stage["$project"]
+                out = []
+                for d, s in zip(results, scores):
+                    row = {}
+                    for field, spec in proj.items():
+                        if isinstance(spec, dict) and spec.get("$meta") == "vectorSearchScore":
+                            row[field] = s
+                        elif spec and field in d:
+                            row[field] = d[field]
+                    out.append(row)
+                results = out
+        return results
@@ -0,0 +1,268 @@
+"""
+Incremental BM25 (Okapi) index over courses.
+- Postings, document lengths and document frequencies are kept per term,
+  so a single course can be added, updated or deleted without re-tokenizing
+  the rest of the catalog.
+- IDF is recomputed lazily on the first query after a mutation.
+- Deleted slots are tombstoned and reclaimed by compact().
+- aligned_scores() scores into a dense array in the caller's order (catalog
+  positions) with per-term NumPy postings, cached until the next mutation.
+- save()/load() persist the index as JSON so a restart reloads it.
+Scoring matches rank_bm25.BM25Okapi (k1=1.5, b=0.75, epsilon=0.25).
+"""
+import os, json, math, hashlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    return (text or "").lower().split()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+class IncrementalBM25:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self._keys: List[Optional[str]] = []          # slot -> doc key (None = tombstone)
+        self._slot: Dict[str, int] = {}               # doc key -> slot
+        self._doc_len: List[int] = []                 # slot -> token count
+        self._doc_terms: List[Dict[str, int]] = []    # slot -> term frequencies
+        self._doc_hash: Dict[str, str] = {}           # doc key -> hash of indexed text
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {slot: tf}
+        self._total_len = 0
+        self._idf: Dict[str, float] = {}
+        self._idf_dirty = True
+        self._reset_caches()
+
+    def _reset_caches(self) -> None:
+        self._term_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}   # term -> (slots, tf part)
+        self._align: Optional[Tuple[Any, np.ndarray]] = None               # (tag, slot -> position)
+
+    # derived arrays are rebuilt on demand, not snapshotted
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_term_arrays", None)
+        state.pop("_align", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_caches()
+
+    # ---------- mutation ----------
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slot
+
+    def doc_hash(self, key: str) -> Optional[str]:
+        return self._doc_hash.get(key)
+
+    def keys(self) -> List[str]:
+        return list(self._slot)
+
+    def add(self, key: str, text: str) -> None:
+        """Index a document; replaces any existing document with the same key."""
+        if key in self._slot:
+            self.delete(key)
+        tf = dict(Counter(tokenize(text)))
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._slot[key] = slot
+        self._doc_len.append(sum(tf.values()))
+        self._doc_terms.append(tf)
+        self._doc_hash[key] = text_hash(text)
+        for term, n in tf.items():
+            self._postings.setdefault(term, {})[slot] = n
+        self._total_len += self._doc_len[slot]
+        self._idf_dirty = True
+        self._reset_caches()
+
+    def update(self, key: str, text: str) -> bool:
+        """Re-index a document if its text changed. Returns True when the index was touched."""
+        if self._doc_hash.get(key) == text_hash(text):
+            return False
+        self.add(key, text)
+        return True
+
+    def delete(self, key: str) -> bool:
+        slot = self._slot.pop(key, None)
+        if slot is None:
+            return False
+        for term in self._doc_terms[slot]:
+            plist = self._postings.get(term)
+            if plist is None:
+                continue
+            plist.pop(slot, None)
+            if not plist:
+                del self._postings[term]
+        self._total_len -= self._doc_len[slot]
+        self._keys[slot] = None
+        self._doc_len[slot] = 0
+        self._doc_terms[slot] = {}
+        self._doc_hash.pop(key, None)
+        self._idf_dirty = True
+        self._reset_caches()
+        return True
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._keys) - len(self._slot)
+
+    def compact(self) -> None:
+        """Drop tombstoned slots and renumber the remaining documents densely."""
+        if not self.tombstones:
+            return
+        remap: Dict[int, int] = {}
+        keys, lens, terms = [], [], []
+        for old, key in enumerate(self._keys):
+            if key is None:
+                continue
+            remap[old] = len(keys)
+            keys.append(key)
+            lens.append(self._doc_len[old])
+            terms.append(self._doc_terms[old])
+        self._keys, self._doc_len, self._doc_terms = keys, lens, terms
+        self._slot = {k: i for i, k in enumerate(keys)}
+        self._postings = {
+            t: {remap[s]: n for s, n in plist.items()} for t, plist in self._postings.items()
+        }
+        self._reset_caches()
+
+    # ---------- scoring ----------
+    def _ensure_idf(self) -> None:
+        if not self._idf_dirty:
+            return
+        n = len(self._slot)
+        idf: Dict[str, float] = {}
+        total, negative = 0.0, []
+        for term, plist in self._postings.items():
+            df = len(plist)
+            v = math.log(n - df + 0.5) - math.log(df + 0.5)
+            idf[term] = v
+            total += v
+            if v < 0:
+                negative.append(term)
+        floor = self.epsilon * (total / len(idf)) if idf else 0.0
+        for term in negative:
+            idf[term] = floor
+        self._idf = idf
+        self._idf_dirty = False
+
+    def get_scores(self, query: str) -> Dict[str, float]:
+        """BM25 score for every document that shares at least one term with the query."""
+        self._ensure_idf()
+        n = len(self._slot)
+        if not n:
+            return {}
+        avgdl = self._total_len / n
+        k1, b = self.k1, self.b
+        acc: Dict[int, float] = {}
+        for term in tokenize(query):
+            plist = self._postings.get(term)
+            if not plist:
+                continue
+            idf = self._idf[term]
+            for slot, tf in plist.items():
+                denom = tf + k1 * (1 - b + b * self._doc_len[slot] / avgdl)
+                acc[slot] = acc.get(slot, 0.0) + idf * tf * (k1 + 1) / denom
+        return {self._keys[s]: v for s, v in acc.items()}
+
+    def _term(self, term: str, avgdl: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(slots, tf * (k1 + 1) / denominator) of a term's postings."""
+        arr = self._term_arrays.get(term)
+        if arr is None:
+            plist = self._postings.get(term)
+            if not plist:
+                return None
+            slots = np.fromiter(plist.keys(), dtype=np.int64, count=len(plist))
+            tf = np.fromiter(plist.values(), dtype=np.float64, count=len(plist))
+            dl = np.fromiter((self._doc_len[s] for s in plist), dtype=np.float64, count=len(plist))
+            k1, b = self.k1, self.b
+            arr = self._term_arrays[term] = (slots, tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)))
+        return arr
+
+    def aligned_scores(self, query: str, positions: Dict[str, int], n: int, tag: Any = None) -> np.ndarray:
+        """
+        get_scores() as a float32 array of length n: the score of document
+        `key` at positions[key] (0 for positions with no document or no query
+        term). The slot -> position map is kept until the index changes or a
+        different `tag` (e.g. the catalog version) is passed.
+        """
+        self._ensure_idf()
+        out = np.zeros(n, dtype=np.float32)
+        if not self._slot:
+            return out
+        if self._align is None or tag is None or self._align[0] != tag:
+            pos = np.fromiter((-1 if k is None else positions.get(k, -1) for k in self._keys),
+                              dtype=np.int64, count=len(self._keys))
+            pos[pos >= n] = -1
+            self._align = (tag, pos)
+        avgdl = self._total_len / len(self._slot)
+        acc = np.zeros(len(self._keys), dtype=np.float64)
+        for term in tokenize(query):
+            arr = self._term(term, avgdl)
+            if arr is not None:
+                acc[arr[0]] += self._idf[term] * arr[1]
+        pos = self._align[1]
+        hit = pos >= 0
+        out[pos[hit]] = acc[hit]
+        return out
+
+    def top_k(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        scores = self.get_scores(query)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    # ---------- persistence ----------
+    def save(self, path: str) -> None:
+        """Write the compacted index atomically (tmp file + rename)."""
+        self.compact()
+        payload = {
+            "format": FORMAT_VERSION,
+            "params": {"k1": self.k1, "b": self.b, "epsilon": self.epsilon},
+            "docs": [
+                {"key": k, "hash": self._doc_hash[k], "tf": self._doc_terms[i]}
+                for i, k in enumerate(self._keys)
+            ],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IncrementalBM25"]:
+        """Load a saved index; returns None if missing, unreadable or from another format."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("format") != FORMAT_VERSION:
+            return None
+        idx = cls(**payload.get("params", {}))
+        for d in payload.get("docs", []):
+            slot = len(idx._keys)
+            tf = {t: int(n) for t, n in d["tf"].items()}
+            idx._keys.append(d["key"])
+            idx._slot[d["key"]] = slot
+            idx._doc_len.append(sum(tf.values()))
+            idx._doc_terms.append(tf)
+            idx._doc_hash[d["key"]] = d["hash"]
+            for term, n in tf.items():
+                idx._postings.setdefault(term, {})[slot] = n
+            idx._total_len += idx._doc_len[slot]
+        return idx
@@ -0,0 +1,244 @@
+"""
+Pre-tokenized cross-encoder inputs.
+CrossEncoder.predict tokenizes every (query, course text) pair from scratch,
+although course texts only change with the catalog. PairEncoder instead
+tokenizes documents once (DocTokens: one flat int32 array + offsets per
+catalog version, refreshed per changed document, or an LRU keyed by text in
+the model sidecar), tokenizes
+only the query per request, and assembles [special] q [special] d [special]
+rows from the cached ids:
+- truncation matches the fast tokenizer's longest_first for the same max length;
+- rows are sorted by length and padded per CE_BATCH_SIZE batch, so short
+  pairs don't pay for the longest one.
+Scores equal CrossEncoder.predict (same logits and activation).
+"""
+import os, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .deadline import check_stage
+
+CE_PRETOKENIZE = os.getenv("CE_PRETOKENIZE", "1") == "1"
+CE_BATCH_SIZE = int(os.getenv("CE_BATCH_SIZE", "32"))
+CE_TOKEN_CACHE = int(os.getenv("CE_TOKEN_CACHE", "50000"))     # sidecar: document texts kept tokenized
+_DEFAULT_MAX_LENGTH = 512          # tokenizers without a usable model_max_length
+
+_encoders: Dict[int, Tuple[Any, Optional["PairEncoder"]]] = {}
+_encoders_lock = threading.Lock()
+
+
+def _find(seq: List[int], sub: List[int], start: int = 0) -> int:
+    for i in range(start, len(seq) - len(sub) + 1):
+        if seq[i:i + len(sub)] == sub:
+            return i
+    raise ValueError("probe tokens not found in the encoded pair")
+
+
+def fit_lengths(lq: int, ld: int, budget: int) -> Tuple[int, int]:
+    """Lengths kept of (query, doc) under longest_first truncation to `budget` tokens (tokenizers' rule)."""
+    if lq + ld <= budget:
+        return lq, ld
+    n1, n2 = (ld, lq) if lq > ld else (lq, ld)
+    n2 = n1 if n1 > budget else max(n1, budget - n1)
+    if n1 + n2 > budget:
+        n1 = budget // 2
+        n2 = n1 + budget % 2
+    if lq > ld:
+        n1, n2 = n2, n1
+    return min(lq, n1), min(ld, n2)
+
+
+def text_digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class DocTokens:
+    """
+    Token ids of many documents, stored as one flat int32 array plus offsets,
+    with a 64-bit digest of each document's text (so a refresh re-tokenizes
+    only what changed).
+    """
+
+    def __init__(self, ids: Sequence[Sequence[int]], version: str = "", digests: Sequence[int] = ()):
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        self.offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.flat = np.fromiter((t for x in ids for t in x), dtype=np.int32, count=int(self.offsets[-1]))
+        self.version = version
+        self.digests = np.asarray(digests, dtype=np.uint64)
+
+    @classmethod
+    def refresh(cls, old: Optional["DocTokens"], texts: Sequence[str],
+                tokenize: Callable[[Sequence[str]], List[List[int]]], version: str = "") -> "DocTokens":
+        """Tokens for `texts`, reusing rows of `old` whose text is unchanged; only new or edited texts are tokenized."""
+        digests = [text_digest(t) for t in texts]
+        have: Dict[int, int] = {}
+        if old is not None and len(getattr(old, "digests", ())) == len(old):
+            have = {int(d): i for i, d in enumerate(old.digests)}
+        todo = [j for j, d in enumerate(digests) if d not in have]
+        fresh = dict(zip(todo, tokenize([texts[j] for j in todo])))
+        ids = [fresh[j] if j in fresh else old[have[d]] for j, d in enumerate(digests)]
+        return cls(ids, version, digests)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.flat[self.offsets[i]:self.offsets[i + 1]]
+
+    def rows(self, idxs: Sequence[int]) -> List[np.ndarray]:
+        return [self[i] for i in idxs]
+
+
+class PairEncoder:
+    """Scores (query ids, doc ids) pairs with a sentence-transformers CrossEncoder's model."""
+
+    def __init__(self, ce):
+        self.ce = ce
+        self.tok = ce.tokenizer
+        self.model = ce.model
+        self.num_labels = int(getattr(self.model.config, "num_labels", 1))
+        # 3.x: default_activation_function; newer releases: activation_fn
+        self.activation = getattr(ce, "activation_fn", None) or getattr(ce, "default_activation_function", None)
+        # special tokens and segment ids around the two sequences, read off one encoded probe pair
+        q = self.tok("a", add_special_tokens=False)["input_ids"]
+        d = self.tok("b", add_special_tokens=False)["input_ids"]
+        enc = self.tok("a", "b", return_token_type_ids=True)
+        ids = list(enc["input_ids"])
+        tt = list(enc.get("token_type_ids") or [0] * len(ids))
+        iq = _find(ids, q)
+        idd = _find(ids, d, iq + len(q))
+        self.prefix, self.mid, self.suffix = ids[:iq], ids[iq + len(q):idd], ids[idd + len(d):]
+        self.tt_prefix, self.tt_mid, self.tt_suffix = tt[:iq], tt[iq + len(q):idd], tt[idd + len(d):]
+        self.tt_q, self.tt_d = tt[iq], tt[idd]
+        self.use_tt = "token_type_ids" in getattr(self.tok, "model_input_names", ())
+        self.pad_id = self.tok.pad_token_id if self.tok.pad_token_id is not None else 0
+        max_length = getattr(ce, "max_length", None) or getattr(self.tok, "model_max_length", None)
+        if not max_length or max_length > 100_000:          # "unlimited" sentinel
+            max_length = _DEFAULT_MAX_LENGTH
+        self.budget = int(max_length) - len(self.prefix) - len(self.mid) - len(self.suffix)
+        self.name = getattr(self.tok, "name_or_path", "") or type(self.tok).__name__
+
+    def tokenize(self, texts: Sequence[str]) -> List[List[int]]:
+        """Ids without special tokens, cut at the most any pair could keep."""
+        if not texts:
+            return []
+        return self.tok(list(texts), add_special_tokens=False, truncation=True,
+                        max_length=self.budget)["input_ids"]
+
+    def score(self, query: str, docs: Sequence[np.ndarray]) -> np.ndarray:
+        q = np.asarray(self.tokenize([query])[0], dtype=np.int32)
+        return self.score_ids([q] * len(docs), docs)
+
+    def score_ids(self, queries: Sequence[np.ndarray], docs: Sequence[np.ndarray]) -> np.ndarray:
+        import torch
+
+        n = len(docs)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        fixed = len(self.prefix) + len(self.mid) + len(self.suffix)
+        kept = [fit_lengths(len(q), len(d), self.budget) for q, d in zip(queries, docs)]
+        lengths = np.array([fixed + lq + ld for lq, ld in kept])
+        order = np.argsort(lengths, kind="stable")
+        device = next(self.model.parameters()).device
+        a, m = len(self.prefix), len(self.mid)
+        out = np.zeros((n, self.num_labels), dtype=np.float32)
+        self.model.eval()
+        for lo in range(0, n, CE_BATCH_SIZE):
+            check_stage()           # the rerank stage's slice is spent: stop between batches
+            rows = order[lo:lo + CE_BATCH_SIZE]
+            width = int(lengths[rows[-1]])
+            ids = np.full((len(rows), width), self.pad_id, dtype=np.int64)
+            tts = np.zeros((len(rows), width), dtype=np.int64)
+            mask = np.zeros((len(rows), width), dtype=np.int64)
+            for r, j in enumerate(rows):
+                lq, ld = kept[j]
+                b = a + lq
+                c = b + m
+                e = c + ld
+                ids[r, :a] = self.prefix
+                ids[r, a:b] = queries[j][:lq]
+                ids[r, b:c] = self.mid
+                ids[r, c:e] = docs[j][:ld]
+                ids[r, e:e + len(self.suffix)] = self.suffix
+                if self.use_tt:
+                    tts[r, :a] = self.tt_prefix
+                    tts[r, a:b] = self.tt_q
+                    tts[r, b:c] = self.tt_mid
+                    tts[r, c:e] = self.tt_d
+                    tts[r, e:e + len(self.suffix)] = self.tt_suffix
+                mask[r, :e + len(self.suffix)] = 1
+            feats = {"input_ids": torch.from_numpy(ids).to(device),
+                     "attention_mask": torch.from_numpy(mask).to(device)}
+            if self.use_tt:
+                feats["token_type_ids"] = torch.from_numpy(tts).to(device)
+            with torch.inference_mode():
+                logits = self.model(**feats, return_dict=True).logits
+                if self.activation is not None:
+                    logits = self.activation(logits)
+            out[rows] = logits.float().cpu().numpy()
+        return out[:, 0] if self.num_labels == 1 else out
+
+
+class TextScorer:
+    """CrossEncoder.predict replacement for text pairs: documents are tokenized once (LRU by text)."""
+
+    def __init__(self, encoder: PairEncoder, capacity: int = CE_TOKEN_CACHE):
+        self.encoder = encoder
+        self.capacity = capacity
+        self._docs: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _doc_ids(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for t in texts:
+                ids = self._docs.get(t)
+                if ids is not None:
+                    self._docs.move_to_end(t)
+                    out[t] = ids
+        missing = [t for t in dict.fromkeys(texts) if t not in out]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        for t, ids in zip(missing, self.encoder.tokenize(missing)):
+            out[t] = np.asarray(ids, dtype=np.int32)
+        if missing:
+            with self._lock:
+                for t in missing:
+                    self._docs[t] = out[t]
+                while len(self._docs) > self.capacity:
+                    self._docs.popitem(last=False)
+        return out
+
+    def __call__(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        queries = list(dict.fromkeys(q for q, _ in pairs))
+        q_ids = {q: np.asarray(ids, dtype=np.int32) for q, ids in zip(queries, self.encoder.tokenize(queries))}
+        docs = self._doc_ids([d for _, d in pairs])
+        return self.encoder.score_ids([q_ids[q] for q, _ in pairs], [docs[d] for _, d in pairs])
+
+
+def encoder_for(ce) -> Optional[PairEncoder]:
+    """The PairEncoder of a CrossEncoder, or None (CE_PRETOKENIZE=0 or an unsupported model) -> use predict."""
+    if ce is None or not CE_PRETOKENIZE:
+        return None
+    hit = _encoders.get(id(ce))
+    if hit is not None and hit[0] is ce:
+        return hit[1]
+    with _encoders_lock:
+        hit = _encoders.get(id(ce))
+        if hit is None or hit[0] is not ce:
+            try:
+                enc = PairEncoder(ce)
+            except Exception:
+                enc = None
+            hit = _encoders[id(ce)] = (ce, enc)
+    return hit[1]
+
+
+def text_scorer(ce):
+    """pairs -> scores for the model sidecar: pre-tokenized when possible, else ce.predict."""
+    enc = encoder_for(ce)
+    return TextScorer(enc) if enc is not None else ce.predict
@@ -0,0 +1,395 @@
+"""
+Precomputed course-similarity graph: each course's K nearest courses by
+  (1 - COURSE_GRAPH_SKILL_WEIGHT) * cosine(embeddings) + COURSE_GRAPH_SKILL_WEIGHT * jaccard(skills)
+built by scripts/build_course_graph.py and memory-mapped by the API, so
+GET /api/courses/{cid}/alternatives is a scan of one K-long row. Course
+edits made in the API process (retrieval.upsert_course / remove_course)
+refresh an existing graph in the background from the live catalog
+(schedule_refresh); edits arriving during a refresh are folded into one
+more run.
+
+On disk (COURSE_GRAPH_DIR, or <tenant data dir>/course_graph):
+  meta.json               build id, catalog version, row ids, per-course content hashes, vocabulary
+  <build>.vectors.npy     float16 unit embeddings (N, d)    reused for unchanged courses
+  <build>.skills.npy      uint8 packed skill bitsets (N, ceil(V / 8))
+  <build>.neighbors.npy   int32 rows (N, K), -1 padded
+  <build>.scores.npy      float16 (N, K), best first
+meta.json is replaced last, so readers never see a half-written build;
+builds of one directory take an exclusive lock on <dir>/.lock, so the
+script and API workers don't remove each other's arrays.
+
+A rebuild is incremental: only new or changed courses are re-embedded, and
+only rows that lost a neighbour are recomputed in full; every other row
+merges its old list with its similarities to the changed courses, which
+gives the same result as a full build (up to the order of tied scores).
+"""
+import os, json, time, glob, fcntl, hashlib, threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import store, tenants, skills
+from .observability import logger
+
+COURSE_GRAPH_DIR = os.getenv("COURSE_GRAPH_DIR", os.path.join(store.DATA_DIR, "course_graph"))
+COURSE_GRAPH_K = int(os.getenv("COURSE_GRAPH_K", "32"))            # stored per course; filters pick from these
+COURSE_GRAPH_SKILL_WEIGHT = float(os.getenv("COURSE_GRAPH_SKILL_WEIGHT", "0.3"))
+COURSE_GRAPH_RECHECK_S = float(os.getenv("COURSE_GRAPH_RECHECK_S", "5"))
+_BLOCK = 1024                      # rows per similarity block
+_FULL_REBUILD_FRACTION = 0.25      # past this share of changed courses a full build is cheaper
+
+_reload_lock = threading.Lock()
+_refreshes: Dict[Tuple[str, str], bool] = {}     # (tenant, graph dir) running -> edits arrived meanwhile
+_refreshes_lock = threading.Lock()
+
+
+def graph_dir(cat=None) -> str:
+    cat = cat or store.catalog()
+    if cat.tenant == tenants.DEFAULT_TENANT:
+        return COURSE_GRAPH_DIR
+    return os.path.join(cat.data_dir, "course_graph")
+
+
+def course_hash(course) -> str:
+    return hashlib.sha1(course.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+
+class CourseGraph:
+    """A built graph, memory-mapped read-only from `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        self.mtime = os.stat(meta_path).st_mtime_ns
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self.ids: List[str] = self.meta["ids"]
+        self.pos = {cid: i for i, cid in enumerate(self.ids)}
+        build = self.meta["build"]
+        self.vectors, self.skills, self.neighbors, self.scores = (
+            np.load(os.path.join(path, f"{build}.{name}.npy"), mmap_mode="r")
+            for name in ("vectors", "skills", "neighbors", "scores"))
+        self.checked_at = time.monotonic()
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def neighbours(self, cid: str) -> List[Tuple[str, float]]:
+        """(course_id, similarity) best first; empty for a course the build hasn't seen."""
+        i = self.pos.get(cid)
+        if i is None:
+            return []
+        row, scores = self.neighbors[i], self.scores[i]
+        out = []
+        for j, s in zip(row.tolist(), scores.tolist()):
+            if j < 0:
+                break
+            out.append((self.ids[j], s))
+        return out
+
+    # mmapped arrays would pickle as full copies; snapshots keep the path and re-map it
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+def load(path: str) -> Optional[CourseGraph]:
+    try:
+        return CourseGraph(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _changed_on_disk(g: CourseGraph) -> bool:
+    try:
+        return os.stat(os.path.join(g.path, "meta.json")).st_mtime_ns != g.mtime
+    except OSError:
+        return True
+
+
+def current(cat=None) -> Optional[CourseGraph]:
+    """The tenant's graph, re-mapped when the build job replaced it (checked every COURSE_GRAPH_RECHECK_S)."""
+    cat = cat or store.catalog()
+    g = cat.index("course_graph")
+    if g is not None and time.monotonic() - g.checked_at < COURSE_GRAPH_RECHECK_S:
+        return g
+    with _reload_lock:
+        g = cat.index("course_graph")
+        if g is not None:
+            if time.monotonic() - g.checked_at < COURSE_GRAPH_RECHECK_S:
+                return g
+            g.checked_at = time.monotonic()
+            if not _changed_on_disk(g):
+                return g
+        g = load(graph_dir(cat))
+        if g is None:
+            cat.indexes.pop("course_graph", None)
+            return None
+        return tenants.attach("course_graph", g, cat)
+
+
+def alternatives(cid: str, limit: int = 5, difficulty: Optional[Sequence[str]] = None,
+                 max_weeks: Optional[int] = None, graph: CourseGraph = None) -> Dict[str, Any]:
+    """
+    Up to `limit` substitutes for cid from its precomputed neighbours, filtered
+    on the live catalog (difficulty in `difficulty`, duration <= max_weeks).
+    """
+    graph = graph or current()
+    wanted = {d.lower() for d in difficulty} if difficulty else None
+    out = []
+    for other, score in graph.neighbours(cid):
+        c = store.get_course(other)
+        if c is None:
+            continue
+        if wanted is not None and (c.difficulty or "").lower() not in wanted:
+            continue
+        if max_weeks is not None and c.duration_weeks > max_weeks:
+            continue
+        out.append({"course_id": c.course_id, "title": c.title, "difficulty": c.difficulty,
+                    "duration_weeks": c.duration_weeks, "skills": c.skills, "similarity": round(score, 4)})
+        if len(out) >= limit:
+            break
+    return {
+        "course_id": cid,
+        "alternatives": out,
+        "graph": {"built_for": graph.version, "stale": graph.version != store.CATALOG_VERSION,
+                  "indexed": cid in graph.pos, "k": graph.k},
+    }
+
+
+# ---------- build ----------
+def _skill_sets(courses: Sequence, taxonomy) -> List[set]:
+    return [{taxonomy.resolve(s) for s in c.skills or []} for c in courses]
+
+
+def _pack(sets: List[set], vocab: List[str]) -> np.ndarray:
+    col = {s: i for i, s in enumerate(vocab)}
+    bits = np.zeros((len(sets), max(1, len(vocab))), dtype=bool)
+    for r, ss in enumerate(sets):
+        bits[r, [col[s] for s in ss]] = True
+    return np.packbits(bits, axis=1)
+
+
+class _Similarity:
+    """Blended cosine + skill Jaccard against every course, one block of rows at a time."""
+
+    def __init__(self, vectors: np.ndarray, packed: np.ndarray, nskills: int, skill_weight: float):
+        self.v = vectors.astype(np.float32)
+        # unpacked as float32 so intersections are one matrix product
+        self.s = np.unpackbits(packed, axis=1, count=max(1, nskills)).astype(np.float32)
+        self.sizes = self.s.sum(axis=1)
+        self.w = skill_weight
+
+    def rows(self, idx: np.ndarray) -> np.ndarray:
+        sim = (self.v[idx] @ self.v.T) * (1.0 - self.w)
+        if self.w:
+            inter = self.s[idx] @ self.s.T
+            union = self.sizes[idx][:, None] + self.sizes[None, :] - inter
+            sim += self.w * np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        sim[np.arange(len(idx)), idx] = -np.inf        # a course is not its own alternative
+        return sim
+
+
+def _top_k(cand_idx: np.ndarray, cand_score: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise best k of (index, score) candidates, best first, -1 / 0 padded."""
+    n, m = cand_score.shape
+    kk = min(k, m)
+    part = np.argpartition(-cand_score, kk - 1, axis=1)[:, :kk] if kk < m else np.tile(np.arange(m), (n, 1))
+    top_s = np.take_along_axis(cand_score, part, axis=1)
+    order = np.argsort(-top_s, axis=1, kind="stable")
+    part = np.take_along_axis(part, order, axis=1)
+    top_s = np.take_along_axis(top_s, order, axis=1)
+    top_i = np.take_along_axis(cand_idx, part, axis=1) if cand_idx.ndim == 2 else cand_idx[part]
+    nbrs = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    valid = np.isfinite(top_s)
+    nbrs[:, :kk] = np.where(valid, top_i, -1)
+    scores[:, :kk] = np.where(valid, top_s, 0)
+    return nbrs, scores
+
+
+def _full_rows(sim: _Similarity, rows: np.ndarray, k: int, nbrs: np.ndarray, scores: np.ndarray) -> None:
+    n = len(sim.v)
+    for lo in range(0, len(rows), _BLOCK):
+        idx = rows[lo:lo + _BLOCK]
+        nbrs[idx], scores[idx] = _top_k(np.arange(n), sim.rows(idx), k)
+
+
+def build(courses: Sequence, embed: Callable[[List[str]], Any], text: Callable[[Any], str],
+          previous: Optional[CourseGraph] = None, k: int = COURSE_GRAPH_K,
+          skill_weight: float = COURSE_GRAPH_SKILL_WEIGHT, model: str = "",
+          taxonomy=None, full: bool = False) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    (meta, arrays) for `courses` (unique ids, in order). `embed(texts)` is only
+    called for courses whose content hash differs from `previous`; a course
+    whose skills now resolve differently (taxonomy edits) keeps its vector but
+    has its neighbours recomputed like a changed course.
+    """
+    taxonomy = taxonomy or skills.index()
+    ids = [c.course_id for c in courses]
+    hashes = [course_hash(c) for c in courses]
+    sets = _skill_sets(courses, taxonomy)
+    vocab = sorted(set().union(*sets)) if sets else []
+    packed = _pack(sets, vocab)
+
+    # as read back from meta.json, so they compare equal to a previous build's
+    settings = json.loads(json.dumps({"k": k, "skill_weight": skill_weight, "model": model}))
+    prev_rows: Dict[str, int] = {}       # course id -> row in the previous build
+    if previous is not None and not full and all(previous.meta.get(key) == v for key, v in settings.items()):
+        prev_rows = {cid: i for i, cid in enumerate(previous.ids)}
+    # courses whose content is unchanged since the previous build keep their vector
+    reuse = np.array([cid in prev_rows and previous.meta["hashes"][prev_rows[cid]] == h
+                      for cid, h in zip(ids, hashes)], dtype=bool)
+    # ... and their rows too, unless the taxonomy now resolves their skills differently
+    keep = reuse.copy()
+    if reuse.any():
+        prev_vocab = previous.meta.get("vocab", [])
+        for i in np.flatnonzero(reuse):
+            bits = np.unpackbits(np.asarray(previous.skills[prev_rows[ids[i]]]), count=max(1, len(prev_vocab)))
+            keep[i] = {prev_vocab[j] for j in np.flatnonzero(bits[:len(prev_vocab)])} == sets[i]
+    dirty = np.flatnonzero(~keep)
+
+    new_vec = np.flatnonzero(~reuse)
+    to_embed = [text(courses[i]) for i in new_vec]
+    fresh = np.asarray(embed(to_embed), dtype=np.float32) if to_embed else None
+    dim = fresh.shape[1] if fresh is not None else (previous.vectors.shape[1] if previous is not None else 1)
+    vectors = np.zeros((len(ids), dim), dtype=np.float16)
+    if reuse.any():
+        vectors[reuse] = previous.vectors[[prev_rows[ids[i]] for i in np.flatnonzero(reuse)]]
+    if fresh is not None:
+        norms = np.linalg.norm(fresh, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors[new_vec] = (fresh / norms).astype(np.float16)
+
+    sim = _Similarity(vectors, packed, len(vocab), skill_weight)
+    n = len(ids)
+    nbrs = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    incremental = bool(keep.any()) and len(dirty) <= _FULL_REBUILD_FRACTION * n
+    if not incremental:
+        _full_rows(sim, np.arange(n), k, nbrs, scores)
+        recomputed = n
+    else:
+        kept = np.flatnonzero(keep)
+        # old neighbour lists in new row numbers; a neighbour that changed or left the catalog is -2
+        new_row = np.full(len(previous.ids) + 1, -2, dtype=np.int64)       # last slot: old -1 padding
+        new_row[-1] = -1
+        for i in kept:
+            new_row[prev_rows[ids[i]]] = i
+        old = new_row[np.asarray(previous.neighbors[[prev_rows[ids[i]] for i in kept]])]
+        old_scores = np.asarray(previous.scores[[prev_rows[ids[i]] for i in kept]], dtype=np.float32)
+        lost = (old == -2).any(axis=1)
+        # a kept row that lost a neighbour can't know its next-best old candidate: recompute it
+        full_rows = np.concatenate([dirty, kept[lost]])
+        _full_rows(sim, full_rows, k, nbrs, scores)
+        merge = kept[~lost]
+        if len(merge):
+            cand_i = old[~lost]
+            cand_s = np.where(cand_i >= 0, old_scores[~lost], -np.inf)
+            if len(dirty):
+                to_dirty = np.concatenate([sim.rows(dirty[lo:lo + _BLOCK]) for lo in range(0, len(dirty), _BLOCK)]).T[merge]
+                cand_i = np.concatenate([cand_i, np.broadcast_to(dirty, (len(merge), len(dirty)))], axis=1)
+                cand_s = np.concatenate([cand_s, to_dirty], axis=1)
+            nbrs[merge], scores[merge] = _top_k(cand_i, cand_s, k)
+        recomputed = len(full_rows)
+
+    meta = {**settings, "ids": ids, "hashes": hashes, "vocab": vocab,
+            "stats": {"courses": n, "embedded": len(new_vec), "rows_recomputed": int(recomputed),
+                      "incremental": incremental}}
+    return meta, {"vectors": vectors, "skills": packed, "neighbors": nbrs, "scores": scores}
+
+
+def save(path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray], version: str) -> str:
+    """Write a build next to the current one, switch meta.json over, then drop older builds."""
+    os.makedirs(path, exist_ok=True)
+    build_id = f"{time.time_ns()}-{os.getpid()}"     # unique per build: a live build's files are never rewritten
+    for name, arr in arrays.items():
+        np.save(os.path.join(path, f"{build_id}.{name}.npy"), arr)
+    meta = {**meta, "build": build_id, "version": version, "built_at": time.time()}
+    tmp = os.path.join(path, f"meta.json.tmp{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+    for old in glob.glob(os.path.join(path, "*.npy")):
+        if not os.path.basename(old).startswith(build_id + "."):
+            try:
+                os.remove(old)          # processes still mapping it keep their pages until they re-map
+            except OSError:
+                pass
+    return build_id
+
+
+@contextmanager
+def _dir_lock(path: str):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def refresh(cat, embed: Callable[[List[str]], Any], text: Callable[[Any], str], model: str = "",
+            path: Optional[str] = None, full: bool = False, **settings) -> Tuple[Dict[str, Any], str]:
+    """
+    Build the graph for cat's live courses (incrementally from the build on
+    disk unless `full`), save it under path (default graph_dir(cat)) and
+    attach it to cat. Returns (meta, build id).
+    """
+    path = path or graph_dir(cat)
+    with cat.lock:
+        version = cat.version
+        courses = [cat.courses[i] for i in sorted(cat.course_pos.values())]
+    with _dir_lock(path):
+        previous = None if full else load(path)
+        meta, arrays = build(courses, embed, text, previous=previous, model=model, full=full, **settings)
+        build_id = save(path, meta, arrays, version)
+    g = load(path)
+    if g is not None and path == graph_dir(cat):
+        tenants.attach("course_graph", g, cat)
+    return meta, build_id
+
+
+def schedule_refresh(cat, embed: Callable[[List[str]], Any], text: Callable[[Any], str],
+                     model: str = "") -> bool:
+    """
+    refresh() in a background thread after a catalog edit, if the tenant has
+    a graph. A call while one runs makes it run once more when done.
+    Returns False when there is no graph to keep fresh.
+    """
+    if current(cat) is None:
+        return False
+    key = (cat.tenant, graph_dir(cat))
+    with _refreshes_lock:
+        if key in _refreshes:
+            _refreshes[key] = True
+            return True
+        _refreshes[key] = False
+    threading.Thread(target=_refresh_loop, args=(key, cat, embed, text, model),
+                     name="course-graph", daemon=True).start()
+    return True
+
+
+def _refresh_loop(key: Tuple[str, str], cat, embed, text, model: str) -> None:
+    while True:
+        try:
+            meta, _ = refresh(cat, embed, text, model=model)
+            st = meta["stats"]
+            logger.info("course graph refreshed", tenant=cat.tenant, embedded=st["embedded"],
+                        rows_recomputed=st["rows_recomputed"])
+        except Exception as ex:
+            logger.warning("course graph not refreshed", tenant=cat.tenant, error=repr(ex))
+        with _refreshes_lock:
+            if not _refreshes[key]:
+                del _refreshes[key]
+                return
+            _refreshes[key] = False
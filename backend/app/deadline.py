@@ -0,0 +1,176 @@
+"""
+Per-request deadlines and a circuit breaker for slow dependencies.
+- Deadline: wall-clock budget for a whole request; stages ask for a slice of it.
+- run_with_timeout: run a stage on a bounded worker pool and stop waiting
+  for it once its slice is spent. The stage sees its slice through
+  check_stage() / stage_expired(): a stage that starts after its caller gave
+  up does nothing, and long stages (cross-encoder batches) stop between
+  steps. Stages still running after their caller left count against the
+  pool; when running + queued stages reach the pool size + STAGE_MAX_QUEUED,
+  new stages fail at once with StageTimeout, so the caller degrades instead
+  of queueing behind abandoned work.
+- CircuitBreaker: after N consecutive failures/timeouts, stop calling the
+  dependency for a cooldown window, then let one trial call through.
+- isolated(): run a pipeline on its own stage pool and breakers (shadow runs),
+  so it neither queues behind nor trips anything served traffic depends on.
+"""
+import os, time, weakref, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "8"))
+STAGE_MAX_QUEUED = int(os.getenv("STAGE_MAX_QUEUED", str(STAGE_WORKERS)))   # stages waiting for a worker
+
+_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+_isolation: contextvars.ContextVar = contextvars.ContextVar("stage_isolation", default=None)
+_stage: contextvars.ContextVar = contextvars.ContextVar("stage_budget", default=None)
+_loads: "weakref.WeakKeyDictionary[ThreadPoolExecutor, Dict[str, int]]" = weakref.WeakKeyDictionary()
+_loads_lock = threading.Lock()
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget_ms: float):
+        self.budget_ms = float(budget_ms)
+        self.start = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self) -> float:
+        return max(0.0, self.budget_ms - self.elapsed_ms())
+
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+    def slice_ms(self, stage_budget_ms: float) -> float:
+        """A stage gets its own budget, capped by what is left of the request."""
+        return min(float(stage_budget_ms), self.remaining_ms())
+
+
+class _StageBudget:
+    def __init__(self, timeout_ms: float):
+        self.end = time.perf_counter() + timeout_ms / 1000.0
+        self.abandoned = False      # the caller stopped waiting
+        self.counted = False        # ... while the stage was still running (in the pool's abandoned count)
+
+    def expired(self) -> bool:
+        return self.abandoned or time.perf_counter() >= self.end
+
+
+def stage_expired() -> bool:
+    """True once the running stage's slice is spent (always False outside run_with_timeout)."""
+    budget = _stage.get()
+    return budget is not None and budget.expired()
+
+
+def check_stage() -> None:
+    """Raise StageTimeout when the running stage's slice is spent; call between steps of long work."""
+    if stage_expired():
+        raise StageTimeout("stage budget spent")
+
+
+def _run_stage(budget: _StageBudget, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    _stage.set(budget)
+    check_stage()           # queued past its slice: the caller has already degraded
+    return fn(*args, **kwargs)
+
+
+def stage_load(pool: ThreadPoolExecutor = None) -> Dict[str, int]:
+    """{"in_flight": running + queued stages, "abandoned": those whose caller stopped waiting}."""
+    with _loads_lock:
+        return dict(_loads.get(pool or _pool) or {"in_flight": 0, "abandoned": 0})
+
+
+def run_with_timeout(fn: Callable[..., Any], timeout_ms: float, *args, **kwargs) -> Any:
+    if timeout_ms <= 0:
+        raise StageTimeout("no budget left")
+    iso = _isolation.get()
+    pool = iso["pool"] if iso else _pool
+    budget = _StageBudget(timeout_ms)
+    with _loads_lock:
+        load = _loads.setdefault(pool, {"in_flight": 0, "abandoned": 0})
+        if load["in_flight"] >= pool._max_workers + STAGE_MAX_QUEUED:
+            raise StageTimeout(f"stage pool saturated ({load['abandoned']} abandoned stages running)")
+        load["in_flight"] += 1
+
+    def done(_):
+        with _loads_lock:
+            load["in_flight"] -= 1
+            load["abandoned"] -= budget.counted
+
+    # run in the caller's context so the stage sees the request's tenant catalog
+    fut = pool.submit(contextvars.copy_context().run, _run_stage, budget, fn, *args, **kwargs)
+    fut.add_done_callback(done)
+    try:
+        return fut.result(timeout=timeout_ms / 1000.0)
+    except FutureTimeout:
+        budget.abandoned = True
+        if not fut.cancel():
+            with _loads_lock:
+                if not fut.done():
+                    budget.counted = True
+                    load["abandoned"] += 1
+        raise StageTimeout(f"exceeded {timeout_ms:.0f} ms")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, max_failures: int = 3, cooldown_s: float = 30.0):
+        self.name = name
+        self.max_failures = max_failures
+        self.cooldown_s = cooldown_s
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown_s:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """False while open; once the cooldown passes, admit a single trial call."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_s or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.max_failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+@contextmanager
+def isolated(pool: ThreadPoolExecutor, breakers: Dict[str, "CircuitBreaker"]):
+    """Within the block, stages run on `pool` and breaker_for() swaps breakers by name."""
+    token = _isolation.set({"pool": pool, "breakers": breakers})
+    try:
+        yield
+    finally:
+        _isolation.reset(token)
+
+
+def breaker_for(breaker: CircuitBreaker) -> CircuitBreaker:
+    iso = _isolation.get()
+    return iso["breakers"].get(breaker.name, breaker) if iso else breaker
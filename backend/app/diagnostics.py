@@ -0,0 +1,298 @@
+"""
+Runtime diagnostics for a live worker (served under /api/admin, see
+api/routes_admin.py; needs ADMIN_TOKEN).
+
+- memory_report(): process RSS next to per-component estimates: tenant
+  catalogs and their indexes, in-process caches, loaded model parameters,
+  PDF temp files and the Mongo pool settings.
+- tracemalloc: started on demand, numbered snapshots kept in memory
+  (at most DIAG_MAX_SNAPSHOTS), top allocation sites and diffs between two.
+- profile(): a wall-clock sampler reading sys._current_frames() every
+  interval for N seconds; returns collapsed stacks
+  ("thread;file:func;file:func count" lines, for flamegraph.pl / speedscope).
+
+Nothing here runs unless called: tracemalloc is off until started and
+stacks are only sampled during a profile request.
+"""
+import os, sys, gc, glob, time, tempfile, threading, tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from . import store, tenants
+
+DIAG_MAX_SNAPSHOTS = int(os.getenv("DIAG_MAX_SNAPSHOTS", "8"))
+DIAG_MAX_PROFILE_S = float(os.getenv("DIAG_MAX_PROFILE_S", "60"))
+DIAG_TRACE_FRAMES = int(os.getenv("DIAG_TRACE_FRAMES", "10"))
+_MB = 1048576.0
+
+# allocations made by tracemalloc itself or by imports are noise in every report
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class DiagnosticsError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ---------- memory estimates ----------
+def _mb(n: float) -> float:
+    return round(n / _MB, 2)
+
+
+def process_memory() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"pid": os.getpid(), "threads": threading.active_count(),
+                           "gc_objects": len(gc.get_objects()), "gc_counts": list(gc.get_count())}
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                key, _, val = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "VmSize", "RssAnon", "RssFile"):
+                    out[key.lower() + "_mb"] = _mb(int(val.split()[0]) * 1024)
+    except OSError:
+        import resource      # non-Linux: peak RSS only (kB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out["vmhwm_mb"] = _mb(peak if sys.platform == "darwin" else peak * 1024)
+    return out
+
+
+def _model_params(model: Any) -> Optional[Dict[str, Any]]:
+    """Parameter count and bytes of a torch-backed model wrapper, without importing torch."""
+    for attr in (None, "client", "model", "_client"):
+        m = model if attr is None else getattr(model, attr, None)
+        params = getattr(m, "parameters", None)
+        if callable(params):
+            try:
+                n = size = 0
+                for p in params():
+                    n += p.numel()
+                    size += p.numel() * p.element_size()
+                return {"class": type(model).__name__, "parameters": n, "mb": _mb(size)}
+            except Exception:
+                continue
+    return {"class": type(model).__name__, "parameters": None, "mb": None}
+
+
+def models_memory() -> Dict[str, Any]:
+    # read retrieval's globals only if it is already imported: importing it loads the models
+    retrieval = sys.modules.get("app.retrieval")
+    if retrieval is None:
+        return {"loaded": False}
+    out: Dict[str, Any] = {"loaded": True, "sidecar": getattr(retrieval, "MODEL_SERVER_SOCKET", None)}
+    for name, attr in (("embedder", "_embed"), ("cross_encoder", "_ce")):
+        m = getattr(retrieval, attr, None)
+        out[name] = _model_params(m) if m is not None else None
+    # cross-encoders loaded for rerank(model=...), e.g. by shadow runs (None: failed to load)
+    out["alt_cross_encoders"] = {name: _model_params(m) if m is not None else None
+                                 for name, m in dict(getattr(retrieval, "_alt_ce", {})).items()}
+    return out
+
+
+def caches_memory() -> Dict[str, Any]:
+    """Caches outside the tenant budget, plus per-tenant counts. Modules not imported yet are skipped."""
+    out: Dict[str, Any] = {}
+    plan_table = sys.modules.get("app.plan_table")
+    table = getattr(plan_table, "_table", None) if plan_table else None
+    # approx_size extrapolates entries and plans from a sample, so this stays cheap on large tables
+    out["plan_table"] = {"entries": len(table.get("entries", {})), "plans": len(table.get("plans", [])),
+                         "mb": _mb(tenants.approx_size(table))} if table else None
+    readvise = sys.modules.get("app.readvise")
+    if readvise is not None:
+        with readvise._lock:
+            states = list(readvise._states.values())
+        out["delta_states"] = {"entries": len(states), "mb": _mb(tenants.approx_size(states))}
+    shadow = sys.modules.get("app.shadow")
+    if shadow is not None:
+        with shadow._lock:
+            records = list(shadow._records)
+        out["shadow_records"] = {"entries": len(records), "window": shadow._records.maxlen,
+                                 "mb": _mb(tenants.approx_size(records))}
+    out["source_versions"] = len(getattr(store, "_source_versions", {}))
+    skills_memo, parsed, ce_tokens = {}, {}, {}
+    for tenant, cat in tenants.REGISTRY.resident().items():
+        idx = cat.indexes.get("skills")
+        if idx is not None:
+            skills_memo[tenant] = len(idx._memo)
+        if isinstance(cat.courses, store.CourseList):
+            parsed[tenant] = sum(c is not None for c in cat.courses._cache)
+        # tokenized course texts per cross-encoder tokenizer (also counted in the tenant's indexes)
+        toks = {name.split(":", 1)[1]: {"documents": len(t),
+                                         "mb": _mb(t.flat.nbytes + t.offsets.nbytes + t.digests.nbytes)}
+                for name, t in list(cat.indexes.items()) if name.startswith("ce_tokens:")}
+        if toks:
+            ce_tokens[tenant] = toks
+    out["skill_memo_entries"] = skills_memo
+    out["lazily_parsed_courses"] = parsed
+    out["ce_tokens"] = ce_tokens
+    return out
+
+
+def pdf_files() -> Dict[str, Any]:
+    """plan-*.pdf temp files not yet removed by their response's background task."""
+    paths = glob.glob(os.path.join(tempfile.gettempdir(), "plan-*.pdf"))
+    size = 0
+    for p in paths:
+        try:
+            size += os.path.getsize(p)
+        except OSError:
+            pass
+    return {"files": len(paths), "mb": _mb(size)}
+
+
+def mongo_pool() -> Dict[str, Any]:
+    atlas_query = sys.modules.get("app.atlas_query")
+    client = getattr(atlas_query, "_client", None) if atlas_query else None
+    if client is None:
+        return {"connected": False}
+    opts = getattr(client, "options", None)
+    pool = getattr(opts, "pool_options", None)
+    return {"connected": True, "max_pool_size": getattr(pool, "max_pool_size", None),
+            "min_pool_size": getattr(pool, "min_pool_size", None)}
+
+
+def memory_report() -> Dict[str, Any]:
+    sizes = tenants.REGISTRY.sizes()
+    return {
+        "process": process_memory(),
+        "tenants": {t: {"catalog_mb": _mb(b.get("base", 0)),
+                        "indexes_mb": {k: _mb(v) for k, v in b.items() if k != "base"},
+                        "total_mb": _mb(sum(b.values()))}
+                    for t, b in sizes.items()},
+        "caches": caches_memory(),
+        "models": models_memory(),
+        "pdf_temp": pdf_files(),
+        "mongo": mongo_pool(),
+        "tracemalloc": tracemalloc_status(),
+        "note": "tenant and cache sizes are approx_size estimates (array bytes plus a per-object cost, "
+                "large containers extrapolated from a sample); compare them with each other and with RSS deltas",
+    }
+
+
+# ---------- tracemalloc ----------
+_snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+_snap_seq = 0
+_snap_lock = threading.Lock()
+
+
+def tracemalloc_status() -> Dict[str, Any]:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "snapshots": list(_snapshots)}
+    cur, peak = tracemalloc.get_traced_memory()
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit(), "traced_mb": _mb(cur),
+            "peak_mb": _mb(peak), "overhead_mb": _mb(tracemalloc.get_tracemalloc_memory()),
+            "snapshots": list(_snapshots)}
+
+
+def start_tracing(frames: int = DIAG_TRACE_FRAMES) -> Dict[str, Any]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(int(frames), 100)))
+    return tracemalloc_status()
+
+
+def stop_tracing() -> Dict[str, Any]:
+    with _snap_lock:
+        _snapshots.clear()
+    tracemalloc.stop()
+    return tracemalloc_status()
+
+
+def take_snapshot() -> Dict[str, Any]:
+    global _snap_seq
+    if not tracemalloc.is_tracing():
+        raise DiagnosticsError("tracemalloc is not running; start it first", 409)
+    snap = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+    cur, peak = tracemalloc.get_traced_memory()
+    with _snap_lock:
+        _snap_seq += 1
+        _snapshots[_snap_seq] = {"snapshot": snap, "at": time.time(), "traced_mb": _mb(cur)}
+        while len(_snapshots) > DIAG_MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {"id": _snap_seq, "traced_mb": _mb(cur), "peak_mb": _mb(peak),
+            "rss_mb": process_memory().get("vmrss_mb")}
+
+
+def _snapshot(snap_id: int):
+    entry = _snapshots.get(snap_id)
+    if entry is None:
+        raise DiagnosticsError(f"unknown snapshot {snap_id} (kept: {list(_snapshots)})", 404)
+    return entry
+
+
+def _frames(stat) -> List[str]:
+    return [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+
+
+def top_allocations(snap_id: int, group_by: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    entry = _snapshot(snap_id)
+    stats = entry["snapshot"].statistics(group_by)
+    return {"id": snap_id, "at": entry["at"], "group_by": group_by,
+            "total_mb": _mb(sum(s.size for s in stats)),
+            "top": [{"where": _frames(s), "mb": _mb(s.size), "count": s.count} for s in stats[:limit]]}
+
+
+def diff(a: int, b: Optional[int] = None, group_by: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    """Allocation growth from snapshot a to b (b defaults to a new snapshot)."""
+    old = _snapshot(a)
+    if b is None:
+        b = take_snapshot()["id"]
+    new = _snapshot(b)
+    stats = new["snapshot"].compare_to(old["snapshot"], group_by)
+    return {"from": a, "to": b, "seconds": round(new["at"] - old["at"], 1), "group_by": group_by,
+            "growth_mb": _mb(sum(s.size_diff for s in stats)),
+            "top": [{"where": _frames(s), "mb": _mb(s.size), "diff_mb": _mb(s.size_diff),
+                     "count": s.count, "count_diff": s.count_diff} for s in stats[:limit]]}
+
+
+# ---------- sampling profiler ----------
+_profile_lock = threading.Lock()
+# innermost Python frames of threads blocked in C (locks, queues, selectors) rather than working
+_IDLE_FUNCS = {"wait", "select", "poll", "accept", "_worker", "_wait_for_tstate_lock"}
+
+
+def _collapse(frame, thread_name: str) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+def profile(seconds: float, interval_ms: float = 10.0, idle: bool = False) -> Dict[str, Any]:
+    """
+    Sample every thread's stack for `seconds`. Threads parked in a wait
+    (thread pools, the event loop selector) are dropped unless `idle`.
+    """
+    seconds = float(seconds)
+    if not 0 < seconds <= DIAG_MAX_PROFILE_S:
+        raise DiagnosticsError(f"seconds must be in (0, {DIAG_MAX_PROFILE_S:g}]")
+    interval = max(1.0, float(interval_ms)) / 1000.0
+    if not _profile_lock.acquire(blocking=False):
+        raise DiagnosticsError("a profile is already running", 409)
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        t0 = time.perf_counter()
+        end = t0 + seconds
+        while time.perf_counter() < end:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not idle and frame.f_code.co_name in _IDLE_FUNCS:
+                    continue
+                stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+            samples += 1
+            time.sleep(interval)
+        elapsed = time.perf_counter() - t0
+    finally:
+        _profile_lock.release()
+    return {"seconds": round(elapsed, 2), "samples": samples,
+            "collapsed": "\n".join(f"{k} {v}" for k, v in stacks.most_common())}
@@ -0,0 +1,331 @@
+"""
+Bulk JD ingestion from free text.
+Skills are found with one pass of an Aho-Corasick automaton over the text's
+tokens, built from the catalog's skill vocabulary (course and JD skills) and
+the alias file, so "Node.js", "k8s" or "scikit learn" map to their canonical
+skill. Each mention gets a rough level (1-3) from cue words around it
+("basic", "solid", "expert", "5+ years", ...); mentions under a "nice to
+have" / "bonus" heading or sentence go to nice_to_have instead. Besides the
+catalog, the vocabulary includes SKILL_VOCABULARY (common skills no course
+teaches yet); requirement-list items that still match nothing are reported
+as "unmatched" so the vocabulary can grow.
+
+extract_many() fans large batches out to INGEST_WORKERS processes; the
+resulting JD records are merged into a tenant with store.upsert_jds().
+"""
+import os, re
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import store, skills
+from .models import JD
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+INGEST_PARALLEL_MIN = int(os.getenv("INGEST_PARALLEL_MIN", "2000"))     # smaller batches stay in-process
+INGEST_CHUNK = int(os.getenv("INGEST_CHUNK", "500"))
+INGEST_MAX_SKILLS = int(os.getenv("INGEST_MAX_SKILLS", "15"))
+
+_JOIN_RE = re.compile(r"(?<=[a-z0-9])[.\-](?=[a-z0-9])")
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_LINE_RE = re.compile(r"[\n\r•;]+|\.\s+")
+_YEARS_RE = re.compile(r"(\d{1,2})\s*\+?\s*(?:years|yrs)")
+
+# course tags that are ordinary words in prose ("state of the art", "the rest of"); their aliases still match
+AMBIGUOUS_SKILLS = {
+    "state", "events", "functions", "loops", "props", "images", "storage", "context", "compute",
+    "merge", "branches", "performance", "evaluation", "modules", "interfaces", "queries", "indexes",
+    "sampling", "resilience", "hooks", "joins", "schemas", "containers", "deployments", "aggregation",
+    "scripting", "generics", "storytelling", "dashboards", "rest", "shell",
+    "go", "spring", "express", "helm", "excel", "unity",
+}
+_LEVEL_CUES = {
+    3: ("expert", "advanced", "deep", "extensive", "strong", "mastery", "senior", "architect", "in-depth"),
+    2: ("solid", "proficient", "proficiency", "working", "hands-on", "experience", "experienced", "good"),
+    1: ("basic", "basics", "familiarity", "familiar", "exposure", "understanding", "awareness", "some"),
+}
+_CUE_LEVEL = {w: lvl for lvl, words in _LEVEL_CUES.items() for w in words}
+_NICE_RE = re.compile(r"nice[ -]to[ -]have|good to have|bonus|\ba plus\b|preferred")
+_MUST_RE = re.compile(r"requirement|required|must[ -]have|qualifications|you have|what you")
+_CUE_WINDOW = 6        # tokens before a mention searched for level cues
+# unmatched-phrase report: list items of requirement lines that name no known skill
+_ITEM_RE = re.compile(r"[a-z0-9][a-z0-9+#]*|[,/()&:|]")     # word tokens as in tokenize(), plus separators
+_ITEM_WORDS = {"and", "or"}                                   # also separate list items
+_FILLER = {
+    "with", "in", "of", "the", "a", "an", "to", "for", "on", "using", "use", "knowledge", "years", "year",
+    "plus", "etc", "including", "such", "as", "like", "eg", "e", "g", "ie", "skills", "skill", "tools",
+    "frameworks", "framework", "technologies", "languages", "language", "stack", "is", "are", "be",
+    "you", "have", "has", "we", "our", "your", "at", "least", "ability", "requirements", "required",
+    "must", "similar", "other", "modern", "any", "more", "than", "both", "either", "well", "degree",
+}
+UNMATCHED_REPORTED = 50
+
+
+def tokenize(text: str) -> List[str]:
+    """Word tokens of lowercase text; '.' and '-' inside a word are dropped ("node.js" -> "nodejs")."""
+    return _TOKEN_RE.findall(_JOIN_RE.sub("", text))
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over token sequences: all matches in one left-to-right pass."""
+
+    def __init__(self, patterns: Dict[Tuple[str, ...], Any]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, Any]]] = [[]]        # (pattern length, value) per state
+        for toks, value in patterns.items():
+            s = 0
+            for t in toks:
+                nxt = self.goto[s].get(t)
+                if nxt is None:
+                    nxt = self.goto[s][t] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                s = nxt
+            self.out[s].append((len(toks), value))
+        queue = list(self.goto[0].values())
+        for s in queue:                                       # BFS: fail links of shallower states first
+            for t, nxt in self.goto[s].items():
+                queue.append(nxt)
+                f = self.fail[s]
+                while f and t not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(t, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        # a token outside every pattern can only send the automaton back to the root
+        self.alphabet = frozenset(t for g in self.goto for t in g)
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def finditer(self, tokens: Sequence[str]):
+        """(start token index, pattern length, value) for every match, longest first at each end."""
+        goto, fail, out, alphabet = self.goto, self.fail, self.out, self.alphabet
+        s = 0
+        for i, t in enumerate(tokens):
+            if t not in alphabet:
+                s = 0
+                continue
+            while s and t not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(t, 0)
+            for n, value in out[s]:
+                yield i - n + 1, n, value
+
+
+def surface_patterns(cat=None) -> Dict[str, str]:
+    """Surface form -> canonical skill label, from the catalog vocabulary, SKILL_VOCABULARY and the alias file."""
+    cat = cat or store.catalog()
+    taxonomy = skills.index(cat)
+    forms: List[str] = []
+    for c in cat.courses:
+        forms.extend(c.skills or [])
+    for jd in cat.jds:
+        forms.extend(x.skill for x in jd.skills_required or [])
+    for path in (skills.SKILL_VOCABULARY, skills.aliases_path(cat.data_dir)):
+        for label, alts in skills.load_aliases(path).items():
+            forms.append(label)
+            forms.extend(alts)
+    out: Dict[str, str] = {}
+    for f in forms:
+        f = f.strip().lower()
+        if not f or f in AMBIGUOUS_SKILLS:
+            continue
+        cid = taxonomy.canonical(f, fuzzy=False)
+        if cid:
+            out.setdefault(f, taxonomy.label(cid))
+    return out
+
+
+class SkillExtractor:
+    def __init__(self, patterns: Dict[str, str]):
+        self.patterns = patterns
+        # level cue words go through the same automaton, so one pass finds skills and cues
+        table: Dict[Tuple[str, ...], Any] = {tuple(tokenize(w)): lvl for w, lvl in _CUE_LEVEL.items()}
+        for f, label in patterns.items():
+            toks = tuple(tokenize(f.lower()))
+            if toks:
+                table[toks] = label
+        self.matcher = AhoCorasick(table)
+
+    def extract(self, text: str, unmatched: Dict[str, int] = None) -> Tuple[Dict[str, int], List[str]]:
+        """
+        ({skill label: level}, nice-to-have labels), skills in order of first mention.
+        With `unmatched`, each short list item (at most 3 words) that names no
+        known skill, on a line that names one or under a requirements heading
+        ("quarkus" in "Java, Quarkus and Kafka"), is counted there, once per text.
+        """
+        found: Dict[str, int] = {}
+        missed: Dict[str, None] = {}
+        counts: Dict[str, int] = {}
+        nice: Dict[str, None] = {}
+        text = (text or "").lower()
+        # whole-text prechecks: most JDs have no nice-to-have part and no "N years"
+        has_nice = _NICE_RE.search(text) is not None
+        has_years = _YEARS_RE.search(text) is not None
+        section_nice = section_must = False
+        for line in _LINE_RE.split(text):
+            is_nice = False
+            if has_nice:
+                is_nice = _NICE_RE.search(line) is not None
+                if (is_nice or _MUST_RE.search(line)) and len(line.split()) <= 6:
+                    section_nice = is_nice          # a heading switches the section
+            if unmatched is not None and len(line.split()) <= 6 and (line.rstrip().endswith(":")
+                                                                   or _MUST_RE.search(line)):
+                section_must = _MUST_RE.search(line) is not None
+            cuts: List[int] = []        # token positions that follow a list separator
+            if unmatched is None:
+                toks = tokenize(line)
+            else:
+                toks = []
+                for t in _ITEM_RE.findall(_JOIN_RE.sub("", line)):
+                    if t[0].isalnum():
+                        toks.append(t)
+                    else:
+                        cuts.append(len(toks))
+            if not toks:
+                continue
+            years = max((int(y) for y in _YEARS_RE.findall(line)), default=0) if has_years else 0
+            line_nice = section_nice or is_nice
+            # matches arrive by end position, longest first; a longer match replaces the
+            # shorter one it covers ("github actions" over "github")
+            spans: List[List[Any]] = []
+            cues: List[Tuple[int, int]] = []
+            last_end = -1
+            for start, n, value in self.matcher.finditer(toks):
+                if value.__class__ is int:
+                    cues.append((start, value))
+                    continue
+                end = start + n - 1
+                if end == last_end:
+                    continue
+                if spans and start <= spans[-1][1]:
+                    if start > spans[-1][0]:
+                        continue
+                    spans.pop()
+                spans.append([start, end, value])
+                last_end = end
+            if unmatched is not None and not line_nice and (spans or section_must):
+                _unmatched(toks, cuts, spans, missed)
+            for start, _, label in spans:
+                if line_nice:
+                    if label not in found:
+                        nice.setdefault(label)
+                    continue
+                level = 0
+                for at, lvl in cues:
+                    if start - _CUE_WINDOW <= at < start and lvl > level:
+                        level = lvl
+                if years:
+                    level = max(level, 3 if years >= 5 else 2)
+                level = level or 1
+                found[label] = max(found.get(label, 0), level)
+                counts[label] = counts.get(label, 0) + 1
+        if len(found) > INGEST_MAX_SKILLS:
+            keep = set(sorted(found, key=lambda s: (-found[s], -counts[s]))[:INGEST_MAX_SKILLS])
+            found = {s: lvl for s, lvl in found.items() if s in keep}
+        for phrase in missed:
+            unmatched[phrase] = unmatched.get(phrase, 0) + 1
+        return found, [s for s in nice if s not in found]
+
+
+def _unmatched(toks: List[str], cuts: List[int], spans: List[List[Any]], out: Dict[str, None]) -> None:
+    """List items of one line (split at separators, "and", "or") with 1-3 content words and no skill match."""
+    covered = {i for start, end, _ in spans for i in range(start, end + 1)}
+    bounds = set(cuts)
+    bounds.add(len(toks))
+    item: List[int] = []
+    for i in range(len(toks) + 1):
+        sep = i < len(toks) and toks[i] in _ITEM_WORDS
+        if i in bounds or sep:
+            words = [toks[j] for j in item if toks[j] not in _FILLER and toks[j] not in _CUE_LEVEL]
+            if (1 <= len(words) <= 3 and not any(j in covered for j in item)
+                    and not any(w.isdigit() for w in words)):
+                out.setdefault(" ".join(words))
+            item = []
+        if i < len(toks) and not sep:
+            item.append(i)
+
+
+def role_of(record: Dict[str, Any]) -> str:
+    role = (record.get("role") or record.get("title") or "").strip()
+    if not role:
+        role = next((ln.strip() for ln in (record.get("text") or "").splitlines() if ln.strip()), "")
+    return role[:120]
+
+
+def to_jd(record: Dict[str, Any], extractor: SkillExtractor,
+          unmatched: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+    """JD dict for a {"role", "text"} record; None without a role or any required skill."""
+    role = role_of(record)
+    found, nice = extractor.extract(record.get("text") or "", unmatched)
+    if not role or not found:
+        return None
+    return {"role": role,
+            "skills_required": [{"skill": s, "level": lvl} for s, lvl in found.items()],
+            "nice_to_have": nice}
+
+
+# ---------- batches ----------
+_worker_extractor: Optional[SkillExtractor] = None
+
+
+def _init_worker(patterns: Dict[str, str]) -> None:
+    global _worker_extractor
+    _worker_extractor = SkillExtractor(patterns)
+
+
+def _extract_chunk(records: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], Dict[str, int]]:
+    unmatched: Dict[str, int] = {}
+    return [to_jd(r, _worker_extractor, unmatched) for r in records], unmatched
+
+
+def extract_many(records: Sequence[Dict[str, Any]], patterns: Dict[str, str] = None,
+                 workers: int = None, unmatched: Dict[str, int] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    One JD dict (or None) per record, in input order. Batches of at least
+    INGEST_PARALLEL_MIN records are split across `workers` processes.
+    `unmatched` collects requirement phrases no skill matched: phrase -> JDs.
+    """
+    patterns = patterns if patterns is not None else surface_patterns()
+    workers = INGEST_WORKERS if workers is None else max(1, workers)
+    if workers == 1 or len(records) < INGEST_PARALLEL_MIN:
+        ex = SkillExtractor(patterns)
+        return [to_jd(r, ex, unmatched) for r in records]
+    chunks = [list(records[i:i + INGEST_CHUNK]) for i in range(0, len(records), INGEST_CHUNK)]
+    # spawn: forking a server process with live threads and sockets is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(patterns,)) as pool:
+        out: List[Optional[Dict[str, Any]]] = []
+        for part, missed in pool.map(_extract_chunk, chunks):
+            out.extend(part)
+            if unmatched is not None:
+                for phrase, n in missed.items():
+                    unmatched[phrase] = unmatched.get(phrase, 0) + n
+    return out
+
+
+def top_unmatched(unmatched: Dict[str, int], n: int = UNMATCHED_REPORTED) -> List[Dict[str, Any]]:
+    """The n phrases missed in the most JDs: [{"phrase", "jds"}], for growing SKILL_VOCABULARY."""
+    ranked = sorted(unmatched.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+    return [{"phrase": p, "jds": c} for p, c in ranked]
+
+
+def ingest(records: Sequence[Dict[str, Any]], workers: int = None, dry_run: bool = False,
+           persist: bool = False) -> Dict[str, Any]:
+    """Extract JDs from free-text records and merge them into the current tenant."""
+    unmatched: Dict[str, int] = {}
+    extracted = extract_many(records, workers=workers, unmatched=unmatched)
+    jds = [JD(**d) for d in extracted if d is not None]
+    empty = [role_of(r) or f"#{i}" for i, (r, d) in enumerate(zip(records, extracted)) if d is None]
+    out: Dict[str, Any] = {"received": len(records), "extracted": len(jds), "empty": empty[:50],
+                           "unmatched": top_unmatched(unmatched)}
+    if dry_run:
+        out["jds"] = [j.model_dump() for j in jds]
+        return out
+    added, replaced = store.upsert_jds(jds)
+    out.update(added=added, replaced=replaced, roles=len(store.JDS), version=store.CATALOG_VERSION)
+    if persist:
+        out["saved_to"] = store.save_jds()
+    return out
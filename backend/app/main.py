@@ -1,10 +1,14 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from .observability import logger
 from .store import load_data
+from . import planner, tenants
 from .api.routes_advise import router as advise_router
 from .api.routes_courses import router as courses_router
 from .api.routes_debug import router as debug_router
+from .api.routes_admin import router as admin_router
 
 app = FastAPI(title="Upskill Advisor API", version="1.0.0", docs_url="/docs", redoc_url="/redoc")
 
@@ -16,6 +20,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def tenant_scope(request: Request, call_next):
+    """Bind the request to its tenant's catalog (X-Tenant header or /t/<tenant>/ prefix)."""
+    try:
+        name = tenants.tenant_for(request.scope)
+        cat = await run_in_threadpool(tenants.REGISTRY.get, name)   # cold tenants load off the event loop
+    except tenants.UnknownTenant as ex:
+        return JSONResponse({"detail": str(ex)}, status_code=404)
+    with tenants.use(cat):
+        return await call_next(request)
+
 @app.middleware("http")
 async def tracing(request: Request, call_next):
     response = await call_next(request)
@@ -27,6 +42,7 @@ load_data()
 @app.on_event("startup")
 def _startup():
     load_data()
+    planner.graph()      # prerequisite DAG, built once per catalog version
 
 @app.get("/")
 def root():
@@ -34,4 +50,5 @@ def root():
 
 app.include_router(courses_router, prefix="/api", tags=["courses"])
 app.include_router(advise_router,  prefix="/api", tags=["advise"])
-app.include_router(debug_router,   prefix="/api", tags=["debug"])
\ No newline at end of file
+app.include_router(debug_router,   prefix="/api", tags=["debug"])
+app.include_router(admin_router,   prefix="/api", tags=["admin"])
\ No newline at end of file
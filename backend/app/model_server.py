@@ -0,0 +1,262 @@
+"""
+Local inference sidecar: one process owns the embedder and cross-encoder and
+serves them to every API worker over a Unix domain socket.
+
+  MODEL_SERVER_SOCKET=/tmp/upskill-models.sock python -m app.model_server
+
+Workers started with the same MODEL_SERVER_SOCKET become thin clients
+(see retrieval.embed_* / retrieval.ce_scores) and only load models in-process
+if the sidecar is unreachable; with MODEL_SERVER_ONLY=1 they never do, and
+run without vectors / reranking until it is back. Embed and rerank calls
+have separate circuit breakers.
+
+Wire format: every message is a 4-byte big-endian length + JSON header,
+optionally followed by one more frame of raw float32 bytes (results).
+Requests:  {"op": "embed", "texts": [...]}  |  {"op": "rerank", "pairs": [[q, doc], ...]}
+           {"op": "ping"}
+Concurrent requests are coalesced by a single model thread into batches of up
+to MODEL_MAX_BATCH items (waiting at most MODEL_BATCH_WAIT_MS), so the models
+run on one set of MODEL_TORCH_THREADS threads instead of one per worker.
+"""
+import os, sys, json, time, queue, socket, struct, threading, socketserver
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")
+MODEL_TORCH_THREADS = int(os.getenv("MODEL_TORCH_THREADS", "0"))      # 0 = torch default
+MODEL_CPU_AFFINITY = os.getenv("MODEL_CPU_AFFINITY", "")              # e.g. "0-3" or "0,2,4"
+MODEL_MAX_BATCH = int(os.getenv("MODEL_MAX_BATCH", "64"))
+MODEL_BATCH_WAIT_MS = float(os.getenv("MODEL_BATCH_WAIT_MS", "2"))
+MODEL_CLIENT_TIMEOUT_S = float(os.getenv("MODEL_CLIENT_TIMEOUT_S", "5"))
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+# ---------- framing ----------
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("socket closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (n,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return _recv_exact(sock, n)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], array: Optional[np.ndarray] = None) -> None:
+    if array is not None:
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        header = {**header, "shape": list(array.shape)}
+    _send_frame(sock, json.dumps(header).encode("utf-8"))
+    if array is not None:
+        _send_frame(sock, array.tobytes())
+
+
+def recv_message(sock: socket.socket) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+    header = json.loads(_recv_frame(sock).decode("utf-8"))
+    array = None
+    if "shape" in header:
+        array = np.frombuffer(_recv_frame(sock), dtype=np.float32).reshape(header["shape"])
+    return header, array
+
+
+# ---------- server ----------
+def parse_cpus(spec: str) -> List[int]:
+    cpus: List[int] = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+class _Batcher:
+    """Single model thread; coalesces queued items of the same op into one call."""
+
+    def __init__(self, embed_fn, rerank_fn):
+        self._fns = {"embed": embed_fn, "rerank": rerank_fn}
+        self._q: "queue.Queue" = queue.Queue()
+        threading.Thread(target=self._loop, name="model-batcher", daemon=True).start()
+
+    def submit(self, op: str, items: List[Any]) -> np.ndarray:
+        if self._fns.get(op) is None:
+            raise ModelServerError(f"model for '{op}' not loaded")
+        done = threading.Event()
+        slot: Dict[str, Any] = {}
+        self._q.put((op, items, slot, done))
+        done.wait()
+        if "error" in slot:
+            raise ModelServerError(slot["error"])
+        return slot["result"]
+
+    def _loop(self):
+        while True:
+            jobs = [self._q.get()]
+            size = len(jobs[0][1])
+            deadline = time.monotonic() + MODEL_BATCH_WAIT_MS / 1000.0
+            while size < MODEL_MAX_BATCH:
+                try:
+                    nxt = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                jobs.append(nxt)
+                size += len(nxt[1])
+            for op in {j[0] for j in jobs}:
+                group = [j for j in jobs if j[0] == op]
+                flat = [x for j in group for x in j[1]]
+                try:
+                    out = np.asarray(self._fns[op](flat), dtype=np.float32) if flat else np.zeros((0,), np.float32)
+                    start = 0
+                    for _, items, slot, _ in group:
+                        slot["result"] = out[start:start + len(items)]
+                        start += len(items)
+                except Exception as ex:
+                    for _, _, slot, _ in group:
+                        slot["error"] = repr(ex)
+                for *_, done in group:
+                    done.set()
+
+
+def _load_models():
+    """Load models once, honouring MODEL_TORCH_THREADS / MODEL_CPU_AFFINITY."""
+    cpus = parse_cpus(MODEL_CPU_AFFINITY)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    import torch
+    if MODEL_TORCH_THREADS > 0:
+        torch.set_num_threads(MODEL_TORCH_THREADS)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from sentence_transformers import CrossEncoder
+
+    # same env vars / defaults as retrieval.py
+    embed = HuggingFaceEmbeddings(model_name=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    try:
+        ce = CrossEncoder(os.getenv("CROSS_ENCODER", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+    except Exception:
+        ce = None
+    from .ce_inputs import text_scorer
+    return embed.embed_documents, (text_scorer(ce) if ce is not None else None)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher: _Batcher = self.server.batcher
+        while True:
+            try:
+                req, _ = recv_message(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            op = req.get("op")
+            try:
+                if op == "ping":
+                    send_message(self.request, {"ok": True, "pid": os.getpid()})
+                elif op == "embed":
+                    send_message(self.request, {"ok": True}, batcher.submit("embed", list(req.get("texts") or [])))
+                elif op == "rerank":
+                    pairs = [tuple(p) for p in (req.get("pairs") or [])]
+                    send_message(self.request, {"ok": True}, batcher.submit("rerank", pairs))
+                else:
+                    send_message(self.request, {"ok": False, "error": f"unknown op {op!r}"})
+            except ModelServerError as ex:
+                send_message(self.request, {"ok": False, "error": str(ex)})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 256      # every worker thread keeps a connection open
+
+
+def serve(path: str, embed_fn=None, rerank_fn=None) -> _Server:
+    """Bind the socket and return the server (call serve_forever on it)."""
+    if embed_fn is None and rerank_fn is None:
+        embed_fn, rerank_fn = _load_models()
+    if os.path.exists(path):
+        os.unlink(path)
+    server = _Server(path, _Handler)
+    server.batcher = _Batcher(embed_fn, rerank_fn)
+    os.chmod(path, 0o660)
+    return server
+
+
+# ---------- client ----------
+class ModelClient:
+    """Thread-safe client; one persistent connection per calling thread."""
+
+    def __init__(self, path: str, timeout_s: float = MODEL_CLIENT_TIMEOUT_S):
+        self.path = path
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout_s)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, req: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        try:
+            sock = self._conn()
+            send_message(sock, req)
+            header, array = recv_message(sock)
+        except (OSError, ConnectionError, ValueError):
+            self.close()
+            raise
+        if not header.get("ok"):
+            raise ModelServerError(header.get("error", "model server error"))
+        return header, array
+
+    def close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def ping(self) -> Dict[str, Any]:
+        return self._call({"op": "ping"})[0]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self._call({"op": "embed", "texts": list(texts)})[1]
+
+    def rerank(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        return self._call({"op": "rerank", "pairs": [list(p) for p in pairs]})[1]
+
+
+def main():
+    path = MODEL_SERVER_SOCKET or (sys.argv[1] if len(sys.argv) > 1 else None)
+    if not path:
+        raise SystemExit("MODEL_SERVER_SOCKET not set")
+    server = serve(path)
+    print(f"model server listening on {path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,15 @@ class JD(BaseModel):
     skills_required: List[JDRequired]
     nice_to_have: List[str] = []
 
+class JDText(BaseModel):
+    text: str
+    role: Optional[str] = None         # defaults to the first line of text
+
+class JDIngestRequest(BaseModel):
+    jds: List[JDText]
+    dry_run: bool = False              # return the extracted JDs without merging them
+    persist: bool = False              # also write the merged list to the tenant's jds.json
+
 class Level(str, Enum):
     beginner = "beginner"
     intermediate = "intermediate"
@@ -31,6 +40,11 @@ class Profile(BaseModel):
     goal_role: str
     prefs: Optional[Dict] = None
 
+class DeltaRequest(BaseModel):
+    result_token: str                  # from a previous /advise or /advise/delta response
+    add: List[str] = []
+    remove: List[str] = []
+
 # ----- API Contracts -----
 class AdviseItem(BaseModel):
     course_id: str
@@ -46,6 +60,7 @@ class TimelineEntry(BaseModel):
     weeks: int
     start_week: int
     end_week: int
+    track: int = 0
 
 class Timeline(BaseModel):
     weeks: int
@@ -58,3 +73,4 @@ class AdviseResponse(BaseModel):
     notes: str
     usage: Dict[str, Any]
     latency_ms: int
+    result_token: Optional[str] = None   # pass to /advise/delta to edit this profile's skills
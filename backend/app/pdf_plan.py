@@ -109,7 +109,10 @@ def generate_pdf(path: str, goal: str, plan: List[Dict], gap_map: Dict[str, int]
     current_y -= 1.5 * line_height
 
     c.setFont("Helvetica", 12)
-    for idx, item in enumerate(plan[:3], 1):
+    for idx, item in enumerate(plan, 1):
+        if current_y < 120:
+            c.showPage()
+            current_y = height - 2 * cm
         c.setFont("Helvetica-Bold", 13)
         title = item.get('title', item.get('course_id', 'N/A'))
         difficulty = item.get('difficulty', 'N/A').capitalize()
@@ -171,6 +174,8 @@ def generate_pdf(path: str, goal: str, plan: List[Dict], gap_map: Dict[str, int]
             start = entry.get("start_week", 0)
             end = entry.get("end_week", 0)
             timeline_str = f"Weeks {start} to {end}: {title}"
+            if entry.get("track"):
+                timeline_str += f" (track {entry['track'] + 1})"
             current_y = draw_wrapped_string(c, margin_x + 10, current_y, timeline_str, max_width)
             current_y -= 0.8 * line_height
             if current_y < 80:
@@ -0,0 +1,196 @@
+"""
+Offline plan materialization.
+For a given catalog, advise() output depends on (role, level, missing JD
+skills), and each JD lists only a handful of skills, so every combination
+can be precomputed. Each entry is computed for the canonical profile that
+holds exactly the JD skills not in the missing set. advise() reads held JD
+skills by their JD label and the goal role as the resolved JD names it, so
+any spelling of that profile or role gets the same result; a profile with
+skills outside the JD is not in the table (they go into the retrieval query
+and count as known prerequisites) and misses. verify() checks hits against
+advise() on sampled profiles and role spellings.
+The table is keyed by store.CATALOG_VERSION and is ignored as soon as the
+live catalog differs.
+
+  python scripts/materialize_plans.py      # writes PLAN_TABLE_PATH
+
+Table layout (JSON): {"version", "max_skills", "entries": {key: plan_no}, "plans": [...]}
+identical results are stored once and shared by several keys.
+"""
+import os, json, random, itertools, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import store, skills
+from .role_index import normalize_role
+
+PLAN_TABLE_PATH = os.getenv("PLAN_TABLE_PATH", os.path.join(store.DATA_DIR, "plan_table.json"))
+PLAN_TABLE_MAX_SKILLS = int(os.getenv("PLAN_TABLE_MAX_SKILLS", "10"))
+LEVELS = ("beginner", "intermediate", "advanced")
+
+_table: Optional[Dict[str, Any]] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def plan_key(role: str, level: str, missing_norm: Iterable[str]) -> str:
+    return f"{normalize_role(role)}|{level}|{','.join(sorted(set(missing_norm)))}"
+
+
+def load(path: str = PLAN_TABLE_PATH) -> Optional[Dict[str, Any]]:
+    global _table, _loaded
+    with _lock:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _table = json.load(f)
+        except (OSError, ValueError):
+            _table = None
+        _loaded = True
+    return _table
+
+
+def lookup(user_skills: List[str], level: str, goal_role: str) -> Optional[Dict]:
+    """Precomputed advise() result for this request, or None on a miss / stale table."""
+    if not _loaded:
+        load()
+    table = _table
+    if not table or table.get("version") != store.CATALOG_VERSION:
+        return None
+    from .advisor import compute_gaps, split_skills   # advisor imports retrieval (models); keep this module light
+
+    jd, confidence = store.resolve_role(goal_role)
+    if jd is None:
+        return None
+    if split_skills(user_skills, goal_role)[1]:
+        return None
+    missing_norm, gap_map = compute_gaps(user_skills, goal_role)
+    n = table["entries"].get(plan_key(jd.role, level, missing_norm))
+    if n is None:
+        return None
+    out = json.loads(json.dumps(table["plans"][n]))   # callers may mutate the result
+    out["gap_map"] = gap_map
+    out["usage"]["role_match"] = {"role": jd.role, "confidence": confidence}
+    out["usage"]["plan_table"] = "hit"
+    return out
+
+
+def _jd_skills(jd) -> List[Tuple[str, str]]:
+    """(canonical id, label) per required skill, de-duplicated, JD order."""
+    taxonomy = skills.index()
+    seen, out = set(), []
+    for x in jd.skills_required or []:
+        n = taxonomy.resolve(x.skill)
+        if n not in seen:
+            seen.add(n)
+            out.append((n, x.skill))
+    return out
+
+
+def materialize(max_skills: int = PLAN_TABLE_MAX_SKILLS, deadline_ms: float = 60000,
+                progress=None) -> Dict[str, Any]:
+    """
+    Run advise() for every (role, level, held-skill subset) and build the table.
+    Roles with more than `max_skills` required skills are left to runtime.
+    Results that hit a deadline degradation are not stored.
+    """
+    from .advisor import advise
+
+    entries: Dict[str, int] = {}
+    plans: List[Dict[str, Any]] = []
+    plan_no: Dict[str, int] = {}
+    skipped_roles: List[str] = []
+    for jd in store.JDS:
+        skills = _jd_skills(jd)
+        if len(skills) > max_skills:
+            skipped_roles.append(jd.role)
+            continue
+        for r in range(len(skills) + 1):
+            for held in itertools.combinations(skills, r):
+                held_norm = {n for n, _ in held}
+                missing = [n for n, _ in skills if n not in held_norm]
+                for level in LEVELS:
+                    key = plan_key(jd.role, level, missing)
+                    if key in entries:
+                        continue
+                    res = advise([label for _, label in held], level, jd.role, deadline_ms=deadline_ms)
+                    if res["usage"].get("degraded"):
+                        continue
+                    res["usage"].pop("stages_ms", None)
+                    blob = json.dumps(res, sort_keys=True)
+                    if blob not in plan_no:
+                        plan_no[blob] = len(plans)
+                        plans.append(res)
+                    entries[key] = plan_no[blob]
+                    if progress:
+                        progress(len(entries))
+    return {
+        "version": store.CATALOG_VERSION,
+        "max_skills": max_skills,
+        "skipped_roles": skipped_roles,
+        "entries": entries,
+        "plans": plans,
+    }
+
+
+def _comparable(res: Dict[str, Any]) -> Dict[str, Any]:
+    """res without timings and table markers."""
+    usage = {k: v for k, v in res["usage"].items() if k not in ("stages_ms", "deadline_ms", "plan_table")}
+    if usage.get("planner"):
+        usage["planner"] = {k: v for k, v in usage["planner"].items() if k != "elapsed_ms"}
+    return {**res, "usage": usage}
+
+
+def _role_spellings(role: str, rng: random.Random) -> List[str]:
+    """role as a user might type it: as is, lower case, with a seniority word, abbreviated, with a typo."""
+    words = role.split()
+    out = [role, role.lower(), f"Sr. {role}"]
+    short = {"developer": "Dev", "engineer": "Eng", "manager": "Mgr"}
+    if words[-1].lower() in short:
+        out.append(" ".join(words[:-1] + [short[words[-1].lower()]]))
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    w = words[i]
+    if len(w) >= 5:
+        k = rng.randrange(1, len(w) - 2)
+        out.append(" ".join(words[:i] + [w[:k] + w[k + 1] + w[k] + w[k + 2:]] + words[i + 1:]))
+    return out
+
+
+def verify(samples: int = 50, seed: int = 0, deadline_ms: float = 60000) -> List[Dict[str, Any]]:
+    """
+    lookup() against advise() for `samples` random table profiles (held JD
+    skills spelled in lower case, in random order; the role as is, or as an
+    alias or typo that still resolves to the JD). Returns the mismatches;
+    runs where advise() degraded are not compared.
+    """
+    from .advisor import advise
+
+    if not _loaded:
+        load()
+    rng = random.Random(seed)
+    jds = [jd for jd in store.JDS if len(_jd_skills(jd)) <= (_table or {}).get("max_skills", 0)]
+    mismatches = []
+    for _ in range(samples if jds else 0):
+        jd = rng.choice(jds)
+        held = [label.lower() for _, label in _jd_skills(jd) if rng.random() < 0.5]
+        rng.shuffle(held)
+        level = rng.choice(LEVELS)
+        spellings = [r for r in _role_spellings(jd.role, rng) if store.resolve_role(r)[0] is jd]
+        if not spellings:       # a duplicate role: the table has it under the first JD
+            continue
+        role = rng.choice(spellings)
+        hit = lookup(held, level, role)
+        if hit is None:
+            mismatches.append({"role": role, "level": level, "skills": held, "reason": "miss"})
+            continue
+        res = advise(held, level, role, deadline_ms=deadline_ms)
+        if res["usage"].get("degraded"):
+            continue
+        if _comparable(hit) != _comparable(json.loads(json.dumps(res))):
+            mismatches.append({"role": role, "level": level, "skills": held, "reason": "differs"})
+    return mismatches
+
+
+def save(table: Dict[str, Any], path: str = PLAN_TABLE_PATH) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,420 @@
+"""
+Plan optimizer: picks the set of courses that closes the skill gap.
+Built once per catalog version (CatalogGraph):
+- skill -> courses postings, keeping the cheapest PLANNER_PER_SKILL per difficulty
+- a prerequisite DAG: each free-text prerequisite ("Basic knowledge of html")
+  is matched against the skill vocabulary and linked to the closest
+  lower-difficulty course teaching that skill (same course series preferred).
+  Edges always go to a strictly lower difficulty, so the graph is acyclic.
+Per request (optimize):
+- candidates teach a missing skill at the learner's level (or, for skills
+  with no course at that level, at the closest level: reported as off_level)
+- every candidate course becomes an option = the course + its unmet
+  prerequisite closure (prerequisites below the learner level or whose
+  skills are all held count as met), with a bitmask over the missing skills it covers
+- branch-and-bound over those bitmasks finds the cheapest full cover
+  (weeks, with retrieval rank worth up to PLANNER_RANK_WEEKS weeks),
+  or, when prefs.max_weeks cannot fit a full cover, the largest coverage
+  whose schedule (over parallel_tracks) ends within max_weeks
+- search stops at PLANNER_MAX_MS and returns the best plan found so far
+  (seeded with a greedy solution), flagged optimal=False
+- the result is laid out in topological order over `parallel_tracks` tracks.
+"""
+import os, time, heapq
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from . import store, tenants, skills
+
+PLANNER_MAX_MS = float(os.getenv("PLANNER_MAX_MS", "5"))
+PLANNER_PER_SKILL = int(os.getenv("PLANNER_PER_SKILL", "8"))
+PLANNER_RANK_WEEKS = float(os.getenv("PLANNER_RANK_WEEKS", "1"))   # unranked vs top-ranked course, in weeks
+_DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
+_MAX_NGRAM = 4
+
+
+def _norm(s: str) -> str:
+    return "".join(ch.lower() for ch in (s or "") if ch.isalnum())
+
+
+def _series(course_id: str) -> str:
+    return course_id.rsplit("-", 1)[0]
+
+
+def _memo(fn):
+    cache: Dict = {}
+
+    def wrapped(x):
+        if x not in cache:
+            cache[x] = fn(x)
+        return cache[x]
+    return wrapped
+
+
+class CatalogGraph:
+    def __init__(self, cat=None):
+        cat = cat or store.catalog()
+        courses = cat.courses
+        self.version = cat.version
+        taxonomy = skills.index(cat)
+        self.taxonomy = taxonomy.signature
+        self.skills: Dict[int, FrozenSet[str]] = {}
+        self.weeks: Dict[int, int] = {}
+        self.rank: Dict[int, int] = {}
+        self.prereqs: Dict[int, List[int]] = {}
+        self.by_skill: Dict[str, List[List[int]]] = {}
+        self._closure: Dict[int, Tuple[int, ...]] = {}
+
+        providers: Dict[str, List[List[int]]] = {}
+        norm = _memo(taxonomy.resolve)
+        stem: Dict[int, str] = {}
+        for i in cat.course_pos.values():
+            c = courses[i]
+            self.skills[i] = frozenset(n for n in map(norm, c.skills or []) if n)
+            self.weeks[i] = max(1, int(c.duration_weeks or 1))
+            self.rank[i] = _DIFFICULTY_RANK.get(str(c.difficulty).lower().strip(), 1)
+            stem[i] = _series(c.course_id)
+            for s in self.skills[i]:
+                providers.setdefault(s, [[], [], []])[self.rank[i]].append(i)
+        for lists in providers.values():
+            for lst in lists:
+                lst.sort(key=lambda i: (self.weeks[i], i))
+
+        # catalogs repeat prerequisite phrasing, so both steps are memoized
+        mentions = _memo(lambda text: self._skills_in(text, providers, taxonomy))
+        pick: Dict[Tuple[str, int, str], Optional[int]] = {}
+        for i in self.skills:
+            found: List[int] = []
+            for text in courses[i].prerequisites or []:
+                for s in mentions(text):
+                    key = (s, self.rank[i], stem[i])
+                    if key not in pick:
+                        pick[key] = self._provider(key, providers, stem)
+                    p = pick[key]
+                    if p is not None and p not in found:
+                        found.append(p)
+            self.prereqs[i] = found
+
+        base = {i: self.weeks[i] + sum(self.weeks[p] for p in self.closure(i)) for i in self.skills}
+        for s, lists in providers.items():
+            self.by_skill[s] = [sorted(lst, key=lambda i: (base[i], i))[:PLANNER_PER_SKILL] for lst in lists]
+
+    @staticmethod
+    def _skills_in(text: str, vocab: Dict, taxonomy) -> Tuple[str, ...]:
+        # exact names and aliases only: typo matching every n-gram of free text over-matches
+        words = [_norm(w) for w in (text or "").split()]
+        out: List[str] = []
+        for n in range(1, _MAX_NGRAM + 1):
+            for j in range(len(words) - n + 1):
+                key = "".join(words[j:j + n])
+                key = taxonomy.canonical(key, fuzzy=False) or key
+                if key in vocab and key not in out:
+                    out.append(key)
+        return tuple(out)
+
+    @staticmethod
+    def _provider(key: Tuple[str, int, str], providers: Dict[str, List[List[int]]],
+                  stem: Dict[int, str]) -> Optional[int]:
+        """Closest lower-difficulty course teaching the skill, preferring the dependant's own series."""
+        skill, rank, series = key
+        for r in range(rank - 1, -1, -1):
+            lst = providers[skill][r]
+            if not lst:
+                continue
+            for p in lst:
+                if stem[p] == series:
+                    return p
+            return lst[0]
+        return None
+
+    def closure(self, i: int) -> Tuple[int, ...]:
+        """All transitive prerequisites of i, prerequisites before dependants."""
+        if i not in self._closure:
+            out: List[int] = []
+            for p in self.prereqs.get(i, []):
+                for q in self.closure(p) + (p,):
+                    if q not in out:
+                        out.append(q)
+            self._closure[i] = tuple(out)
+        return self._closure[i]
+
+
+def graph() -> CatalogGraph:
+    """The current tenant's graph, rebuilt when its catalog version or skill taxonomy changes."""
+    cat = store.catalog()
+    sig = skills.index(cat).signature
+    g = cat.index("planner")
+    if g is None or g.version != cat.version or getattr(g, "taxonomy", None) != sig:
+        with cat.lock:
+            g = cat.index("planner")
+            if g is None or g.version != cat.version or getattr(g, "taxonomy", None) != sig:
+                g = tenants.attach("planner", CatalogGraph(cat), cat)
+    return g
+
+
+class _Option:
+    __slots__ = ("courses", "mask", "cost", "weeks")
+
+    def __init__(self, courses: Tuple[int, ...], mask: int, cost: int, weeks: int):
+        self.courses, self.mask, self.cost, self.weeks = courses, mask, cost, weeks
+
+
+def _popcount(x: int) -> int:
+    return bin(x).count("1")
+
+
+def _bits(x: int):
+    while x:
+        low = x & -x
+        yield low
+        x ^= low
+
+
+def optimize(missing: Sequence[str], have: Iterable[str], level: str,
+             max_weeks: Optional[int] = None, parallel_tracks: int = 1,
+             preferred: Sequence[int] = (), max_ms: float = PLANNER_MAX_MS) -> Optional[Dict]:
+    """
+    Choose courses covering `missing` (canonical skill ids) for a learner who
+    already has `have`. Returns None when no missing skill is teachable.
+    """
+    g = graph()
+    t0 = time.perf_counter()
+    stop_at = t0 + max_ms / 1000.0
+    targets = [s for s in dict.fromkeys(missing) if s in g.by_skill]
+    uncoverable = [s for s in dict.fromkeys(missing) if s not in g.by_skill]
+    if not targets:
+        return None
+    bit = {s: 1 << k for k, s in enumerate(targets)}
+    have_set = {skills.index().resolve(h) for h in have}
+    lr = _DIFFICULTY_RANK.get(level, 1)
+    pref_rank = {p: r for r, p in enumerate(preferred)}
+    tracks = max(1, int(parallel_tracks or 1))
+
+    # level is a filter: each skill is taught at the learner's level, or at the
+    # closest level that has a course for it
+    level_gap = {s: min(abs(r - lr) for r in range(3) if g.by_skill[s][r]) for s in targets}
+
+    def on_level(i: int) -> bool:
+        return any(abs(g.rank[i] - lr) == level_gap[s] for s in g.skills[i] if s in level_gap)
+
+    def course_cost(i: int) -> int:
+        # weeks, with the retrieval/rerank order worth up to PLANNER_RANK_WEEKS weeks
+        # (unranked courses pay all of it); level distance only breaks ties
+        r = pref_rank[i] / len(pref_rank) if i in pref_rank else 1.0
+        return g.weeks[i] * 1000 + int(1000 * PLANNER_RANK_WEEKS * r) + abs(g.rank[i] - lr) * 10
+
+    def met(p: int) -> bool:
+        # prerequisites below the learner's level, or fully known, are assumed done
+        return g.rank[p] < lr or g.skills[p] <= have_set
+
+    def skill_mask(i: int) -> int:
+        m = 0
+        for s in g.skills[i]:
+            m |= bit.get(s, 0)
+        return m
+
+    # ---- options: candidate course + unmet prerequisite closure ----
+    cand: Set[int] = {p for p in preferred if p in g.skills and skill_mask(p) and on_level(p)}
+    for s in targets:
+        for r, lst in enumerate(g.by_skill[s]):
+            if abs(r - lr) == level_gap[s]:
+                cand.update(lst)
+    cc: Dict[int, int] = {}
+    cm: Dict[int, int] = {}
+    lb_bit = {b: 0 for b in bit.values()}
+    best_for_mask: Dict[int, _Option] = {}
+    for i in cand:
+        courses = tuple(p for p in g.closure(i) if not met(p)) + (i,)
+        mask = 0
+        for p in courses:
+            if p not in cc:
+                cc[p], cm[p] = course_cost(p), skill_mask(p)
+            mask |= cm[p]
+        if not mask:
+            continue
+        # admissible per-bit bound: whichever course newly covers a bit (the candidate
+        # or one of its prerequisites) costs at least this
+        for p in courses:
+            for b in _bits(cm[p]):
+                if not lb_bit[b] or cc[p] < lb_bit[b]:
+                    lb_bit[b] = cc[p]
+        cost = sum(cc[p] for p in courses)
+        cur = best_for_mask.get(mask)
+        if cur is None or cost < cur.cost:
+            best_for_mask[mask] = _Option(courses, mask, cost, sum(g.weeks[p] for p in courses))
+    options = sorted(best_for_mask.values(), key=lambda o: o.cost)
+    by_bit: Dict[int, List[_Option]] = {b: [] for b in bit.values()}
+    reachable = 0
+    for o in options:
+        reachable |= o.mask
+        for b in _bits(o.mask):
+            by_bit[b].append(o)
+
+    def marginal(o: _Option, ch: Set[int]) -> List[int]:
+        return [i for i in o.courses if i not in ch]
+
+    # ---- greedy incumbent: scarcest open skill first, cheapest marginal option for it ----
+    chosen: Set[int] = set()
+    covered = 0
+    while covered != reachable:
+        b = min((x for x in _bits(reachable & ~covered)), key=lambda x: len(by_bit[x]))
+        o = min(by_bit[b], key=lambda o: sum(cc[i] for i in marginal(o, chosen)))
+        chosen.update(o.courses)
+        covered |= o.mask
+    inc = {"chosen": chosen, "covered": covered, "cost": sum(cc[i] for i in chosen)}
+
+    # ---- branch and bound: cheapest cover of everything reachable ----
+    def cover(cov: int, ch: Set[int], cost: int) -> bool:
+        """False once the time cap is hit."""
+        nonlocal inc
+        if cov == reachable:
+            if cost < inc["cost"]:
+                inc = {"chosen": set(ch), "covered": cov, "cost": cost}
+            return True
+        if time.perf_counter() > stop_at:
+            return False
+        open_bits = list(_bits(reachable & ~cov))
+        if cost + max(lb_bit[b] for b in open_bits) >= inc["cost"]:
+            return True
+        b = min(open_bits, key=lambda x: len(by_bit[x]))
+        for o in by_bit[b]:
+            new = marginal(o, ch)
+            c2 = cost + sum(cc[i] for i in new)
+            if c2 >= inc["cost"]:
+                continue
+            ch.update(new)
+            ok = cover(cov | o.mask, ch, c2)
+            ch.difference_update(new)
+            if not ok:
+                return False
+        return True
+
+    optimal = cover(0, set(), 0)
+    objective = "min_weeks"
+
+    # ---- budget: maximize coverage whose schedule ends within max_weeks ----
+    limit = int(max_weeks) if max_weeks else None
+
+    def fits(ch: Set[int]) -> bool:
+        return limit is None or _makespan(g, ch, tracks, course_cost) <= limit
+
+    if limit is not None and not fits(inc["chosen"]):
+        objective = "max_coverage"
+        # total effort over all tracks: a cheap necessary condition, checked before the schedule
+        budget = limit * tracks
+        fit = [o for o in options if o.weeks <= budget and fits(set(o.courses))]
+        fit.sort(key=lambda o: (-_popcount(o.mask) / o.weeks, o.cost))
+        suffix = [0] * (len(fit) + 1)
+        for j in range(len(fit) - 1, -1, -1):
+            suffix[j] = suffix[j + 1] | fit[j].mask
+
+        # greedy seed: best ratio first while it fits
+        ch, cov, weeks = set(), 0, 0
+        for o in fit:
+            new = marginal(o, ch)
+            w = sum(g.weeks[i] for i in new)
+            if o.mask & ~cov and weeks + w <= budget and fits(ch.union(new)):
+                ch.update(new)
+                cov |= o.mask
+                weeks += w
+        best = {"chosen": ch, "covered": cov, "cost": sum(cc[i] for i in ch)}
+
+        def pack(j: int, cov: int, ch: Set[int], weeks: int, cost: int) -> bool:
+            nonlocal best
+            n, bn = _popcount(cov), _popcount(best["covered"])
+            if n > bn or (n == bn and cost < best["cost"]):
+                best = {"chosen": set(ch), "covered": cov, "cost": cost}
+                bn = n
+            if j == len(fit):
+                return True
+            if time.perf_counter() > stop_at:
+                return False
+            # adding courses never lowers cost, so an equal bound cannot win on cost either
+            ub = _popcount(cov | suffix[j])
+            if ub < bn or (ub == bn and cost >= best["cost"]):
+                return True
+            o = fit[j]
+            new = marginal(o, ch)
+            w2 = weeks + sum(g.weeks[i] for i in new)
+            if o.mask & ~cov and w2 <= budget and fits(ch.union(new)):
+                ch.update(new)
+                ok = pack(j + 1, cov | o.mask, ch, w2, cost + sum(cc[i] for i in new))
+                ch.difference_update(new)
+                if not ok:
+                    return False
+            return pack(j + 1, cov, ch, weeks, cost)
+
+        optimal = pack(0, 0, set(), 0, 0)
+        inc = best
+
+    schedule = _schedule(g, inc["chosen"], tracks, course_cost)
+    covered_skills = [s for s in targets if inc["covered"] & bit[s]]
+    return {
+        "courses": [e["idx"] for e in schedule],
+        "schedule": schedule,
+        "weeks": max((e["end_week"] for e in schedule), default=0),
+        "covered": covered_skills,
+        "uncovered": [s for s in targets if s not in covered_skills] + uncoverable,
+        "off_level": [s for s in covered_skills if level_gap[s]],
+        "objective": objective,
+        "optimal": bool(optimal),
+        "tracks": tracks,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+
+def _layout(g: CatalogGraph, chosen: Set[int], tracks: int, key) -> List[Tuple[int, int, int, int]]:
+    """
+    (course, start week, end week, track): topological order (Kahn,
+    cheapest/most relevant first), then list-scheduled onto tracks.
+    """
+    # transitive, so ordering survives prerequisites dropped because the learner has them
+    deps = {i: [p for p in g.closure(i) if p in chosen] for i in chosen}
+    indeg = {i: len(deps[i]) for i in chosen}
+    children: Dict[int, List[int]] = {i: [] for i in chosen}
+    for i, ps in deps.items():
+        for p in ps:
+            children[p].append(i)
+    ready = [(g.rank[i], key(i), i) for i in chosen if indeg[i] == 0]
+    heapq.heapify(ready)
+    order: List[int] = []
+    while ready:
+        _, _, i = heapq.heappop(ready)
+        order.append(i)
+        for ch in children[i]:
+            indeg[ch] -= 1
+            if indeg[ch] == 0:
+                heapq.heappush(ready, (g.rank[ch], key(ch), ch))
+
+    free_at = [0] * tracks          # last busy week per track
+    end: Dict[int, int] = {}
+    out: List[Tuple[int, int, int, int]] = []
+    for i in order:
+        earliest = max((end[p] for p in deps[i]), default=0) + 1
+        t = min(range(tracks), key=lambda k: (max(earliest, free_at[k] + 1), k))
+        start = max(earliest, free_at[t] + 1)
+        finish = start + g.weeks[i] - 1
+        free_at[t] = end[i] = finish
+        out.append((i, start, finish, t))
+    return out
+
+
+def _makespan(g: CatalogGraph, chosen: Set[int], tracks: int, key) -> int:
+    """Calendar weeks of the plan as _schedule lays it out."""
+    return max((e for _, _, e, _ in _layout(g, chosen, tracks, key)), default=0)
+
+
+def _schedule(g: CatalogGraph, chosen: Set[int], tracks: int, key) -> List[Dict]:
+    out: List[Dict] = []
+    for i, start, finish, t in _layout(g, chosen, tracks, key):
+        c = store.COURSES[i]
+        out.append({
+            "idx": i,
+            "course_id": c.course_id,
+            "title": c.title,
+            "difficulty": c.difficulty,
+            "weeks": g.weeks[i],
+            "start_week": start,
+            "end_week": finish,
+            "track": t,
+        })
+    return out
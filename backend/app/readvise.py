@@ -0,0 +1,47 @@
+"""
+Result tokens for delta re-advise.
+/advise returns a result_token; /advise/delta takes that token plus skill
+additions / removals and answers from the stored run (advisor.replan)
+instead of repeating retrieval and reranking. States live in a per-process
+LRU (DELTA_STATES entries, DELTA_TTL_S seconds), keyed by tenant + token:
+with several workers a token only resolves on the process that issued it,
+and an unknown token gets a 410 so the client falls back to /advise.
+"""
+import os, time, secrets, threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from . import store
+
+DELTA_MAX_CHANGES = int(os.getenv("DELTA_MAX_CHANGES", "3"))   # larger edits run the full pipeline
+DELTA_STATES = int(os.getenv("DELTA_STATES", "5000"))
+DELTA_TTL_S = float(os.getenv("DELTA_TTL_S", "1800"))
+
+_states: OrderedDict = OrderedDict()      # (tenant, token) -> (expires_at, state)
+_lock = threading.Lock()
+
+
+def remember(state: Dict[str, Any]) -> str:
+    """Store an advise state for the current tenant; returns its token."""
+    token = secrets.token_urlsafe(16)
+    key = (store.catalog().tenant, token)
+    with _lock:
+        _states[key] = (time.monotonic() + DELTA_TTL_S, state)
+        while len(_states) > DELTA_STATES:
+            _states.popitem(last=False)
+    return token
+
+
+def lookup(token: str) -> Optional[Dict[str, Any]]:
+    """The state behind a token of the current tenant, or None (unknown, expired or evicted)."""
+    key = (store.catalog().tenant, token or "")
+    with _lock:
+        hit = _states.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _states[key]
+            return None
+        _states.move_to_end(key)
+        return hit[1]
+
@@ -1,50 +1,210 @@
 """
 Hybrid retrieval:
-- BM25 (rank-bm25, in-memory over courses)
-- MongoDB Atlas Vector Search (embeddings via HuggingFace)
+- BM25 (incremental index over courses, persisted to disk)
+- Vector search (embeddings via HuggingFace): MongoDB Atlas, or a local IVF index
 - Cross-Encoder reranker (optional)
 This replaces your placeholder hash-embedding and merges with your token-based logic.
 """
-import os, json
+import os, json, hashlib, threading
 from pathlib import Path
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional, Set
+import numpy as np
 from dotenv import load_dotenv
-from rank_bm25 import BM25Okapi
-from pymongo import MongoClient
 from pymongo.collection import Collection
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from sentence_transformers import CrossEncoder
 
-from . import store
+from . import store, tenants
+from .bm25_index import IncrementalBM25, text_hash
+from .ann_index import IVFIndex
+from . import atlas_query, ce_inputs, course_graph
+from .deadline import CircuitBreaker, breaker_for
+from .model_server import ModelClient, MODEL_SERVER_SOCKET
+from .observability import logger
+from .models import Course
 
 load_dotenv()
 
 DATA_DIR = Path(__file__).parent / "data"
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER", "cross-encoder/ms-marco-MiniLM-L-6-v2")
-MONGO_URI = os.getenv("MONGODB_ATLAS_URI")
 DB_NAME = os.getenv("MONGODB_DB", "upskill")
 COURSE_COLL = os.getenv("MONGODB_COURSES_COLL", "courses")
 INDEX_NAME = os.getenv("MONGO_VECTOR_INDEX", "vector_index")
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", str(DATA_DIR / "bm25_index.json"))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "atlas").lower()   # "atlas" | "ivf"
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", str(DATA_DIR / "ann_index.npz"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "64"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_QUANT = os.getenv("ANN_QUANT", "int8")                       # float32 | float16 | int8
+VECTOR_PREFILTER = os.getenv("VECTOR_LEVEL_PREFILTER", "0") == "1"
+# with MODEL_SERVER_SOCKET: never load models in the worker; sidecar down -> no vectors, no rerank
+MODEL_SERVER_ONLY = os.getenv("MODEL_SERVER_ONLY", "0") == "1"
 
 
-_client = MongoClient(MONGO_URI) if MONGO_URI else None
+_client = atlas_query.get_client()
 _db = _client[DB_NAME] if _client is not None else None
-_courses_coll: Collection = _db[COURSE_COLL] if _db is not None else None
 
-_embed = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-try:
-    _ce = CrossEncoder(CROSS_ENCODER_MODEL)
-except Exception:
-    _ce = None
+def _courses_coll() -> Collection:
+    """The current tenant's course collection: MONGODB_COURSES_COLL, suffixed with the tenant name."""
+    if _db is None:
+        return None
+    tenant = store.catalog().tenant
+    return _db[COURSE_COLL if tenant == tenants.DEFAULT_TENANT else f"{COURSE_COLL}_{tenant}"]
 
-store_vs = MongoDBAtlasVectorSearch(
-    collection=_courses_coll,
-    embedding=_embed,
-    index_name=INDEX_NAME,
-    text_key="text"
-)
+def _index_path(default_path: str) -> str:
+    """Per-tenant index files live next to that tenant's catalog."""
+    cat = store.catalog()
+    if cat.tenant == tenants.DEFAULT_TENANT:
+        return default_path
+    return os.path.join(cat.data_dir, os.path.basename(default_path))
+
+# --------- Models: shared sidecar (MODEL_SERVER_SOCKET) or in-process ----------
+_embed = None
+_ce = None
+_ce_loaded = False
+_alt_ce: Dict[str, Any] = {}         # model name -> CrossEncoder (or None), for rerank(model=...)
+_models_lock = threading.Lock()
+_sidecar = ModelClient(MODEL_SERVER_SOCKET) if MODEL_SERVER_SOCKET else None
+# one breaker per operation: a failing rerank must not cut off embeddings, and vice versa
+_sidecar_breakers = {op: CircuitBreaker(f"model_server_{op}", max_failures=2, cooldown_s=10.0)
+                     for op in ("embed", "rerank")}
+_builds: Set[Tuple[str, str]] = set()        # (tenant, index name) of background rebuilds running
+_builds_lock = threading.Lock()
+_ann_cold_lock = threading.Lock()             # first ANN build of a tenant (nothing to serve meanwhile)
+_ANN_RETRAIN_FRACTION = 0.25                  # re-run k-means once this share of rows was assigned incrementally
+
+def _local_embedder():
+    global _embed
+    if _embed is None:
+        with _models_lock:
+            if _embed is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                _embed = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+    return _embed
+
+def _local_cross_encoder():
+    global _ce, _ce_loaded
+    if not _ce_loaded:
+        with _models_lock:
+            if not _ce_loaded:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    _ce = CrossEncoder(CROSS_ENCODER_MODEL)
+                except Exception:
+                    _ce = None
+                _ce_loaded = True
+    return _ce
+
+def _alt_cross_encoder(model: str):
+    """An in-process cross-encoder other than CROSS_ENCODER (e.g. a shadow candidate)."""
+    if model not in _alt_ce:
+        with _models_lock:
+            if model not in _alt_ce:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    _alt_ce[model] = CrossEncoder(model)
+                except Exception as ex:
+                    logger.warning("cross-encoder not loaded", model=model, error=repr(ex))
+                    _alt_ce[model] = None
+    return _alt_ce[model]
+
+def _local_models() -> bool:
+    """Whether this worker may load models itself (no sidecar, or MODEL_SERVER_ONLY off)."""
+    return _sidecar is None or not MODEL_SERVER_ONLY
+
+def _via_sidecar(op: str, items):
+    """Call the sidecar; None means 'use the in-process model instead' (if _local_models())."""
+    breaker = breaker_for(_sidecar_breakers[op])
+    if _sidecar is None or not breaker.allow():
+        return None
+    try:
+        out = getattr(_sidecar, op)(items)
+        breaker.record_success()
+        return out
+    except Exception as ex:
+        breaker.record_failure()
+        logger.warning("model server call failed; using in-process model", op=op, error=repr(ex))
+        return None
+
+def embed_documents(texts: List[str]) -> List[List[float]]:
+    out = _via_sidecar("embed", texts)
+    if out is not None:
+        return out.tolist()
+    if not _local_models():
+        raise RuntimeError("model server unavailable and MODEL_SERVER_ONLY=1")
+    return _local_embedder().embed_documents(texts)
+
+def embed_query(text: str) -> List[float]:
+    return embed_documents([text])[0]
+
+def ce_scores(pairs: List[Tuple[str, str]]):
+    """Cross-encoder scores for (query, doc) pairs; None when no cross-encoder is available."""
+    out = _via_sidecar("rerank", pairs)
+    if out is not None or not _local_models():
+        return out
+    ce = _local_cross_encoder()
+    return ce.predict(pairs) if ce is not None else None
+
+def _course_pairs(query: str, idxs: List[int]) -> List[Tuple[str, str]]:
+    return [(query, _course_text(store.COURSES[i].model_dump())) for i in idxs]
+
+def course_tokens(enc: "ce_inputs.PairEncoder") -> Optional["ce_inputs.DocTokens"]:
+    """
+    Every course text tokenized, by catalog position, for the current catalog
+    version; None while a rebuild runs (callers use predict() meanwhile). The
+    rebuild runs on a background thread, off the request path and cat.lock,
+    and re-tokenizes only courses whose text changed.
+    """
+    cat = store.catalog()
+    name = f"ce_tokens:{enc.name}"
+    toks = cat.index(name)
+    if toks is not None and toks.version == cat.version:
+        return toks
+    _in_background(cat, name, _build_course_tokens, cat, enc, name, toks)
+    return None
+
+def _in_background(cat, name: str, fn, *args) -> None:
+    """Run fn(*args) on a daemon thread in cat's tenant context, unless a build of `name` for cat runs already."""
+    key = (cat.tenant, name)
+    with _builds_lock:
+        if key in _builds:
+            return
+        _builds.add(key)
+
+    def run():
+        try:
+            with tenants.use(cat):
+                fn(*args)
+        except Exception as ex:
+            logger.warning("background index build failed", tenant=cat.tenant, index=name, error=repr(ex))
+        finally:
+            with _builds_lock:
+                _builds.discard(key)
+
+    threading.Thread(target=run, name=name.split(":", 1)[0], daemon=True).start()
+
+def _build_course_tokens(cat, enc: "ce_inputs.PairEncoder", name: str, old) -> None:
+    try:
+        with cat.lock:
+            version, courses = cat.version, list(cat.courses)
+        texts = [_course_text(c.model_dump()) for c in courses]
+        tenants.attach(name, ce_inputs.DocTokens.refresh(old, texts, enc.tokenize, version), cat)
+    except Exception as ex:
+        logger.warning("course tokens not built; using predict()", tenant=cat.tenant, error=repr(ex))
+
+def _local_ce_scores(ce, query: str, idxs: List[int]):
+    """In-process scores: cached course token ids + the query, or plain predict() as a fallback."""
+    if ce is None:
+        return None
+    enc = ce_inputs.encoder_for(ce)
+    toks = course_tokens(enc) if enc is not None else None
+    if toks is None:
+        return ce.predict(_course_pairs(query, idxs))
+    return enc.score(query, toks.rows(idxs))
+
+if _sidecar is None:
+    # single-process deployment: load eagerly, as before
+    _local_embedder()
+    _local_cross_encoder()
 
 def _norm(s: str) -> str:
     return "".join(ch.lower() for ch in (s or "") if ch.isalnum() or ch.isspace()).strip()
@@ -60,17 +220,18 @@ def _course_text(c: Dict) -> str:
 
 def bootstrap_courses() -> bool:
     """Upsert courses w/ embeddings into Mongo if collection empty."""
-    if _courses_coll is None:
+    coll = _courses_coll()
+    if coll is None:
         return False
 
-    if _courses_coll.estimated_document_count() > 0:
+    if coll.estimated_document_count() > 0:
         return True
 
     docs = []
     for c in store.COURSES:
         it = c.model_dump() if hasattr(c, "model_dump") else c.dict()
         txt = _course_text(it)
-        emb = _embed.embed_query(txt)
+        emb = embed_query(txt)
         docs.append({
             "course_id": it["course_id"],
             "title": it["title"],
@@ -83,73 +244,199 @@ def bootstrap_courses() -> bool:
             "embedding": emb
         })
     if docs:
-        _courses_coll.insert_many(docs)
+        coll.insert_many(docs)
     return True
 
-# --------- BM25 (in-memory) ----------
-_tokenized = None
-_bm25 = None
-
-def _build_bm25_corpus() -> List[str]:
-    return [_course_text(c.model_dump()) for c in store.COURSES]
-
-def ensure_bm25():
-    global _tokenized, _bm25
-    if _bm25 is not None:
-        return
-    corpus = _build_bm25_corpus()
-    _tokenized = [doc.lower().split() for doc in corpus]
-    _bm25 = BM25Okapi(_tokenized)
-
-def bm25_candidates(query: str, k: int = 20) -> List[Tuple[int, float]]:
-    ensure_bm25()
-    toks = query.lower().split()
-    scores = _bm25.get_scores(toks)
-    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
-    return [(i, float(scores[i])) for i in order]
-
-def vector_candidates(query: str, k: int = 20) -> List[Tuple[int, float]]:
-    # OLD (ok but make it explicit too): if not _courses_coll: return []
-    if _courses_coll is None:
-        return []
+# --------- BM25 (incremental, persisted; one per tenant) ----------
+def _sync_bm25(idx: IncrementalBM25) -> int:
+    """Bring the index in line with store.COURSES; returns the number of docs touched."""
+    touched = 0
+    live = set()
+    for c in store.COURSES:
+        if c.course_id in live:     # duplicated id: only the first occurrence is addressable
+            continue
+        live.add(c.course_id)
+        touched += idx.update(c.course_id, _course_text(c.model_dump()))
+    for key in idx.keys():
+        if key not in live:
+            touched += idx.delete(key)
+    return touched
+
+def ensure_bm25() -> IncrementalBM25:
+    """Load the persisted index (or start empty) and reconcile it with the catalog."""
+    cat = store.catalog()
+    idx = cat.index("bm25")
+    if idx is not None:
+        return idx
+    with cat.lock:
+        idx = cat.index("bm25")
+        if idx is not None:
+            return idx
+        path = _index_path(BM25_INDEX_PATH)
+        idx = IncrementalBM25.load(path) or IncrementalBM25()
+        if _sync_bm25(idx):
+            try:
+                idx.save(path)
+            except OSError:
+                pass
+        return tenants.attach("bm25", idx, cat)
+
+def save_bm25():
+    idx = store.catalog().index("bm25")
+    if idx is not None:
+        idx.save(_index_path(BM25_INDEX_PATH))
+
+def _refresh_course_graph() -> None:
+    # incremental: only the edited course is re-embedded (course_graph.build)
+    course_graph.schedule_refresh(store.catalog(), embed_documents,
+                                  lambda c: _course_text(c.model_dump()), model=EMBED_MODEL)
+
+def upsert_course(course: Course, persist: bool = True) -> None:
+    """Publish or update a single course without rebuilding the BM25 index."""
+    idx = ensure_bm25()
+    store.upsert_course(course)
+    if idx.update(course.course_id, _course_text(course.model_dump())) and persist:
+        save_bm25()
+    _refresh_course_graph()
+
+def remove_course(cid: str, persist: bool = True) -> bool:
+    idx = ensure_bm25()
+    removed = store.remove_course(cid)
+    if idx.delete(cid) and persist:
+        save_bm25()
+    if removed:
+        _refresh_course_graph()
+    return removed
+
+def bm25_scores(query: str) -> np.ndarray:
+    """BM25 score of every course, by catalog position (0 where no query term occurs)."""
+    idx = ensure_bm25()
+    cat = store.catalog()
+    return idx.aligned_scores(query, cat.course_pos, len(cat.courses), tag=cat.version)
+
+# --------- Local ANN (IVF; one per tenant) ----------
+def _catalog_fingerprint(texts: List[str]) -> str:
+    h = hashlib.sha1()
+    for t in texts:
+        h.update(t.encode("utf-8"))
+        h.update(b"\0")
+    return f"{EMBED_MODEL}:{h.hexdigest()}"
 
-    store_vs = MongoDBAtlasVectorSearch(
-        collection=_courses_coll,
-        embedding=_embed,
-        index_name="vector_index",
-        text_key="text"
-    )
-    docs = store_vs.similarity_search_with_relevance_scores(query, k=k)
-    id_to_idx = {c.course_id: i for i, c in enumerate(store.COURSES)}
+def _ann_current(idx: IVFIndex, cat) -> bool:
+    # built for this catalog version (upsert_course / remove_course bump it), model and quantization
+    return getattr(idx, "version", None) == cat.version and _ann_usable(idx)
+
+def _ann_usable(idx: IVFIndex) -> bool:
+    return idx.tag.startswith(f"{EMBED_MODEL}:") and idx.quantization == ANN_QUANT
+
+def ensure_ann() -> IVFIndex:
+    """
+    The tenant's IVF index. After a catalog edit the previous index keeps
+    serving (edited courses are found by BM25 meanwhile) while a background
+    thread embeds only new or changed courses and assigns them to the
+    existing lists; k-means reruns there once a quarter of the rows were
+    assigned that way. Only a tenant's first build (no attached index)
+    runs on the request path, starting from ANN_INDEX_PATH when present.
+    """
+    cat = store.catalog()
+    idx = cat.index("ann")
+    if idx is not None and _ann_usable(idx):
+        if not _ann_current(idx, cat):
+            _in_background(cat, "ann", _refresh_ann, cat, idx)
+        return idx
+    with _ann_cold_lock:
+        idx = cat.index("ann")
+        if idx is None or not _ann_usable(idx):
+            idx = _refresh_ann(cat, None)
+    return idx
+
+def _refresh_ann(cat, prev: Optional[IVFIndex]) -> IVFIndex:
+    """Index cat's current courses from prev (or the saved index), re-embedding only changed texts; attaches it."""
+    with cat.lock:
+        version = cat.version
+        items = [(cid, cat.courses[i]) for cid, i in cat.course_pos.items()]
+    ids = [cid for cid, _ in items]
+    texts = [_course_text(c.model_dump()) for _, c in items]
+    hashes = dict(zip(ids, (text_hash(t) for t in texts)))
+    path = _index_path(ANN_INDEX_PATH)
+    if prev is None and os.path.exists(path):
+        try:
+            prev = IVFIndex.load(path)
+        except Exception:
+            prev = None
+    if prev is not None and not (_ann_usable(prev) and len(prev) and prev.hashes):
+        prev = None
+
+    if prev is not None:
+        changed = [i for i, cid in enumerate(ids) if prev.hashes.get(cid) != hashes[cid]]
+        removed = [cid for cid in prev.hashes if cid not in hashes]
+        if prev.untrained + len(changed) + len(removed) > _ANN_RETRAIN_FRACTION * len(ids):
+            prev = None
+    if prev is None:
+        vecs = np.asarray(embed_documents(texts), dtype=np.float32) if texts else np.zeros((0, 1), np.float32)
+        idx = IVFIndex(nlist=ANN_NLIST, nprobe=ANN_NPROBE, quantization=ANN_QUANT).build(vecs, ids)
+    elif changed or removed:
+        vecs = (np.asarray(embed_documents([texts[i] for i in changed]), dtype=np.float32) if changed
+                else np.zeros((0, prev.centroids.shape[1]), np.float32))
+        idx = prev.updated(vecs, [ids[i] for i in changed], removed)
+    else:
+        idx = prev
+    dirty = idx is not prev
+    idx.tag = _catalog_fingerprint(texts)
+    idx.hashes = hashes
+    idx.nprobe = ANN_NPROBE
+    idx.version = version
+    if dirty:
+        try:
+            idx.save(path)
+        except OSError:
+            pass
+    return tenants.attach("ann", idx, cat)
+
+def ann_candidates(query: str, k: int = 20, nprobe: int = None) -> List[Tuple[int, float]]:
+    """Local IVF search; scores mapped to [0, 1] like Atlas relevance scores."""
+    idx = ensure_ann()
+    qv = np.asarray(embed_query(query), dtype=np.float32)
     out: List[Tuple[int, float]] = []
-    for d, s in docs:
-        cid = (getattr(d, "metadata", None) or {}).get("course_id")
-        if not cid:
-            # fallback: match by title header
-            header = (d.page_content or "").split("\n")[0]
-            for c in store.COURSES:
-                title = c.title if hasattr(c, "title") else c.get("title")
-                if title == header:
-                    cid = c.course_id if hasattr(c, "course_id") else c.get("course_id")
-                    break
-        if cid in id_to_idx:
-            out.append((id_to_idx[cid], float(s)))
+    for cid, cos in idx.search(qv, k=k, nprobe=nprobe):
+        i = store.COURSE_POS.get(cid)
+        if i is not None:
+            out.append((i, (1.0 + cos) / 2.0))
     return out
 
-def hybrid(query: str, k: int = 20, w_bm25: float = 0.5, w_vec: float = 0.5) -> List[Tuple[int, float]]:
-    bm = dict(bm25_candidates(query, k))
-    vc = dict(vector_candidates(query, k))
-    keys = set(bm) | set(vc)
-    scores = {i: w_bm25*bm.get(i, 0.0) + w_vec*vc.get(i, 0.0) for i in keys}
-    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
-    return ranked
+def vector_candidates(query: str, k: int = 20, level: str = None) -> List[Tuple[int, float]]:
+    """
+    Vector candidates as (course position, relevance in [0, 1]).
+    With VECTOR_LEVEL_PREFILTER=1, `level` pushes a difficulty pre-filter into
+    the Atlas query (needs a `difficulty` filter field on the vector index).
+    """
+    if VECTOR_BACKEND == "ivf":
+        return ann_candidates(query, k)
+    coll = _courses_coll()
+    if coll is None:
+        return []
+    qv = embed_query(query)
+    hits = atlas_query.search(coll, qv, k, INDEX_NAME, level=level if VECTOR_PREFILTER else None)
+    out: List[Tuple[int, float]] = []
+    for cid, score in hits:
+        i = store.COURSE_POS.get(cid)
+        if i is not None:
+            out.append((i, score))
+    return out
 
-def rerank(query: str, idxs_and_scores: List[Tuple[int, float]], k: int = 10) -> List[int]:
+def rerank(query: str, idxs_and_scores: List[Tuple[int, float]], k: int = 10,
+           model: str = None) -> List[int]:
     if not idxs_and_scores:
         return []
-    if _ce is None:
+    idxs = [i for i, _ in idxs_and_scores]
+    if model and model != CROSS_ENCODER_MODEL:
+        scores = _local_ce_scores(_alt_cross_encoder(model), query, idxs)
+    else:
+        # the sidecar is shared by every tenant: it gets texts and keeps its own token cache
+        scores = _via_sidecar("rerank", _course_pairs(query, idxs)) if _sidecar is not None else None
+        if scores is None and _local_models():
+            scores = _local_ce_scores(_local_cross_encoder(), query, idxs)
+    if scores is None:
         return [i for i, _ in idxs_and_scores[:k]]
-    pairs = [(query, _course_text(store.COURSES[i].model_dump())) for i, _ in idxs_and_scores]
-    ce_scores = _ce.predict(pairs)
-    order = sorted(range(len(ce_scores)), key=lambda j: ce_scores[j], reverse=True)[:k]
+    order = sorted(range(len(scores)), key=lambda j: scores[j], reverse=True)[:k]
     return [int(idxs_and_scores[j][0]) for j in order]
\ No newline at end of file
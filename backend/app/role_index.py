@@ -0,0 +1,215 @@
+"""
+Role resolution for JD lookup.
+1. Exact match on a normalized role string (case, punctuation, common
+   abbreviations and seniority words folded away) via a dict.
+2. Otherwise a character-trigram inverted index scored with a weighted Dice
+   coefficient: trigrams of generic role nouns ("developer", "engineer",
+   "analyst", ...) weigh GENERIC_WEIGHT, so "Backend Eng" is closer to
+   Backend Developer than to Data Engineer. The best role must also share a
+   distinguishing word with the query (spelling variants allowed) and beat
+   the next such role by AMBIGUITY_MARGIN, so "Developer", "Android
+   Developer" or "Data" resolve to no JD instead of a wrong one.
+   A match must share a distinguishing word, i.e. hold enough of its
+   trigrams (_min_shared), so candidates come from the postings of the
+   query's core-word trigrams, which list only roles holding them in a
+   distinguishing word: generic nouns ("eng", "per", ...) are never walked,
+   the most common trigrams of a word only confirm candidates found through
+   its rarer ones, and no role that can match is missed. The candidates are
+   then scored in one pass over their trigram rows.
+"""
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_ABBREV = {
+    "dev": "developer", "devs": "developer", "developr": "developer",
+    "eng": "engineer", "engr": "engineer", "engg": "engineer",
+    "swe": "software engineer", "sde": "software engineer",
+    "mgr": "manager", "admin": "administrator",
+    "fe": "frontend", "be": "backend", "ml": "machine learning",
+    "ai": "ai", "genai": "generative ai", "gen": "generative",
+    "front": "front", "fullstack": "full stack",
+}
+_SENIORITY = {"sr", "senior", "jr", "junior", "lead", "principal", "staff", "mid", "entry",
+              "level", "associate", "trainee", "intern", "i", "ii", "iii", "iv"}
+_JOINED = {"front end": "frontend", "back end": "backend", "dev ops": "devops"}
+_JOINED_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, _JOINED)) + r")\b")
+_NON_WORD = re.compile(r"[^a-z0-9+#]+")
+
+
+def normalize_role(role: str) -> str:
+    s = " ".join(w for w in _NON_WORD.split((role or "").lower()) if w)
+    s = _JOINED_RE.sub(lambda m: _JOINED[m.group(0)], s)
+    words = []
+    for w in s.split():
+        words.extend(_ABBREV.get(w, w).split())
+    core = [w for w in words if w not in _SENIORITY]
+    return " ".join(core or words)
+
+
+def trigrams(s: str) -> FrozenSet[str]:
+    padded = f"  {s} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# role nouns most JDs share: they say little about which JD is meant
+GENERIC_ROLE_WORDS = frozenset({
+    "developer", "engineer", "engineering", "analyst", "scientist", "specialist", "consultant",
+    "manager", "administrator", "architect", "designer", "programmer", "tester", "technician",
+})
+GENERIC_WEIGHT = 0.2        # weight of a generic word's trigrams in the Dice score
+_CANDIDATES = 20            # best-scoring roles checked for a distinguishing-word match
+AMBIGUITY_MARGIN = 0.03     # two roles this close ("Data" -> Data Analyst / Data Engineer): no match
+
+
+def core_words(norm: str) -> Tuple[str, ...]:
+    """The distinguishing words of a normalized role ("data engineer" -> ("data",))."""
+    return tuple(w for w in norm.split() if w not in GENERIC_ROLE_WORDS)
+
+
+def weighted_trigrams(norm: str) -> Dict[str, float]:
+    """Trigrams of each word; a generic role noun's trigrams weigh GENERIC_WEIGHT."""
+    out: Dict[str, float] = {}
+    for w in norm.split():
+        wt = GENERIC_WEIGHT if w in GENERIC_ROLE_WORDS else 1.0
+        for g in trigrams(w):
+            if out.get(g, 0.0) < wt:
+                out[g] = wt
+    return out
+
+
+def _same_word(a: str, b: str) -> bool:
+    """Spelling variant or abbreviation of the same word ("frontend" / "fronted" / "front")."""
+    if min(len(a), len(b)) >= 3 and (a.startswith(b) or b.startswith(a)):
+        return True
+    ga, gb = trigrams(a), trigrams(b)
+    return 2.0 * len(ga & gb) / (len(ga) + len(gb)) >= 0.5
+
+
+def _min_shared(w: str) -> int:
+    """Fewest trigrams of w any word b with _same_word(w, b) holds."""
+    n = len(trigrams(w))
+    k = 1
+    while 4 * k < n + max(k, 2):        # Dice >= 0.5 with |b| >= k shared, and >= 2 trigrams
+        k += 1
+    return min(k, 3) if len(w) >= 3 else k      # a prefix shares its first three
+class RoleIndex:
+    def __init__(self, roles: Sequence[str] = (), threshold: float = 0.6):
+        self.threshold = threshold
+        self.roles: List[str] = []
+        self._exact: Dict[str, int] = {}
+        self._core: List[Tuple[str, ...]] = []
+        self._weights: List[float] = []
+        self._gram_ids: Dict[str, int] = {}
+        self._postings: Dict[int, List[int]] = {}     # gram -> roles holding it in a distinguishing word
+        self._row_ptr: List[int] = [0]                  # role i's trigrams: _row_grams[ptr[i]:ptr[i + 1]]
+        self._row_grams: List[int] = []
+        self._row_wts: List[float] = []
+        self._frozen: Dict[int, np.ndarray] = {}
+        self._arrays: Optional[Tuple[np.ndarray, ...]] = None
+        for r in roles:
+            self.add(r)
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    def add(self, role: str) -> int:
+        """Index a role; returns its position. First occurrence of a normalized role wins."""
+        pos = len(self.roles)
+        norm = normalize_role(role)
+        grams = weighted_trigrams(norm)
+        self.roles.append(role)
+        self._core.append(core_words(norm))
+        self._weights.append(sum(grams.values()))
+        self._arrays = None
+        if norm in self._exact:
+            self._row_ptr.append(len(self._row_grams))
+            return pos
+        self._exact[norm] = pos
+        ids = self._gram_ids
+        for g in grams:
+            if g not in ids:
+                ids[g] = len(ids)
+        row = [ids[g] for g in grams]
+        self._row_grams.extend(row)
+        self._row_wts.extend(grams.values())
+        self._row_ptr.append(len(self._row_grams))
+        for gid, wt in zip(row, grams.values()):
+            if wt >= 1.0:
+                self._postings.setdefault(gid, []).append(pos)
+        if self._frozen:
+            for gid in row:
+                self._frozen.pop(gid, None)
+        return pos
+
+    def _posting(self, gid: int) -> np.ndarray:
+        arr = self._frozen.get(gid)
+        if arr is None:
+            arr = self._frozen[gid] = np.asarray(self._postings.get(gid, ()), dtype=np.int32)
+        return arr
+
+    def lookup(self, role: str) -> Tuple[Optional[int], float]:
+        """
+        (position, confidence in [0, 1]) of the best match, or (None, best score).
+        Confidence is a weighted trigram Dice in which generic role nouns count
+        little, and a match must share a distinguishing word with the role:
+        "Developer" or "Java Developer" match nothing rather than any developer JD.
+        """
+        norm = normalize_role(role)
+        if not norm:
+            return None, 0.0
+        hit = self._exact.get(norm)
+        if hit is not None:
+            return hit, 1.0
+        core = core_words(norm)
+        if not core:
+            return None, 0.0
+        # a match shares a distinguishing word with the role: at least _min_shared(w) trigrams of
+        # a core word w, held by one of the role's own distinguishing words. Each such role is in
+        # the postings of w's trigrams less the _min_shared(w) - 1 most common, and only those
+        # found there are looked up in the common ones to count what they hold
+        found_in = []
+        for w in core:
+            wg = sorted((self._posting(self._gram_ids[g]) for g in trigrams(w) if g in self._gram_ids), key=len)
+            need = _min_shared(w)
+            if len(wg) < need:
+                continue
+            roles, held = np.unique(np.concatenate(wg[:len(wg) - need + 1]), return_counts=True)
+            for p in wg[len(wg) - need + 1:]:
+                at = np.minimum(np.searchsorted(p, roles), len(p) - 1)
+                held += p[at] == roles
+            found_in.append(roles[held >= need])
+        cand = np.unique(np.concatenate(found_in)) if found_in else np.zeros(0, dtype=np.int32)
+        if not len(cand):
+            return None, 0.0
+        if self._arrays is None:
+            self._arrays = (np.asarray(self._row_ptr, dtype=np.int64), np.asarray(self._row_grams, dtype=np.int32),
+                            np.asarray(self._row_wts, dtype=np.float32), np.asarray(self._weights, dtype=np.float32))
+        ptr, row_grams, row_wts, weights = self._arrays
+        grams = weighted_trigrams(norm)
+        q_wts = np.zeros(len(self._gram_ids), dtype=np.float32)      # query weight by gram id
+        for g, wt in grams.items():
+            if g in self._gram_ids:
+                q_wts[self._gram_ids[g]] = wt
+        # the candidates' trigram rows, gathered into one array and weighed against the query's
+        start, size = ptr[cand], ptr[cand + 1] - ptr[cand]
+        at = np.repeat(start - np.cumsum(size) + size, size) + np.arange(int(size.sum()))
+        shared = np.minimum(row_wts[at], q_wts[row_grams[at]])
+        overlap = np.bincount(np.repeat(np.arange(len(cand)), size), weights=shared, minlength=len(cand))
+        dice = 2.0 * overlap / (sum(grams.values()) + weights[cand])
+        found: Optional[Tuple[int, float]] = None
+        for j in np.argsort(-dice, kind="stable")[:_CANDIDATES]:
+            score = round(float(dice[j]), 3)
+            if score < self.threshold or (found and score < found[1] - AMBIGUITY_MARGIN):
+                break
+            i = int(cand[j])
+            if not any(_same_word(a, b) for a in core for b in self._core[i]):
+                continue
+            if found:
+                return None, found[1]       # a second role matches about as well
+            found = (i, score)
+        if found:
+            return found
+        # best among the candidates: a lower bound when pruning left out roles below threshold
+        return None, round(float(dice.max()), 3) if len(dice) else 0.0
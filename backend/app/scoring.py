@@ -0,0 +1,150 @@
+"""
+Whole-catalog candidate scoring.
+Fusion and level bias run on NumPy arrays with one slot per course position
+instead of (idx, score) lists:
+- BM25 arrives as a dense score vector over the catalog; vector hits are
+  scattered into one (courses the vector retriever didn't return score 0);
+- BM25 is scaled by its best score; the vector list is min-max normalized, so
+  its weakest hit and a course just below the cut-off both score ~0 (no step
+  at the cut-off). The two are fused with a pluggable method:
+  "weighted" (weighted sum, the default) or "rrf" (reciprocal-rank fusion);
+- the level bias multiplies by a per-course penalty array built once per
+  catalog version (CatalogArrays: difficulty rank per course);
+- the top k come from argpartition, then only those k are sorted.
+"""
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import store, tenants
+
+FUSION_METHOD = os.getenv("FUSION_METHOD", "weighted")     # weighted | rrf
+RRF_K = float(os.getenv("RRF_K", "60"))
+VECTOR_DEPTH = int(os.getenv("FUSION_VECTOR_DEPTH", "100"))   # vector hits fetched for fusion (at least k)
+
+DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
+
+
+class CatalogArrays:
+    """Per-course arrays of one catalog version."""
+
+    def __init__(self, cat=None):
+        cat = cat or store.catalog()
+        self.version = cat.version
+        self.difficulty = [str(c.difficulty or "intermediate").lower().strip() for c in cat.courses]
+        self.rank = np.fromiter((DIFFICULTY_RANK.get(d, 1) for d in self.difficulty),
+                                dtype=np.int8, count=len(self.difficulty))
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    def level_factor(self, level: str, step: float = 0.25, cap: float = 0.60) -> np.ndarray:
+        """1 - penalty per course: `step` per difficulty step away from `level`, at most `cap`."""
+        dist = np.abs(self.rank - DIFFICULTY_RANK.get(level, 1)).astype(np.float32)
+        return 1.0 - np.minimum(cap, step * dist)
+
+
+def arrays(cat=None) -> CatalogArrays:
+    """The current tenant's arrays, rebuilt when its catalog version changes."""
+    cat = cat or store.catalog()
+    a = cat.index("scoring")
+    if a is None or a.version != cat.version:
+        with cat.lock:
+            a = cat.index("scoring")
+            if a is None or a.version != cat.version:
+                a = tenants.attach("scoring", CatalogArrays(cat), cat)
+    return a
+
+
+def scatter(pairs: Sequence[Tuple[int, float]], n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(scores, returned) arrays of length n for (course position, score) hits."""
+    scores = np.zeros(n, dtype=np.float32)
+    present = np.zeros(n, dtype=bool)
+    if pairs:
+        idx = np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs))
+        val = np.fromiter((s for _, s in pairs), dtype=np.float32, count=len(pairs))
+        ok = (idx >= 0) & (idx < n)
+        scores[idx[ok]] = val[ok]
+        present[idx[ok]] = True
+    return scores, present
+
+
+def minmax(scores: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Returned scores mapped to [0, 1] (all equal -> 1); the rest 0."""
+    out = np.zeros(len(scores), dtype=np.float32)
+    if not present.any():
+        return out
+    vals = scores[present]
+    lo, hi = float(vals.min()), float(vals.max())
+    out[present] = (vals - lo) / (hi - lo) if hi > lo else (1.0 if hi > 0 else 0.0)
+    return out
+
+
+def reciprocal_ranks(scores: np.ndarray, present: np.ndarray, k: float = RRF_K) -> np.ndarray:
+    """1 / (k + rank) for returned courses (rank 1 = best; ties keep catalog order); the rest 0."""
+    out = np.zeros(len(scores), dtype=np.float32)
+    idx = np.flatnonzero(present)
+    if len(idx):
+        order = idx[np.argsort(-scores[idx], kind="stable")]
+        out[order] = 1.0 / (k + np.arange(1, len(order) + 1, dtype=np.float32))
+    return out
+
+
+def fuse_weighted(bm25: np.ndarray, vec: np.ndarray, vec_hit: np.ndarray,
+                  w_bm25: float, w_vec: float) -> np.ndarray:
+    # BM25 covers every course and has a natural zero: scale by the best score only
+    top = float(bm25.max()) if len(bm25) else 0.0
+    bm = bm25 / top if top > 0 else bm25
+    return w_bm25 * bm + w_vec * minmax(vec, vec_hit)
+
+
+def fuse_rrf(bm25: np.ndarray, vec: np.ndarray, vec_hit: np.ndarray,
+             w_bm25: float, w_vec: float) -> np.ndarray:
+    # scaled so a course ranked first by both lists scores w_bm25 + w_vec, as with "weighted"
+    rr = w_bm25 * reciprocal_ranks(bm25, bm25 > 0) + w_vec * reciprocal_ranks(vec, vec_hit)
+    return (RRF_K + 1.0) * rr
+
+
+# name -> fn(bm25 scores, vector scores, vector returned mask, w_bm25, w_vec) -> fused scores,
+# all arrays indexed by course position
+FUSIONS: Dict[str, Callable[..., np.ndarray]] = {
+    "weighted": fuse_weighted,
+    "rrf": fuse_rrf,
+}
+
+
+def top_k(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """(course position, score) of the k best, best first; ties keep catalog order."""
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    part = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    # argpartition splits ties at the k-th score arbitrarily: take the lowest positions among them
+    kth = scores[part].min()
+    above = part[scores[part] > kth]
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    part = np.concatenate([above, tied])
+    part = part[np.lexsort((part, -scores[part]))]
+    return [(int(i), float(s)) for i, s in zip(part, scores[part])]
+
+
+def rank_catalog(bm25: np.ndarray, vector: Sequence[Tuple[int, float]], level: str, k: int,
+                 w_bm25: float = 0.5, w_vec: float = 0.5, level_step: float = 0.25,
+                 level_cap: float = 0.60, method: Optional[str] = None) -> List[Tuple[int, float]]:
+    """
+    Fused, level-biased top k over the whole catalog.
+    bm25: dense BM25 scores by course position (0 = no query term);
+    vector: (course position, relevance) hits of the vector retriever.
+    """
+    a = arrays()
+    n = len(a)
+    fuse = FUSIONS.get(method or FUSION_METHOD)
+    if fuse is None:
+        raise ValueError(f"unknown fusion method {method!r} (have: {', '.join(FUSIONS)})")
+    bm = np.zeros(n, dtype=np.float32)
+    bm[:min(n, len(bm25))] = bm25[:n]
+    vec, vec_hit = scatter(vector, n)
+    fused = fuse(bm, vec, vec_hit, w_bm25, w_vec)
+    return top_k(fused * a.level_factor(level, level_step, level_cap), k)
@@ -0,0 +1,183 @@
+"""
+Shadow evaluation of an alternative retrieval configuration on live traffic.
+With SHADOW_FRACTION > 0, that fraction of served /api/advise requests is
+re-run in the background with SHADOW_PARAMS (advise() params: fusion weights,
+k, rerank_k, level bias, "cross_encoder": <model>) and compared with the plan
+the user got: latency delta, top-3 overlap, Jaccard of the plan course sets,
+exact agreement, degradations and errors. Requests answered from the plan
+table or by an incremental delta (/advise/delta without retrieval) are
+shadowed too, but only count towards shadow latency, degradations and
+errors: their served side skipped the pipeline, so neither its latency nor
+its plan is a like-for-like baseline.
+
+Shadow runs never touch the response: they start after it is computed, on
+their own SHADOW_MAX_CONCURRENCY workers, stage pool and circuit breakers
+(deadline.isolated), and are dropped (not queued) when the workers are busy
+or advise requests are waiting for admission. Aggregates: GET /api/debug/shadow.
+"""
+import os, json, time, random, threading, contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import store
+from .admission import ADVISE_POOL
+from .deadline import CircuitBreaker, isolated
+from .observability import logger
+
+SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", "0"))
+SHADOW_PARAMS: Dict[str, Any] = json.loads(os.getenv("SHADOW_PARAMS", "{}") or "{}")
+SHADOW_MAX_CONCURRENCY = max(1, int(os.getenv("SHADOW_MAX_CONCURRENCY", "1")))
+SHADOW_DEADLINE_MS = float(os.getenv("SHADOW_DEADLINE_MS", "0")) or None     # None: ADVISE_DEADLINE_MS
+SHADOW_WINDOW = int(os.getenv("SHADOW_WINDOW", "1000"))
+
+_workers = ThreadPoolExecutor(max_workers=SHADOW_MAX_CONCURRENCY, thread_name_prefix="shadow")
+# timed-out stages keep running in the background, hence the headroom
+_stage_pool = ThreadPoolExecutor(max_workers=SHADOW_MAX_CONCURRENCY * 2, thread_name_prefix="shadow-stage")
+_breakers = {
+    "vector": CircuitBreaker("vector", max_failures=3, cooldown_s=30.0),
+    "model_server_embed": CircuitBreaker("model_server_embed", max_failures=2, cooldown_s=10.0),
+    "model_server_rerank": CircuitBreaker("model_server_rerank", max_failures=2, cooldown_s=10.0),
+}
+_slots = threading.BoundedSemaphore(SHADOW_MAX_CONCURRENCY)
+_lock = threading.Lock()
+_records: deque = deque(maxlen=SHADOW_WINDOW)
+_errors: deque = deque(maxlen=10)
+_counts = {"sampled": 0, "completed": 0, "errors": 0, "skipped_busy": 0, "skipped_load": 0}
+
+
+def enabled() -> bool:
+    return SHADOW_FRACTION > 0
+
+
+def _plan_ids(result: Dict[str, Any]) -> List[str]:
+    return [p["course_id"] for p in result.get("plan") or []]
+
+
+def agreement(served: List[str], shadow: List[str]) -> Dict[str, Any]:
+    a3, b3 = set(served[:3]), set(shadow[:3])
+    a, b = set(served), set(shadow)
+    return {
+        "top3_overlap": round(len(a3 & b3) / max(len(a3), len(b3)), 4) if (a3 or b3) else 1.0,
+        "jaccard": round(len(a & b) / len(a | b), 4) if (a or b) else 1.0,
+        "same_plan": served == shadow,
+    }
+
+
+def _source(served: Dict[str, Any]) -> str:
+    """How the served result was computed: "pipeline", "plan_table" or "delta" (incremental replan)."""
+    usage = served.get("usage") or {}
+    if usage.get("plan_table") == "hit":
+        return "plan_table"
+    if (usage.get("delta") or {}).get("mode") == "incremental":
+        return "delta"
+    return "pipeline"
+
+
+def maybe_run(user_skills: List[str], level: str, goal_role: str, prefs: Optional[Dict],
+              served: Dict[str, Any], served_ms: float) -> bool:
+    """Sample this request for a shadow run; returns whether one was started. Never blocks."""
+    if SHADOW_FRACTION <= 0 or random.random() >= SHADOW_FRACTION:
+        return False
+    with _lock:
+        _counts["sampled"] += 1
+    if ADVISE_POOL.queue_depth > 0:
+        with _lock:
+            _counts["skipped_load"] += 1
+        return False
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _counts["skipped_busy"] += 1
+        return False
+    job = {
+        "skills": list(user_skills), "level": level, "goal_role": goal_role, "prefs": dict(prefs or {}),
+        "served": _plan_ids(served), "served_ms": float(served_ms), "served_source": _source(served),
+    }
+    try:
+        # the copied context carries the request's tenant catalog
+        _workers.submit(contextvars.copy_context().run, _run, job)
+    except RuntimeError:          # interpreter shutting down
+        _slots.release()
+        return False
+    return True
+
+
+def _run(job: Dict[str, Any]) -> None:
+    from .advisor import advise
+    rec: Dict[str, Any] = {"at": time.time(), "tenant": store.catalog().tenant,
+                           "served_source": job["served_source"], "served_ms": job["served_ms"]}
+    try:
+        t0 = time.perf_counter()
+        with isolated(_stage_pool, _breakers):
+            out = advise(job["skills"], job["level"], job["goal_role"], prefs=job["prefs"],
+                         deadline_ms=SHADOW_DEADLINE_MS, params=SHADOW_PARAMS)
+        ms = (time.perf_counter() - t0) * 1000
+        rec.update(shadow_ms=round(ms, 1), delta_ms=round(ms - job["served_ms"], 1),
+                   degraded=list((out.get("usage") or {}).get("degraded") or []))
+        if job["served_source"] == "pipeline":
+            rec.update(agreement(job["served"], _plan_ids(out)))
+        key = "completed"
+    except Exception as ex:
+        rec["error"] = repr(ex)
+        logger.warning("shadow advise failed", error=repr(ex))
+        key = "errors"
+    finally:
+        _slots.release()
+    with _lock:
+        _counts[key] += 1
+        _records.append(rec)
+        if "error" in rec:
+            _errors.append({"at": rec["at"], "error": rec["error"]})
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 1)
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        recs = list(_records)
+        counts = dict(_counts)
+        errors = list(_errors)
+    ok = [r for r in recs if "error" not in r]
+    # latency and agreement only compare like with like: plan-table hits and incremental
+    # deltas skipped the pipeline
+    timed = [r for r in ok if r["served_source"] == "pipeline"]
+    return {
+        "enabled": enabled(),
+        "fraction": SHADOW_FRACTION,
+        "params": SHADOW_PARAMS,
+        "max_concurrency": SHADOW_MAX_CONCURRENCY,
+        "counts": counts,
+        "window": {"runs": len(recs), "errors": len(recs) - len(ok), "size": SHADOW_WINDOW},
+        "latency_ms": {
+            "served_p50": _pct([r["served_ms"] for r in timed], 0.50),
+            "served_p95": _pct([r["served_ms"] for r in timed], 0.95),
+            "shadow_p50": _pct([r["shadow_ms"] for r in ok], 0.50),
+            "shadow_p95": _pct([r["shadow_ms"] for r in ok], 0.95),
+            "delta_p50": _pct([r["delta_ms"] for r in timed], 0.50),
+            "delta_p95": _pct([r["delta_ms"] for r in timed], 0.95),
+        },
+        "agreement": {
+            "top3_overlap_mean": _mean([r["top3_overlap"] for r in timed]),
+            "jaccard_mean": _mean([r["jaccard"] for r in timed]),
+            "same_plan_rate": _mean([float(r["same_plan"]) for r in timed]),
+        },
+        "shadow_degraded_rate": _mean([float(bool(r["degraded"])) for r in ok]),
+        "recent_errors": errors,
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _records.clear()
+        _errors.clear()
+        for k in _counts:
+            _counts[k] = 0
@@ -0,0 +1,233 @@
+"""
+Skill canonicalization.
+Maps free-text skill names ("JS", "k8s", "pyhton", "Node.js") onto canonical
+skill ids so a skill the learner already has is not reported as a gap.
+
+The taxonomy is built per catalog from the course and JD skill vocabularies
+plus an alias file ({"canonical label": ["alias", ...]}); a tenant's own
+skill_aliases.json replaces the shared one. SKILL_VOCABULARY (same format)
+adds common skills no course or JD mentions yet ("java", "kafka"), so JD
+ingestion and gap analysis know them too. Lookups try, in order:
+  1. the exact normalized form (lowercase alphanumerics, as before),
+  2. an alias,
+  3. a typo match: SymSpell-style deletion neighbourhoods over the first
+     SKILL_PREFIX_LEN characters, verified with Damerau-Levenshtein (OSA)
+     distance. Short names get no edits, names of 5-8 chars one, longer ones
+     up to SKILL_MAX_EDIT. Ties go to the skill used most in the catalog.
+Results are memoized per index, so repeated skills cost one dict lookup.
+"""
+import os, json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import store, tenants
+
+SKILL_ALIASES = os.getenv("SKILL_ALIASES", os.path.join(store.DATA_DIR, "skill_aliases.json"))
+# common skills the catalog may not teach yet (same format; the alias file wins on conflicts)
+SKILL_VOCABULARY = os.getenv("SKILL_VOCABULARY", os.path.join(store.DATA_DIR, "skill_vocabulary.json"))
+SKILL_MAX_EDIT = int(os.getenv("SKILL_MAX_EDIT", "1"))
+SKILL_PREFIX_LEN = int(os.getenv("SKILL_PREFIX_LEN", "7"))
+SKILL_MEMO_SIZE = int(os.getenv("SKILL_MEMO_SIZE", "65536"))
+_MIN_FUZZY_LEN = 5
+
+
+def _norm(s: str) -> str:
+    return "".join(ch.lower() for ch in (s or "") if ch.isalnum())
+
+
+def _max_edits(n: int) -> int:
+    if n < _MIN_FUZZY_LEN:
+        return 0
+    return min(SKILL_MAX_EDIT, 1 if n <= 8 else 2)
+
+
+def _deletes(term: str, edits: int) -> List[str]:
+    """term plus every string reachable by deleting up to `edits` characters."""
+    out = {term}
+    frontier = {term}
+    for _ in range(min(edits, len(term) - 1)):
+        frontier = {t[:k] + t[k + 1:] for t in frontier for k in range(len(t))}
+        out |= frontier
+    return list(out)
+
+
+def _osa(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # shared prefix / suffix never change the distance
+    k, m = 0, min(len(a), len(b))
+    while k < m and a[k] == b[k]:
+        k += 1
+    a, b = a[k:], b[k:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= limit else limit + 1
+    if limit == 1:
+        # what is left must be one substitution or one adjacent transposition
+        return 1 if (len(a) == len(b) == 1 or (len(a) == len(b) == 2 and a == b[::-1])) else 2
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def aliases_path(data_dir: str) -> str:
+    own = os.path.join(data_dir, "skill_aliases.json")
+    return own if os.path.exists(own) else SKILL_ALIASES
+
+
+def _file_sig(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (path, None, None)
+
+
+def load_aliases(path: str) -> Dict[str, List[str]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[skills] aliases not loaded from {path}: {e}")
+        return {}
+    return {str(k): [str(a) for a in (v or [])] for k, v in data.items()} if isinstance(data, dict) else {}
+
+
+class SkillIndex:
+    def __init__(self, vocab: Iterable[str], aliases: Dict[str, List[str]]):
+        self.labels: Dict[str, str] = {}       # canonical id -> display label
+        self.freq: Dict[str, int] = {}
+        self.exact: Dict[str, str] = {}        # normalized name or alias -> canonical id
+        self.deletes: Dict[str, object] = {}   # deletion key -> indexed name, or tuple of names
+        self._memo: Dict[str, Optional[str]] = {}
+        self.signature: Tuple = ()
+
+        for label, alts in aliases.items():
+            cid = _norm(label)
+            if not cid:
+                continue
+            self.labels.setdefault(cid, label)
+            self.exact[cid] = cid
+            for a in alts:
+                if _norm(a):
+                    self.exact[_norm(a)] = cid
+        for label in vocab:
+            n = _norm(label)
+            if not n:
+                continue
+            cid = self.exact.setdefault(n, n)
+            self.labels.setdefault(cid, label)
+            self.freq[cid] = self.freq.get(cid, 0) + 1
+
+        # typo matching targets canonical ids and aliases alike ("kuberntes", "postgers")
+        for name, cid in self.exact.items():
+            for key in _deletes(name[:SKILL_PREFIX_LEN], _max_edits(len(name))):
+                have = self.deletes.get(key)
+                if have is None:
+                    self.deletes[key] = name
+                elif isinstance(have, tuple):
+                    if name not in have:
+                        self.deletes[key] = have + (name,)
+                elif have != name:
+                    self.deletes[key] = (have, name)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_memo"] = {}
+        return state
+
+    def canonical(self, skill: str, fuzzy: bool = True) -> Optional[str]:
+        """Canonical id for skill, or None when nothing matches (then callers keep _norm(skill))."""
+        n = _norm(skill)
+        cid = self.exact.get(n)
+        if cid is not None or not fuzzy:
+            return cid
+        if n in self._memo:
+            return self._memo[n]
+        cid = self._fuzzy(n)
+        if len(self._memo) >= SKILL_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[n] = cid
+        return cid
+
+    def resolve(self, skill: str) -> str:
+        """canonical() falling back to the normalized name, so unknown skills still compare."""
+        n = _norm(skill)
+        return self.canonical(n) or n
+
+    def label(self, cid: str) -> str:
+        return self.labels.get(cid, cid)
+
+    def _fuzzy(self, n: str) -> Optional[str]:
+        edits = _max_edits(len(n))
+        if not edits:
+            return None
+        best: Optional[Tuple[int, int, str]] = None
+        seen = set()
+        for key in _deletes(n[:SKILL_PREFIX_LEN], edits):
+            hit = self.deletes.get(key)
+            if hit is None:
+                continue
+            for name in (hit if isinstance(hit, tuple) else (hit,)):
+                if name in seen:
+                    continue
+                seen.add(name)
+                limit = min(edits, _max_edits(len(name)))
+                d = _osa(n, name, limit)
+                if d > limit:
+                    continue
+                cid = self.exact[name]
+                rank = (d, -self.freq.get(cid, 0), cid)
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best else None
+
+
+def _signature(cat) -> Tuple:
+    return (cat.version, _file_sig(aliases_path(cat.data_dir)), _file_sig(SKILL_VOCABULARY))
+
+
+def build(cat=None) -> SkillIndex:
+    cat = cat or store.catalog()
+    vocab: List[str] = []
+    for c in cat.courses:
+        vocab.extend(c.skills or [])
+    for jd in cat.jds:
+        vocab.extend(x.skill for x in jd.skills_required or [])
+    # dict order: vocabulary entries first, so the alias file's mappings override theirs
+    aliases = {**load_aliases(SKILL_VOCABULARY), **load_aliases(aliases_path(cat.data_dir))}
+    idx = SkillIndex(vocab, aliases)
+    idx.signature = _signature(cat)
+    return idx
+
+
+def index(cat=None) -> SkillIndex:
+    """The tenant's skill index, rebuilt when its catalog, alias or vocabulary file changes."""
+    cat = cat or store.catalog()
+    idx = cat.index("skills")
+    sig = _signature(cat)
+    if idx is None or idx.signature != sig:
+        with cat.lock:
+            idx = cat.index("skills")
+            if idx is None or idx.signature != sig:
+                idx = tenants.attach("skills", build(cat), cat)
+    return idx
+
+
+def canonical(skill: str) -> str:
+    """Canonical id of skill in the current tenant's taxonomy (its normalized form if unknown)."""
+    return index().resolve(skill)
@@ -1,12 +1,144 @@
-import json, os, sys
-from typing import List, Optional
+import json, os, sys, gc, pickle, hashlib, threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from .models import Course, JD
+from .role_index import RoleIndex
 
 HERE = os.path.dirname(__file__)
 DATA_DIR = os.path.join(HERE, "data")
+ROLE_MATCH_THRESHOLD = float(os.getenv("ROLE_MATCH_THRESHOLD", "0.6"))
+
+# store.COURSES / JDS / COURSE_POS / ROLE_INDEX / CATALOG_VERSION resolve to the
+# catalog of the tenant the current request is bound to (see tenants.py).
+_CATALOG_ATTRS = {
+    "COURSES": "courses",
+    "JDS": "jds",
+    "COURSE_POS": "course_pos",        # course_id -> position in COURSES
+    "ROLE_INDEX": "role_index",
+    "CATALOG_VERSION": "version",      # changes whenever courses or JDs change
+}
+
+
+class CourseList(Sequence):
+    """
+    Read-only course list backed by one JSON blob; a course is parsed on
+    first access. Used by tenant snapshots so a cold catalog is usable
+    without materializing every Course up front.
+    """
+
+    def __init__(self, blob: bytes, offsets: Sequence[int]):
+        self._blob = blob
+        self._offsets = offsets            # len(courses) + 1 boundaries into blob
+        self._cache: List[Optional[Course]] = [None] * (len(offsets) - 1)
+
+    @classmethod
+    def from_courses(cls, courses: Sequence[Course]) -> "CourseList":
+        parts, offsets, n = [], [0], 0
+        for c in courses:
+            b = c.model_dump_json().encode("utf-8")
+            parts.append(b)
+            n += len(b)
+            offsets.append(n)
+        return cls(b"".join(parts), array("q", offsets))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        c = self._cache[i]
+        if c is None:
+            if i < 0:
+                i += len(self)
+            c = self._cache[i] = Course.model_validate_json(self._blob[self._offsets[i]:self._offsets[i + 1]])
+        return c
+
+    def __getstate__(self):
+        return {"blob": self._blob, "offsets": self._offsets}
+
+    def __setstate__(self, state):
+        self.__init__(state["blob"], state["offsets"])
+
+
+class Catalog:
+    """One tenant's courses and JDs, plus the indexes derived from them."""
+
+    def __init__(self, tenant: str, data_dir: str, courses: List[Course], jds: List[JD], version: str):
+        self.tenant = tenant
+        self.data_dir = data_dir
+        self.courses = courses
+        self.jds = jds
+        self.version = version
+        self.course_pos: Dict[str, int] = {}
+        self.role_index = RoleIndex()
+        # built on demand by retrieval / planner / routes (bm25, ann, planner graph, ...)
+        self.indexes: Dict[str, Any] = {}
+        self.frozen: Dict[str, bytes] = {}    # pickled indexes from a snapshot, thawed by index()
+        self.lock = threading.RLock()
+        self.reindex_courses()
+        self.reindex_roles()
+
+    def index(self, name: str) -> Any:
+        """A derived index by name, unpickling it from the snapshot on first use."""
+        obj = self.indexes.get(name)
+        if obj is None and name in self.frozen:
+            with self.lock:
+                if name in self.frozen:
+                    gc.disable()      # large object graphs unpickle much faster without GC passes
+                    try:
+                        self.indexes[name] = pickle.loads(self.frozen.pop(name))
+                    finally:
+                        gc.enable()
+                obj = self.indexes.get(name)
+        return obj
+
+    def mutable_courses(self) -> List[Course]:
+        if not isinstance(self.courses, list):
+            self.courses = list(self.courses)
+        return self.courses
+
+    def reindex_courses(self):
+        """Rebuild course_id -> position; the first occurrence of a duplicated id wins."""
+        pos: Dict[str, int] = {}
+        for i, c in enumerate(self.courses):
+            pos.setdefault(c.course_id, i)
+        self.course_pos = pos
+
+    def reindex_roles(self):
+        self.role_index = RoleIndex([j.role for j in self.jds], threshold=ROLE_MATCH_THRESHOLD)
+
+    def bump_version(self, *parts: str):
+        h = hashlib.sha1(self.version.encode("utf-8"))
+        for p in parts:
+            h.update(b"\0" + p.encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+    # locks don't pickle; snapshots carry data and indexes only. The role index is
+    # rebuilt on load (cheap), so it always follows the current matcher and threshold
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("lock", None)
+        state.pop("role_index", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.frozen = state.get("frozen", {})
+        self.lock = threading.RLock()
+        self.reindex_roles()
+
+
+def catalog() -> Catalog:
+    from . import tenants
+    return tenants.current()
+
+
+def __getattr__(name: str):
+    if name in _CATALOG_ATTRS:
+        return getattr(catalog(), _CATALOG_ATTRS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-COURSES: List[Course] = []
-JDS: List[JD] = []
 
 def _abspath(p: str) -> str:
     try:
@@ -14,49 +146,158 @@ def _abspath(p: str) -> str:
     except Exception:
         return p
 
-def load_data():
-    """Load courses and JDs; log absolute paths and counts. Non-fatal on missing."""
-    global COURSES, JDS
+def catalog_files(data_dir: str) -> Tuple[str, str]:
+    return os.path.join(data_dir, "courses.json"), os.path.join(data_dir, "jds.json")
 
-    courses_path = os.path.join(DATA_DIR, "courses.json")
-    jds_path = os.path.join(DATA_DIR, "jds.json")
+_source_versions: Dict[Tuple, str] = {}
 
-    print("DEBUG load_data: expected data dir:", _abspath(DATA_DIR))
-    print("DEBUG load_data: courses.json at:", _abspath(courses_path))
-    print("DEBUG load_data: jds.json at:", _abspath(jds_path))
+def source_version(data_dir: str) -> str:
+    """sha1 of the catalog files; identifies a catalog before parsing it (cached per file stat)."""
+    stat = []
+    for p in catalog_files(data_dir):
+        try:
+            st = os.stat(p)
+            stat.append((p, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stat.append((p, None, None))
+    key = tuple(stat)
+    if key in _source_versions:
+        return _source_versions[key]
+    h = hashlib.sha1()
+    for p in catalog_files(data_dir):
+        if os.path.exists(p):
+            with open(p, "rb") as f:
+                h.update(f.read())
+        h.update(b"\0")
+    _source_versions[key] = h.hexdigest()[:16]
+    return _source_versions[key]
 
+def load_catalog(tenant: str, data_dir: str, version: str = None) -> Catalog:
+    """Parse courses.json / jds.json from data_dir. Non-fatal on missing files."""
+    courses_path, jds_path = catalog_files(data_dir)
+    courses: List[Course] = []
+    jds: List[JD] = []
     if not os.path.exists(courses_path):
-        print("ERROR: courses.json not found!", file=sys.stderr)
-        COURSES = []
+        print(f"ERROR: courses.json not found for tenant {tenant}!", file=sys.stderr)
     else:
         with open(courses_path, "r", encoding="utf-8") as f:
             raw = json.load(f)
-            COURSES = [Course(**x) for x in (raw if isinstance(raw, list) else [])]
-
+            courses = [Course(**x) for x in (raw if isinstance(raw, list) else [])]
     if not os.path.exists(jds_path):
-        print("ERROR: jds.json not found!", file=sys.stderr)
-        JDS = []
+        print(f"ERROR: jds.json not found for tenant {tenant}!", file=sys.stderr)
     else:
         with open(jds_path, "r", encoding="utf-8") as f:
             raw = json.load(f)
-            JDS = [JD(**x) for x in (raw if isinstance(raw, list) else [])]
+            jds = [JD(**x) for x in (raw if isinstance(raw, list) else [])]
+    return Catalog(tenant, data_dir, courses, jds, version or source_version(data_dir))
+
+def load_data():
+    """(Re)load the default tenant's courses and JDs; log absolute paths and counts."""
+    from . import tenants
+
+    courses_path, jds_path = catalog_files(DATA_DIR)
+    print("DEBUG load_data: expected data dir:", _abspath(DATA_DIR))
+    print("DEBUG load_data: courses.json at:", _abspath(courses_path))
+    print("DEBUG load_data: jds.json at:", _abspath(jds_path))
 
-    print("DEBUG load_data: courses count:", len(COURSES), "ids:", [c.course_id for c in COURSES])
-    print("DEBUG load_data: jds count:", len(JDS), "roles:", [j.role for j in JDS])
+    cat = tenants.REGISTRY.reload(tenants.DEFAULT_TENANT)
+
+    print("DEBUG load_data: courses count:", len(cat.courses), "ids:", [c.course_id for c in cat.courses])
+    print("DEBUG load_data: jds count:", len(cat.jds), "roles:", [j.role for j in cat.jds])
+
+def resolve_role(role: str) -> Tuple[Optional[JD], float]:
+    """
+    Resolve a free-typed role to a JD: normalized exact match first
+    (confidence 1.0), then weighted trigram similarity above ROLE_MATCH_THRESHOLD
+    with a shared distinguishing word (see role_index).
+    Returns (None, best_score) when nothing is close enough.
+    """
+    cat = catalog()
+    pos, confidence = cat.role_index.lookup(role)
+    if pos is None:
+        return None, confidence
+    return cat.jds[pos], confidence
 
 def get_jd(role: str) -> Optional[JD]:
     """
-    Look up an exact JD by role (case-insensitive).
-    Returns None if not found (no fallback).
+    Look up the JD for a role (see resolve_role).
+    Returns None if no role is close enough.
     """
-    role_l = (role or "").lower().strip()
-    for jd in JDS:
-        if (jd.role or "").lower().strip() == role_l:
-            return jd
-    return None   # <-- stop here if no match
+    return resolve_role(role)[0]
 
 def get_course(cid: str) -> Optional[Course]:
-    for c in COURSES:
-        if c.course_id == cid:
-            return c
-    return None
+    cat = catalog()
+    i = cat.course_pos.get(cid)
+    return cat.courses[i] if i is not None else None
+
+def upsert_course(course: Course) -> int:
+    """Insert or replace a course in place; returns its position in COURSES."""
+    cat = catalog()
+    with cat.lock:
+        cat.bump_version("upsert", course.model_dump_json())
+        courses = cat.mutable_courses()
+        i = cat.course_pos.get(course.course_id)
+        if i is None:
+            courses.append(course)
+            i = len(courses) - 1
+            cat.course_pos[course.course_id] = i
+        else:
+            courses[i] = course
+    return i
+
+def remove_course(cid: str) -> bool:
+    """Drop a course; positions after it shift down by one."""
+    cat = catalog()
+    with cat.lock:
+        i = cat.course_pos.get(cid)
+        if i is None:
+            return False
+        cat.bump_version("remove", cid)
+        del cat.mutable_courses()[i]
+        cat.reindex_courses()
+    return True
+
+def upsert_jds(jds: Sequence[JD]) -> Tuple[int, int]:
+    """
+    Merge JDs into the catalog by normalized role: an existing role is
+    replaced in place, a new one appended. Returns (added, replaced).
+    """
+    from .role_index import normalize_role
+
+    cat = catalog()
+    with cat.lock:
+        merged = list(cat.jds)
+        pos = {}
+        for i, j in enumerate(merged):
+            pos.setdefault(normalize_role(j.role), i)
+        added = replaced = 0
+        for jd in jds:
+            key = normalize_role(jd.role)
+            i = pos.get(key)
+            if i is None:
+                pos[key] = len(merged)
+                merged.append(jd)
+                added += 1
+            else:
+                merged[i] = jd
+                replaced += 1
+        if not (added or replaced):
+            return 0, 0
+        cat.bump_version("jds", *(jd.model_dump_json() for jd in jds))
+        role_index = RoleIndex([j.role for j in merged], threshold=ROLE_MATCH_THRESHOLD)
+        # jds before role_index: a concurrent lookup never gets a position past the list
+        cat.jds = merged
+        cat.role_index = role_index
+    return added, replaced
+
+def save_jds() -> str:
+    """Write the current tenant's JDs back to its jds.json (atomically); returns the path."""
+    cat = catalog()
+    path = catalog_files(cat.data_dir)[1]
+    with cat.lock:
+        data = [j.model_dump() for j in cat.jds]
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,331 @@
+"""
+Tenant-scoped catalogs.
+Each client organization has its own courses.json / jds.json under
+TENANTS_DIR/<tenant>/ (the default tenant uses app/data). A request picks its
+tenant with the X-Tenant header or a /t/<tenant>/ path prefix, and everything
+reading store.COURSES & co. then sees that tenant's catalog.
+
+Loaded catalogs, with the indexes built for them (BM25, role index, planner
+graph, ...), live in an LRU bounded by TENANT_MEMORY_MB; the least recently
+used tenant is evicted once the budget is exceeded (the default tenant is
+pinned). Cold tenants come back from a pickle snapshot in TENANT_SNAPSHOT_DIR
+keyed by tenant and catalog version instead of re-parsing JSON and
+rebuilding indexes. A snapshot keeps courses as one JSON blob parsed per
+course on access and each index pickled separately and unpickled on first
+use, so loading one costs little more than reading the file.
+"""
+import os, re, copy, glob, time, pickle, threading, contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import store
+from .store import Catalog, CourseList
+
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANTS_DIR = os.getenv("TENANTS_DIR", os.path.join(store.DATA_DIR, "tenants"))
+TENANT_SNAPSHOT_DIR = os.getenv("TENANT_SNAPSHOT_DIR", os.path.join(store.DATA_DIR, "snapshots"))
+TENANT_MEMORY_MB = float(os.getenv("TENANT_MEMORY_MB", "512"))
+TENANT_HEADER = b"x-tenant"
+
+_TENANT_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+_PREFIX_RE = re.compile(r"^/t/([^/]+)(/.*)?$")
+_current: contextvars.ContextVar = contextvars.ContextVar("tenant_catalog", default=None)
+
+
+class UnknownTenant(LookupError):
+    def __init__(self, tenant: str):
+        super().__init__(f"Unknown tenant '{tenant}'")
+        self.tenant = tenant
+
+
+def data_dir(tenant: str) -> str:
+    if tenant == DEFAULT_TENANT:
+        return store.DATA_DIR
+    d = os.path.join(TENANTS_DIR, tenant)
+    if not _TENANT_RE.match(tenant) or not os.path.isdir(d):
+        raise UnknownTenant(tenant)
+    return d
+
+
+def available() -> List[str]:
+    names = [DEFAULT_TENANT]
+    if os.path.isdir(TENANTS_DIR):
+        names += sorted(n for n in os.listdir(TENANTS_DIR)
+                        if _TENANT_RE.match(n) and os.path.isdir(os.path.join(TENANTS_DIR, n)))
+    return names
+
+
+_OBJ_BYTES = 64          # rough per-object cost of anything that is not an array or a buffer
+_SAMPLE = 64             # elements looked at per container; the rest are assumed alike
+
+
+def approx_size(obj: Any) -> int:
+    """
+    Resident size estimate, cheap enough to run on every attach: nbytes of
+    NumPy arrays (len of bytes / str / array buffers) plus _OBJ_BYTES per
+    other object. Large containers are extrapolated from their first
+    _SAMPLE elements.
+    """
+    seen = set()
+
+    def sampled(items, n: int) -> int:
+        items = list(items)
+        return sum(size(x) for x in items) * n // len(items) if items else 0
+
+    def size(o: Any) -> int:
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            if o.dtype == object:
+                return _OBJ_BYTES + sampled(o.flat[:_SAMPLE], o.size)
+            return o.nbytes
+        if isinstance(o, (bytes, bytearray, str)):
+            return _OBJ_BYTES + len(o)
+        if isinstance(o, array):
+            return _OBJ_BYTES + len(o) * o.itemsize
+        if isinstance(o, dict):
+            return (_OBJ_BYTES + sampled(islice(o.keys(), _SAMPLE), len(o))
+                    + sampled(islice(o.values(), _SAMPLE), len(o)))
+        if isinstance(o, (list, tuple, set, frozenset)):
+            return _OBJ_BYTES + sampled(islice(o, _SAMPLE), len(o))
+        fields = getattr(o, "__dict__", None)
+        if fields is not None:
+            return _OBJ_BYTES + size(fields)
+        return _OBJ_BYTES
+
+    return size(obj)
+
+
+# ---------- snapshots ----------
+def _snapshot_path(tenant: str, version: str) -> str:
+    return os.path.join(TENANT_SNAPSHOT_DIR, f"{tenant}.{version}.pkl")
+
+
+def _read_snapshot(tenant: str, version: str) -> Optional[Catalog]:
+    try:
+        with open(_snapshot_path(tenant, version), "rb") as f:
+            cat = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return cat if isinstance(cat, Catalog) and cat.version == version else None
+
+
+def _write_snapshot(cat: Catalog) -> int:
+    """Write cat with lazily loadable courses and indexes; drops older snapshots of the tenant. Returns bytes."""
+    with cat.lock:
+        snap = copy.copy(cat)     # requests may be reading cat right now
+        if not isinstance(cat.courses, CourseList):
+            snap.courses = CourseList.from_courses(cat.courses)
+        snap.frozen = {**cat.frozen, **{k: pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+                                        for k, v in cat.indexes.items()}}
+        snap.indexes = {}
+        blob = pickle.dumps(snap, protocol=pickle.HIGHEST_PROTOCOL)
+    os.makedirs(TENANT_SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(cat.tenant, cat.version)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    for old in glob.glob(os.path.join(TENANT_SNAPSHOT_DIR, f"{cat.tenant}.*.pkl")):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return len(blob)
+
+
+# ---------- registry ----------
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tenant-snapshot")
+
+
+class TenantRegistry:
+    def __init__(self, budget_mb: float = TENANT_MEMORY_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._lru: "OrderedDict[str, Catalog]" = OrderedDict()
+        self._bytes: Dict[str, Dict[str, int]] = {}     # tenant -> {"base": n, <index>: n}
+        self._source: Dict[str, str] = {}                # tenant -> version of the files on disk
+        self._dirty: Dict[str, bool] = {}                # indexes built since the last snapshot
+        self._load_ms: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._stats = {"hits": 0, "misses": 0, "loads_snapshot": 0, "loads_source": 0,
+                       "evictions": 0, "snapshots_written": 0}
+
+    def get(self, tenant: str) -> Catalog:
+        with self._lock:
+            cat = self._lru.get(tenant)
+            if cat is not None:
+                self._lru.move_to_end(tenant)
+                self._stats["hits"] += 1
+                return cat
+            self._stats["misses"] += 1
+            loading = self._loading.setdefault(tenant, threading.Lock())
+        with loading:
+            with self._lock:
+                cat = self._lru.get(tenant)
+            if cat is None:
+                cat = self._load(tenant)
+        return cat
+
+    def reload(self, tenant: str) -> Catalog:
+        """Drop the resident copy and load again (picks up edited catalog files)."""
+        with self._lock:
+            self._forget(tenant)
+        return self.get(tenant)
+
+    def _load(self, tenant: str) -> Catalog:
+        d = data_dir(tenant)
+        t0 = time.perf_counter()
+        version = store.source_version(d)
+        cat = _read_snapshot(tenant, version)
+        wrote = False
+        if cat is not None:
+            cat.data_dir = d
+            kind, base = "loads_snapshot", os.path.getsize(_snapshot_path(tenant, version))
+        else:
+            cat = store.load_catalog(tenant, d, version)
+            kind = "loads_source"
+            try:
+                base = _write_snapshot(cat)
+                wrote = True
+            except OSError:
+                base = approx_size(cat)
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self._lru[tenant] = cat
+            self._bytes[tenant] = {"base": base}
+            self._source[tenant] = version
+            self._dirty[tenant] = False
+            self._load_ms[tenant] = round(ms, 2)
+            self._stats[kind] += 1
+            self._stats["snapshots_written"] += wrote
+            victims = self._enforce(keep=tenant)
+        self._save_evicted(victims)
+        return cat
+
+    def attach(self, cat: Catalog, name: str, obj: Any) -> Any:
+        """Store a derived index on cat and charge its size to the tenant's budget."""
+        cat.indexes[name] = obj
+        size = approx_size(obj)
+        victims = []
+        with self._lock:
+            if self._lru.get(cat.tenant) is cat:
+                self._bytes[cat.tenant][name] = size
+                self._dirty[cat.tenant] = True
+                victims = self._enforce(keep=cat.tenant)
+        self._save_evicted(victims)
+        return obj
+
+    def _total(self) -> int:
+        return sum(sum(b.values()) for b in self._bytes.values())
+
+    def _forget(self, tenant: str) -> Optional[Catalog]:
+        cat = self._lru.pop(tenant, None)
+        self._bytes.pop(tenant, None)
+        self._dirty.pop(tenant, None)
+        return cat
+
+    def _enforce(self, keep: str) -> List[Catalog]:
+        """
+        Evict least recently used tenants until within budget (caller holds the
+        lock). Returns the evicted catalogs whose snapshot should be rewritten:
+        the caller hands them to _save_evicted once the lock is released.
+        """
+        victims = []
+        for tenant in list(self._lru):
+            if self._total() <= self.budget_bytes:
+                break
+            if tenant in (keep, DEFAULT_TENANT):
+                continue
+            dirty = self._dirty.get(tenant)
+            source = self._source.get(tenant)
+            cat = self._forget(tenant)
+            self._stats["evictions"] += 1
+            # keep the indexes built while resident, unless the catalog was edited in memory
+            if cat is not None and dirty and cat.version == source:
+                victims.append(cat)
+        return victims
+
+    def _save_evicted(self, victims: List[Catalog]) -> None:
+        """Snapshot evicted catalogs on the background writer, off the request path."""
+        for cat in victims:
+            _writer.submit(self._snapshot_evicted, cat)
+
+    def _snapshot_evicted(self, cat: Catalog) -> None:
+        try:
+            _write_snapshot(cat)
+        except OSError:
+            return
+        with self._lock:
+            self._stats["snapshots_written"] += 1
+
+    def resident(self) -> Dict[str, Catalog]:
+        with self._lock:
+            return dict(self._lru)
+
+    def sizes(self) -> Dict[str, Dict[str, int]]:
+        """Per resident tenant: {"base": catalog bytes, <index>: bytes} (approx_size estimates)."""
+        with self._lock:
+            return {t: dict(b) for t, b in self._bytes.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "budget_mb": round(self.budget_bytes / 1048576, 1),
+                "resident_mb": round(self._total() / 1048576, 2),
+                "tenants": {
+                    t: {"mb": round(sum(self._bytes[t].values()) / 1048576, 2),
+                        "indexes": sorted(set(cat.indexes) | set(cat.frozen)),
+                        "frozen": sorted(cat.frozen),
+                        "courses": len(cat.courses),
+                        "version": cat.version,
+                        "load_ms": self._load_ms.get(t)}
+                    for t, cat in reversed(self._lru.items())      # most recently used first
+                },
+            }
+
+
+REGISTRY = TenantRegistry()
+
+
+def current() -> Catalog:
+    cat = _current.get()
+    return cat if cat is not None else REGISTRY.get(DEFAULT_TENANT)
+
+
+def attach(name: str, obj: Any, cat: Catalog = None) -> Any:
+    return REGISTRY.attach(cat or current(), name, obj)
+
+
+@contextmanager
+def use(cat: Catalog):
+    token = _current.set(cat)
+    try:
+        yield cat
+    finally:
+        _current.reset(token)
+
+
+def tenant_for(scope: Dict[str, Any]) -> str:
+    """
+    Tenant named by the request: a /t/<tenant>/... path prefix (stripped from
+    scope so routes match as usual), else the X-Tenant header, else the default.
+    """
+    m = _PREFIX_RE.match(scope.get("path", ""))
+    if m:
+        scope["path"] = m.group(2) or "/"
+        scope["raw_path"] = scope["path"].encode("utf-8")
+        return m.group(1)
+    for k, v in scope.get("headers") or []:
+        if k == TENANT_HEADER and v:
+            return v.decode("latin-1").strip().lower()
+    return DEFAULT_TENANT
@@ -0,0 +1,80 @@
+"""
+Recall@k / latency report for the local IVF index against exact search.
+
+  python scripts/ann_recall.py                      # course catalog embeddings
+  python scripts/ann_recall.py --synthetic 200000   # random vectors at scale
+
+Prints one row per (quantization, nprobe) so ANN_NPROBE / ANN_QUANT can be
+picked for a recall target.
+"""
+import os, sys, time, argparse
+import numpy as np
+
+HERE = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.ann_index import IVFIndex, QUANTIZATIONS, recall_at_k  # noqa: E402
+
+DATA_DIR = os.path.join(BACKEND_DIR, "app", "data")
+
+
+def catalog_vectors():
+    # the texts the served index embeds (retrieval._course_text of each catalog course)
+    from sentence_transformers import SentenceTransformer
+    from app import store, tenants, retrieval
+    cat = store.load_catalog(tenants.DEFAULT_TENANT, DATA_DIR)
+    ids, texts = [], []
+    for cid, i in cat.course_pos.items():
+        ids.append(cid)
+        texts.append(retrieval._course_text(cat.courses[i].model_dump()))
+    model = SentenceTransformer(retrieval.EMBED_MODEL)
+    return np.asarray(model.encode(texts), dtype=np.float32), ids
+
+
+def synthetic_vectors(n: int, dim: int, seed: int):
+    # clustered data so IVF behaves like it does on real embeddings
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 500), dim))
+    x = centers[rng.integers(len(centers), size=n)] + 0.35 * rng.normal(size=(n, dim))
+    return x.astype(np.float32), [f"c{i}" for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the catalog")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--nlist", type=int, default=0, help="default: ~sqrt(N)")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", default="1,2,4,8,16,32")
+    ap.add_argument("--quant", default=",".join(QUANTIZATIONS))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        vecs, ids = synthetic_vectors(args.synthetic, args.dim, args.seed)
+    else:
+        vecs, ids = catalog_vectors()
+    nlist = args.nlist or max(1, int(np.sqrt(len(ids))))
+    rng = np.random.default_rng(args.seed + 1)
+    # queries: perturbed catalog vectors, so neighbours are meaningful
+    picks = rng.integers(len(vecs), size=args.queries)
+    queries = vecs[picks] + 0.1 * rng.normal(size=(args.queries, vecs.shape[1])).astype(np.float32)
+    nprobes = [int(x) for x in args.nprobe.split(",") if x]
+
+    print(f"vectors={len(ids)} dim={vecs.shape[1]} nlist={nlist} queries={args.queries} k={args.k}")
+    print(f"{'quant':8} {'nprobe':>6} {'recall@' + str(args.k):>10} {'ann_ms':>8} {'exact_ms':>9} {'bytes/vec':>9}")
+    for quant in [q for q in args.quant.split(",") if q]:
+        t0 = time.perf_counter()
+        idx = IVFIndex(nlist=nlist, quantization=quant).build(vecs, ids)
+        build_s = time.perf_counter() - t0
+        per_vec = idx.codes.nbytes / max(1, len(ids)) + (4 if idx.scales is not None else 0)
+        for row in recall_at_k(idx, vecs, queries, k=args.k, nprobes=nprobes):
+            print(f"{quant:8} {row['nprobe']:>6} {row[f'recall@{args.k}']:>10.3f} "
+                  f"{row['ann_ms']:>8.3f} {row['exact_ms']:>9.3f} {per_vec:>9.0f}")
+        print(f"{quant:8} build {build_s:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
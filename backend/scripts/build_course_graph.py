@@ -0,0 +1,51 @@
+"""
+Build or refresh the course-similarity graph behind
+GET /api/courses/{cid}/alternatives.
+
+  python scripts/build_course_graph.py [--data-dir DIR] [--out DIR] [--k 32] [--full]
+
+Incremental by default: only courses added or changed since the last build
+are re-embedded, and only the neighbour rows they affect are recomputed.
+Run it for the first build and after editing courses.json (the API picks up
+the new build within COURSE_GRAPH_RECHECK_S seconds). Courses published
+through the API (retrieval.upsert_course / remove_course) exist only in the
+API's live catalog; the API refreshes the graph itself after those edits,
+with the same course_graph.refresh().
+"""
+import os, sys, time, argparse
+
+HERE = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from app import store, tenants, course_graph  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data-dir", default=store.DATA_DIR, help="catalog to index (courses.json)")
+    ap.add_argument("--out", help="graph directory (default: COURSE_GRAPH_DIR, or <data-dir>/course_graph)")
+    ap.add_argument("--k", type=int, default=course_graph.COURSE_GRAPH_K, help="neighbours kept per course")
+    ap.add_argument("--skill-weight", type=float, default=course_graph.COURSE_GRAPH_SKILL_WEIGHT)
+    ap.add_argument("--full", action="store_true", help="ignore the previous build")
+    args = ap.parse_args()
+
+    from app import retrieval
+
+    tenant = tenants.DEFAULT_TENANT if os.path.abspath(args.data_dir) == os.path.abspath(store.DATA_DIR) else "cli"
+    cat = store.load_catalog(tenant, args.data_dir)
+    out = args.out or course_graph.graph_dir(cat)
+    with tenants.use(cat):
+        t0 = time.perf_counter()
+        meta, build_id = course_graph.refresh(
+            cat, retrieval.embed_documents, lambda c: retrieval._course_text(c.model_dump()),
+            model=retrieval.EMBED_MODEL, path=out, full=args.full, k=args.k, skill_weight=args.skill_weight)
+    st = meta["stats"]
+    print(f"courses         : {st['courses']} ({'incremental' if st['incremental'] else 'full'} build)")
+    print(f"embedded        : {st['embedded']}")
+    print(f"rows recomputed : {st['rows_recomputed']}")
+    print(f"written to      : {out} (build {build_id}) in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
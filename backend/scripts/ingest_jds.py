@@ -0,0 +1,78 @@
+"""
+Extract structured JDs from free-text job descriptions and merge them into
+a catalog's jds.json (by normalized role: existing roles are replaced).
+
+  python scripts/ingest_jds.py INPUT... [--data-dir DIR] [--workers N] [--dry-run] [--out PATH]
+
+INPUT is an NDJSON file of {"role", "text"} objects, a JSON array of them,
+or a directory of .txt files (role = first line). With --dry-run the JDs
+are written to --out (default: stdout) instead of being merged.
+"""
+import os, sys, json, time, argparse
+
+HERE = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from app import store, tenants, jd_ingest  # noqa: E402
+
+
+def read_records(path):
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".txt"):
+                with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+                    yield {"text": f.read()}
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1).lstrip()
+        f.seek(0)
+        if head == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+")
+    ap.add_argument("--data-dir", default=store.DATA_DIR, help="catalog to merge into (courses.json + jds.json)")
+    ap.add_argument("--workers", type=int, default=jd_ingest.INGEST_WORKERS)
+    ap.add_argument("--dry-run", action="store_true", help="print the extracted JDs, don't merge")
+    ap.add_argument("--out", help="with --dry-run: write the JDs here instead of stdout")
+    args = ap.parse_args()
+
+    records = [r for p in args.inputs for r in read_records(p)]
+    cat = store.load_catalog("cli", args.data_dir)
+    with tenants.use(cat):
+        patterns = jd_ingest.surface_patterns(cat)
+        t0 = time.perf_counter()
+        unmatched = {}
+        extracted = jd_ingest.extract_many(records, patterns, workers=args.workers, unmatched=unmatched)
+        secs = time.perf_counter() - t0
+        jds = [store.JD(**d) for d in extracted if d is not None]
+        log = sys.stderr if args.dry_run and not args.out else sys.stdout
+        print(f"records / JDs   : {len(records)} / {len(jds)} ({len(records) - len(jds)} without skills)", file=log)
+        print(f"patterns        : {len(patterns)}", file=log)
+        print(f"extracted in    : {secs:.2f}s ({len(records) / max(secs, 1e-9):,.0f} JDs/s, {args.workers} workers)", file=log)
+        top = jd_ingest.top_unmatched(unmatched, 10)
+        if top:
+            print("unmatched       : " + ", ".join(f"{u['phrase']} ({u['jds']})" for u in top), file=log)
+        if args.dry_run:
+            out = json.dumps([j.model_dump() for j in jds], indent=2, ensure_ascii=False)
+            if args.out:
+                with open(args.out, "w", encoding="utf-8") as f:
+                    f.write(out + "\n")
+            else:
+                print(out)
+            return
+        added, replaced = store.upsert_jds(jds)
+        path = store.save_jds()
+        print(f"added / replaced: {added} / {replaced} ({len(cat.jds)} roles)")
+        print(f"written to      : {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Precompute advise() results for every (role, level, missing-skill set)
+and write the plan lookup table served by POST /api/advise.
+
+  python scripts/materialize_plans.py [--max-skills 10] [--out PATH] [--verify 50]
+
+--verify N compares N sampled table hits with a live advise() run and
+exits non-zero on any difference.
+"""
+import os, sys, time, argparse
+
+HERE = os.path.dirname(__file__)
+BACKEND_DIR = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from app import store, plan_table  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-skills", type=int, default=plan_table.PLAN_TABLE_MAX_SKILLS,
+                    help="skip roles with more required skills than this (2^n subsets each)")
+    ap.add_argument("--out", default=plan_table.PLAN_TABLE_PATH)
+    ap.add_argument("--verify", type=int, default=0, metavar="N",
+                    help="afterwards, check N sampled hits against advise()")
+    args = ap.parse_args()
+
+    store.load_data()
+    t0 = time.perf_counter()
+
+    def progress(n):
+        if n % 50 == 0:
+            print(f"  {n} entries ({time.perf_counter() - t0:.0f}s)")
+
+    table = plan_table.materialize(max_skills=args.max_skills, progress=progress)
+    plan_table.save(table, args.out)
+    print(f"catalog version : {table['version']}")
+    print(f"entries / plans : {len(table['entries'])} / {len(table['plans'])}")
+    if table["skipped_roles"]:
+        print(f"skipped roles   : {', '.join(table['skipped_roles'])}")
+    print(f"written to      : {args.out} in {time.perf_counter() - t0:.1f}s")
+
+    if args.verify:
+        plan_table.load(args.out)
+        bad = plan_table.verify(args.verify)
+        for m in bad:
+            print(f"  {m['reason']:7} {m['role']} / {m['level']} / {m['skills']}")
+        print(f"verify          : {args.verify - len(bad)}/{args.verify} hits match advise()")
+        if bad:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
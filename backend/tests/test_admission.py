@@ -0,0 +1,66 @@
+"""
+Admission pools: the limit shrinks multiplicatively on slow requests (once
+per window), grows additively on fast ones, and excess requests are shed.
+
+  cd backend && python -m pytest -q tests
+"""
+import asyncio, os, sys, time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.admission import AdmissionPool, Overloaded  # noqa: E402
+
+
+def _complete(pool, latency_ms, n=1):
+    async def run():
+        for _ in range(n):
+            await pool.acquire()
+            pool.release(latency_ms)
+    asyncio.run(run())
+
+
+def test_slow_requests_shrink_the_limit_once_per_window():
+    pool = AdmissionPool("t", limit=8, min_limit=2, target_ms=10)
+    _complete(pool, 50)
+    assert pool.limit == 6                  # x0.75
+    _complete(pool, 50, n=3)
+    assert pool.limit == 6                  # same window: a burst of slow requests counts once
+    time.sleep(0.06)
+    _complete(pool, 50)
+    assert pool.limit == 4                  # 4.5
+    for _ in range(3):
+        time.sleep(0.06)
+        _complete(pool, 50)
+    assert pool.limit == 2                  # never below min_limit
+
+
+def test_fast_requests_grow_the_limit_additively():
+    pool = AdmissionPool("t", limit=2, max_limit=5, target_ms=10)
+    _complete(pool, 1, n=2)
+    assert pool.limit == 2                  # +1/limit per request: 2.5, 2.9
+    _complete(pool, 1)
+    assert pool.limit == 3                  # about +1 per `limit` fast requests
+    _complete(pool, 1, n=50)
+    assert pool.limit == 5                  # capped at max_limit
+    assert pool.metrics()["admitted"] == 53
+
+
+def test_full_pool_queues_then_sheds():
+    async def run():
+        pool = AdmissionPool("t", limit=1, max_limit=1, queue_size=1, max_wait_ms=50, target_ms=10)
+        await pool.acquire()
+        queued = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert pool.queue_depth == 1
+        with pytest.raises(Overloaded) as ex:          # queue full: shed at once
+            await pool.acquire()
+        assert ex.value.pool == "t" and ex.value.retry_after_s >= 1
+        pool.release(1)                                # the slot goes to the queued request
+        await queued
+        assert pool.metrics()["in_flight"] == 1
+        with pytest.raises(Overloaded):                # waits max_wait_ms, then gives up
+            await pool.acquire()
+        assert pool.metrics()["shed"] == 2 and pool.queue_depth == 0
+    asyncio.run(run())
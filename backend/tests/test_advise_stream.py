@@ -0,0 +1,83 @@
+"""
+/advise/stream framing: NDJSON lines and Server-Sent Events, events in order.
+advise() is replaced by a stub that emits the real progress events, so only
+the route is under test; it needs the retrieval stack importable and skips otherwise.
+
+  cd backend && python -m pytest -q tests
+"""
+import json, os, sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import store  # noqa: E402
+
+try:
+    from app.api import routes_advise  # noqa: E402
+except ImportError as ex:          # pymongo, langchain, ... not installed
+    pytest.skip(f"advise routes not importable: {ex!r}", allow_module_level=True)
+
+PROFILE = {"skills": ["HTML"], "level": "beginner", "goal_role": "Frontend Developer"}
+RESULT = {
+    "plan": [{"course_id": "react-basics-beg"}],
+    "gap_map": {"react": 1},
+    "timeline": {"weeks": 4, "schedule": []},
+    "notes": "n",
+    "usage": {"jd_found": True, "role_match": {"role": "Frontend Developer", "confidence": 1.0}},
+}
+
+
+def _advise(skills, level, goal_role, prefs=None, state=None, on_event=None, **kw):
+    on_event("gaps", {"gap_map": RESULT["gap_map"], "role_match": RESULT["usage"]["role_match"]})
+    on_event("provisional", {"plan": [{"course_id": "html-css-basics-beg"}], "timeline": RESULT["timeline"]})
+    on_event("plan", {k: RESULT[k] for k in ("plan", "timeline", "notes")})
+    return json.loads(json.dumps(RESULT))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store.load_data()
+    monkeypatch.setattr(routes_advise, "advise", _advise)
+    monkeypatch.setattr(routes_advise.plan_table, "lookup", lambda *a: None)
+    monkeypatch.setattr(routes_advise.shadow, "maybe_run", lambda *a: False)
+    app = FastAPI()
+    app.include_router(routes_advise.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_ndjson_one_event_per_line(client):
+    r = client.post("/api/advise/stream", json=PROFILE)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.text.endswith("\n")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [x["event"] for x in lines] == ["gaps", "provisional", "plan", "usage"]
+    assert lines[2]["data"] == {k: RESULT[k] for k in ("plan", "timeline", "notes")}
+    assert lines[3]["data"]["usage"] == RESULT["usage"] and lines[3]["data"]["result_token"]
+
+
+def test_sse_event_blocks(client):
+    r = client.post("/api/advise/stream", json=PROFILE, headers={"Accept": "text/event-stream"})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert r.text.endswith("\n\n")
+    blocks = [b.split("\n") for b in r.text.split("\n\n") if b]
+    assert [b[0] for b in blocks] == ["event: gaps", "event: provisional", "event: plan", "event: usage"]
+    assert all(len(b) == 2 and b[1].startswith("data: ") for b in blocks)
+    assert json.loads(blocks[0][1][len("data: "):])["gap_map"] == RESULT["gap_map"]
+
+
+def test_plan_table_hit_streams_gaps_plan_usage(client, monkeypatch):
+    monkeypatch.setattr(routes_advise.plan_table, "lookup", lambda *a: json.loads(json.dumps(RESULT)))
+    r = client.post("/api/advise/stream", json=PROFILE)
+    assert [json.loads(line)["event"] for line in r.text.splitlines()] == ["gaps", "plan", "usage"]
+
+
+def test_failure_ends_with_an_error_event(client, monkeypatch):
+    def boom(*a, **kw):
+        kw["on_event"]("gaps", {"gap_map": {}, "role_match": None})
+        raise RuntimeError("boom")
+    monkeypatch.setattr(routes_advise, "advise", boom)
+    lines = [json.loads(line) for line in client.post("/api/advise/stream", json=PROFILE).text.splitlines()]
+    assert [x["event"] for x in lines] == ["gaps", "error"]
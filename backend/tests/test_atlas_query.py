@@ -0,0 +1,62 @@
+"""
+$vectorSearch pipeline against the in-memory LocalVectorCollection.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import atlas_query  # noqa: E402
+from app.atlas_query import LocalVectorCollection, search, vector_search_pipeline  # noqa: E402
+
+DOCS = [
+    {"_id": 1, "course_id": "a", "difficulty": "beginner", "embedding": [1.0, 0.0]},
+    {"_id": 2, "course_id": "b", "difficulty": "advanced", "embedding": [0.9, 0.1]},
+    {"_id": 3, "course_id": "c", "difficulty": "intermediate", "embedding": [0.0, 1.0]},
+    {"_id": 4, "course_id": "d", "difficulty": "advanced", "embedding": [-1.0, 0.0]},
+    {"_id": 5, "course_id": "e", "difficulty": "beginner", "embedding": [0.6, 0.8]},
+]
+
+
+@pytest.fixture
+def coll():
+    return LocalVectorCollection(DOCS)
+
+
+def test_pipeline_sizes_candidates_and_limit():
+    stage = vector_search_pipeline([1, 0], k=4, index_name="idx")[0]["$vectorSearch"]
+    assert stage["limit"] == 4 and stage["numCandidates"] == 4 * atlas_query.NUM_CANDIDATES_FACTOR
+    assert "filter" not in stage
+    assert vector_search_pipeline([1, 0], 4, "idx", num_candidates=100)[0]["$vectorSearch"]["numCandidates"] == 100
+    # never fewer candidates than results
+    assert vector_search_pipeline([1, 0], 4, "idx", num_candidates=2)[0]["$vectorSearch"]["numCandidates"] == 4
+
+
+def test_limit_and_projected_score(coll):
+    rows = coll.aggregate(vector_search_pipeline([1.0, 0.0], k=3, index_name="idx"))
+    assert [r["course_id"] for r in rows] == ["a", "b", "e"]
+    assert all(set(r) == {"course_id", "score"} for r in rows)      # no _id, no embedding
+    # Atlas cosine score: (1 + cos) / 2
+    assert rows[0]["score"] == pytest.approx(1.0)
+    assert rows[1]["score"] == pytest.approx((1 + 0.9 / (0.9 ** 2 + 0.1 ** 2) ** 0.5) / 2)
+    assert rows[2]["score"] == pytest.approx(0.8)
+
+
+@pytest.mark.parametrize("level,allowed", [
+    ("beginner", {"beginner", "intermediate"}),
+    ("advanced", {"intermediate", "advanced"}),
+    ("intermediate", {"beginner", "intermediate", "advanced"}),
+])
+def test_difficulty_prefilter(coll, level, allowed):
+    hits = search(coll, [1.0, 0.0], k=5, index_name="idx", level=level)
+    by_id = {d["course_id"]: d["difficulty"] for d in DOCS}
+    assert {cid for cid, _ in hits} == {cid for cid, diff in by_id.items() if diff in allowed}
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+def test_prefilter_applies_before_limit(coll):
+    # "b" and "d" are advanced; a beginner search with limit 2 still returns 2 results
+    assert [cid for cid, _ in search(coll, [1.0, 0.0], k=2, index_name="idx", level="beginner")] == ["a", "e"]
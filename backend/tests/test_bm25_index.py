@@ -0,0 +1,67 @@
+"""
+Incremental BM25: Okapi scores, and edits that leave the index as a fresh build would.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, random, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.bm25_index import IncrementalBM25  # noqa: E402
+
+
+def test_okapi_reference_scores():
+    # N=3, avgdl=8/3. "python" and "web" are in 2 of 3 documents, so their idf
+    # log(1.5) - log(2.5) is negative and floored to 0.25 * mean idf
+    idx = IncrementalBM25()
+    for key, text in [("d1", "python data python"), ("d2", "java web"), ("d3", "python web api")]:
+        idx.add(key, text)
+    assert idx.get_scores("python api") == pytest.approx({"d1": 0.0350781544, "d3": 0.5078029869})
+    assert idx.get_scores("java") == pytest.approx({"d2": 0.5755781676})
+    pos = {"d3": 0, "d1": 1, "d2": 2}
+    np.testing.assert_allclose(idx.aligned_scores("python api", pos, 4), [0.5078029869, 0.0350781544, 0, 0],
+                               rtol=1e-6)
+
+
+def _docs(rng, n):
+    words = [f"w{i}" for i in range(40)]
+    return {f"c{i}": " ".join(rng.choice(words) for _ in range(rng.randint(1, 12))) for i in range(n)}
+
+
+def test_edits_score_like_a_fresh_index():
+    rng = random.Random(0)
+    docs = _docs(rng, 60)
+    idx = IncrementalBM25()
+    for key, text in docs.items():
+        idx.add(key, text)
+    queries = ["w1 w2 w3", "w7", "w0 w0 w39", "nothing here"]
+    for step in range(200):
+        op = rng.random()
+        if op < 0.4 and docs:
+            key = rng.choice(sorted(docs))
+            del docs[key]
+            assert idx.delete(key)
+        elif op < 0.7 and docs:
+            key = rng.choice(sorted(docs))
+            docs[key] = _docs(rng, 1)["c0"]
+            idx.update(key, docs[key])
+        else:
+            key = f"n{step}"
+            docs[key] = _docs(rng, 1)["c0"]
+            idx.add(key, docs[key])
+        if step % 50 == 49:
+            idx.compact()
+        if step % 10 == 0:
+            idx.aligned_scores(queries[0], {k: i for i, k in enumerate(sorted(docs))}, len(docs), tag=step)
+
+    fresh = IncrementalBM25()
+    for key in sorted(docs, key=lambda k: rng.random()):
+        fresh.add(key, docs[key])
+    pos = {k: i for i, k in enumerate(sorted(docs))}
+    for q in queries:
+        np.testing.assert_allclose(idx.aligned_scores(q, pos, len(pos), tag="final"),
+                                   fresh.aligned_scores(q, pos, len(pos)), rtol=1e-6)
+        assert idx.get_scores(q) == pytest.approx(fresh.get_scores(q))
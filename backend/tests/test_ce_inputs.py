@@ -0,0 +1,74 @@
+"""
+Pre-tokenized cross-encoder inputs: truncation and scores match the tokenizer and CrossEncoder.predict.
+The model tests run when CROSS_ENCODER is available locally (no download) and skip otherwise.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ce_inputs import PairEncoder, TextScorer, fit_lengths  # noqa: E402
+
+CROSS_ENCODER = os.getenv("CROSS_ENCODER", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+
+# (query, doc, budget) -> kept, as a fast tokenizer's longest_first truncation keeps them
+@pytest.mark.parametrize("lq,ld,budget,kept", [
+    (3, 4, 10, (3, 4)),         # fits
+    (8, 2, 6, (4, 2)),          # the longer one gives way
+    (2, 8, 6, (2, 4)),
+    (20, 3, 10, (7, 3)),
+    (5, 5, 6, (3, 3)),          # both too long: split evenly ...
+    (5, 5, 5, (2, 3)),          # ... the odd token goes to the document
+    (7, 7, 7, (3, 4)),
+    (12, 9, 7, (4, 3)),
+    (9, 9, 4, (2, 2)),
+    (10, 1, 6, (5, 1)),
+])
+def test_fit_lengths_longest_first(lq, ld, budget, kept):
+    assert fit_lengths(lq, ld, budget) == kept
+
+
+def _cross_encoder():
+    pytest.importorskip("torch")
+    st = pytest.importorskip("sentence_transformers")
+    try:
+        return st.CrossEncoder(CROSS_ENCODER, local_files_only=True)
+    except Exception as ex:         # not cached locally: no downloads in tests
+        pytest.skip(f"{CROSS_ENCODER} not available locally: {ex!r}")
+
+
+@pytest.fixture(scope="module")
+def ce():
+    return _cross_encoder()
+
+
+def test_fit_lengths_matches_the_tokenizer(ce):
+    tok = ce.tokenizer
+    for lq in range(1, 12):
+        for ld in range(1, 12):
+            for budget in range(2, 14):
+                enc = tok(" ".join(["a"] * lq), " ".join(["b"] * ld), truncation="longest_first",
+                          max_length=budget + tok.num_special_tokens_to_add(pair=True))
+                seq = enc.sequence_ids()
+                assert fit_lengths(lq, ld, budget) == (seq.count(0), seq.count(1)), (lq, ld, budget)
+
+
+def test_pretokenized_scores_equal_predict(ce):
+    enc = PairEncoder(ce)
+    long_doc = "distributed systems and cloud infrastructure " * 200      # truncated to the budget
+    pairs = [("python backend developer", "Intro to Python programming"),
+             ("python backend developer", "Advanced React patterns for frontend apps"),
+             ("data engineer with spark", long_doc),
+             ("x " * 600, "short course"),                                # the query is truncated too
+             ("kubernetes", "")]
+    expected = np.asarray(ce.predict(pairs), dtype=np.float32)
+    np.testing.assert_allclose(TextScorer(enc)(pairs), expected, rtol=1e-4, atol=1e-5)
+    docs = [np.asarray(ids, dtype=np.int32) for ids in enc.tokenize([d for _, d in pairs[:3]])]
+    np.testing.assert_allclose(enc.score("python backend developer", docs),
+                               np.asarray(ce.predict([("python backend developer", d) for _, d in pairs[:3]])),
+                               rtol=1e-4, atol=1e-5)
@@ -0,0 +1,76 @@
+"""
+Course graph: an incremental rebuild after catalog edits gives the same
+neighbours and scores as building the edited catalog from scratch.
+
+  cd backend && python -m pytest -q tests
+"""
+import hashlib, os, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import course_graph, store  # noqa: E402
+
+
+def _embed(texts):
+    """Deterministic bag-of-words vectors: each word hashed into one of 64 dimensions."""
+    out = np.zeros((len(texts), 64), dtype=np.float32)
+    for r, t in enumerate(texts):
+        for w in t.lower().split():
+            out[r, int(hashlib.md5(w.encode()).hexdigest(), 16) % 64] += 1.0
+    return out
+
+
+def _text(c):
+    return " ".join([c.title, *(c.skills or []), *(c.outcomes or [])])
+
+
+@pytest.fixture(scope="module")
+def courses():
+    store.load_data()
+    cat = store.catalog()
+    return [cat.courses[i] for i in sorted(cat.course_pos.values())]
+
+
+def _build(path, courses, previous=None):
+    meta, arrays = course_graph.build(courses, _embed, _text, previous=previous, k=8, model="hash")
+    course_graph.save(str(path), meta, arrays, "v")
+    return meta, course_graph.load(str(path))
+
+
+def _rows(g):
+    """course id -> {neighbour id: score}, and each row's k-th score (where ties may be cut)."""
+    rows, cut = {}, {}
+    for cid, nbrs, scores in zip(g.ids, np.asarray(g.neighbors), np.asarray(g.scores, dtype=np.float32)):
+        rows[cid] = {g.ids[j]: s for j, s in zip(nbrs, scores) if j >= 0}
+        cut[cid] = scores[-1] if nbrs[-1] >= 0 else -np.inf
+    return rows, cut
+
+
+def test_incremental_rebuild_equals_full_build(tmp_path, courses):
+    _, before = _build(tmp_path / "inc", courses)
+
+    edited = list(courses)
+    edited[3] = edited[3].model_copy(update={"title": "Kubernetes for frontend teams",
+                                             "skills": ["kubernetes", "react"]})
+    edited[10] = edited[10].model_copy(update={"skills": [*edited[10].skills, "docker"]})
+    del edited[20]                                                   # a removed course
+    edited.append(courses[0].model_copy(update={"course_id": "new-course", "title": "PyTorch and pandas",
+                                                "skills": ["pytorch", "pandas"]}))
+
+    meta, inc = _build(tmp_path / "inc", edited, previous=before)
+    assert meta["stats"]["incremental"] and meta["stats"]["embedded"] == 3
+    assert meta["stats"]["rows_recomputed"] < len(edited)
+    _, full = _build(tmp_path / "full", edited)
+    assert inc.ids == full.ids
+
+    got, cut = _rows(inc)
+    want, _ = _rows(full)
+    for cid in full.ids:
+        # the same neighbours, except where the k-th place is a tie either side may have taken
+        a = {j for j, s in got[cid].items() if s > cut[cid]}
+        b = {j for j, s in want[cid].items() if s > cut[cid]}
+        assert a == b, cid
+        assert sorted(got[cid].values()) == pytest.approx(sorted(want[cid].values()), abs=1e-3), cid
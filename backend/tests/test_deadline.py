@@ -0,0 +1,55 @@
+"""
+Stage deadlines: abandoned stages stop early and a saturated pool degrades at once.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, sys, time, threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import deadline  # noqa: E402
+from app.deadline import StageTimeout, check_stage, run_with_timeout  # noqa: E402
+
+
+def _batches(n, seconds, done):
+    # a stage doing n steps of work, checking its slice between steps
+    for _ in range(n):
+        check_stage()
+        time.sleep(seconds)
+    done.set()
+
+
+def test_abandoned_stage_stops_between_steps():
+    pool = ThreadPoolExecutor(max_workers=1)
+    done = threading.Event()
+    with deadline.isolated(pool, {}):
+        with pytest.raises(StageTimeout):
+            run_with_timeout(_batches, 50, 20, 0.02, done)
+    pool.shutdown(wait=True)            # returns once the stage noticed and stopped
+    assert not done.is_set()
+    assert deadline.stage_load(pool) == {"in_flight": 0, "abandoned": 0}
+
+
+def test_saturated_pool_refuses_new_stages(monkeypatch):
+    monkeypatch.setattr(deadline, "STAGE_MAX_QUEUED", 0)
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    with deadline.isolated(pool, {}):
+        with pytest.raises(StageTimeout):
+            run_with_timeout(release.wait, 20)     # ignores its slice: keeps the only worker
+        assert deadline.stage_load(pool) == {"in_flight": 1, "abandoned": 1}
+        t0 = time.perf_counter()
+        with pytest.raises(StageTimeout, match="saturated"):
+            run_with_timeout(time.sleep, 1000, 0)
+        assert time.perf_counter() - t0 < 0.1
+        release.set()
+        pool.shutdown(wait=True)
+    assert deadline.stage_load(pool) == {"in_flight": 0, "abandoned": 0}
+
+
+def test_stage_within_budget_returns():
+    assert run_with_timeout(lambda x: x + 1, 1000, 1) == 2
+    assert not deadline.stage_expired()      # outside a stage
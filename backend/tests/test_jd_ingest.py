@@ -0,0 +1,73 @@
+"""
+JD skill extraction: the Aho-Corasick pass finds what a word-bounded regex
+alternation over the same surface forms finds, plus levels and nice-to-haves.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, random, re, sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import jd_ingest, store  # noqa: E402
+from app.jd_ingest import AhoCorasick, SkillExtractor, surface_patterns, tokenize  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def patterns():
+    store.load_data()
+    return surface_patterns()
+
+
+@pytest.fixture(scope="module")
+def extractor(patterns):
+    return SkillExtractor(patterns)
+
+
+def _regex_skills(text, patterns):
+    """The straightforward extractor: one alternation of every surface form, longest first, on token bounds."""
+    forms = sorted({" ".join(tokenize(f)) for f in patterns if tokenize(f)}, key=len, reverse=True)
+    label = {" ".join(tokenize(f)): lbl for f, lbl in patterns.items() if tokenize(f)}
+    rx = re.compile(r"(?<![a-z0-9+#])(?:" + "|".join(map(re.escape, forms)) + r")(?![a-z0-9+#])")
+    found = set()
+    for line in jd_ingest._LINE_RE.split(text.lower()):
+        found |= {label[m.group(0)] for m in rx.finditer(" ".join(tokenize(line)))}
+    return found
+
+
+def test_automaton_finds_every_occurrence():
+    table = {("a",): "A", ("a", "b"): "AB", ("b", "c", "d"): "BCD", ("c",): "C"}
+    ac = AhoCorasick(table)
+    tokens = "x a b c d a a b z c".split()
+    naive = {(i, len(p), v) for p, v in table.items()
+             for i in range(len(tokens)) if tuple(tokens[i:i + len(p)]) == p}
+    assert set(ac.finditer(tokens)) == naive
+
+
+def test_matches_regex_extractor(patterns, extractor):
+    rng = random.Random(0)
+    forms = sorted(patterns)
+    filler = ["with", "experience", "and", "the", "team", "building", "services", "we", "use"]
+    for _ in range(300):
+        words = [rng.choice(forms) if rng.random() < 0.3 else rng.choice(filler) for _ in range(rng.randint(5, 30))]
+        text = " ".join(words)
+        found, nice = extractor.extract(text)
+        expected = _regex_skills(text, patterns)
+        if len(expected) <= jd_ingest.INGEST_MAX_SKILLS:
+            assert set(found) | set(nice) == expected, text
+
+
+def test_aliases_levels_and_nice_to_have(extractor):
+    text = ("Requirements:\n"
+            "- Expert in Node.js and k8s\n"
+            "- Basic understanding of scikit learn\n"
+            "- 5+ years of Python\n"
+            "Nice to have:\n"
+            "- Docker")
+    found, nice = extractor.extract(text)
+    by_cid = {re.sub(r"[^a-z0-9]", "", k.lower()): v for k, v in found.items()}
+    assert by_cid["nodejs"] == 3 and by_cid["kubernetes"] == 3
+    assert by_cid["scikitlearn"] == 1
+    assert by_cid["python"] == 3
+    assert [re.sub(r"[^a-z0-9]", "", s.lower()) for s in nice] == ["docker"]
@@ -0,0 +1,152 @@
+"""
+Planner guarantees over every JD of the bundled catalog:
+- the schedule ends within prefs.max_weeks;
+- no track runs two courses in the same week, and at most parallel_tracks tracks are used;
+- every prerequisite in the plan ends before its dependant starts;
+- covered + uncovered is exactly the missing set.
+
+  cd backend && python -m pytest -q tests
+"""
+import json, os, sys, itertools
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import store, skills, planner, tenants  # noqa: E402
+
+LEVELS = ("beginner", "intermediate", "advanced")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    store.load_data()
+
+
+def _missing(jd, held=()):
+    taxonomy = skills.index()
+    have = {taxonomy.resolve(s) for s in held}
+    return [n for n in dict.fromkeys(taxonomy.resolve(x.skill) for x in jd.skills_required) if n not in have]
+
+
+def _cases():
+    for jd, level in itertools.product(store.JDS, LEVELS):
+        for max_weeks, tracks in itertools.product((None, 2, 3, 4, 6, 9), (1, 2, 3)):
+            yield jd, level, max_weeks, tracks
+
+
+def _check(opt, missing, max_weeks, tracks):
+    sched = opt["schedule"]
+    assert opt["weeks"] == max((e["end_week"] for e in sched), default=0)
+    if max_weeks:
+        assert opt["weeks"] <= max_weeks
+    assert {e["track"] for e in sched} <= set(range(tracks))
+    for t in range(tracks):
+        spans = sorted((e["start_week"], e["end_week"]) for e in sched if e["track"] == t)
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            assert start > end
+    g = planner.graph()
+    at = {e["idx"]: e for e in sched}
+    for e in sched:
+        assert e["end_week"] - e["start_week"] + 1 == e["weeks"]
+        for p in g.closure(e["idx"]):
+            if p in at:
+                assert at[p]["end_week"] < e["start_week"]
+    assert sorted(opt["covered"] + opt["uncovered"]) == sorted(missing)
+
+
+def test_budget_tracks_and_prerequisites():
+    checked = 0
+    for jd, level, max_weeks, tracks in _cases():
+        missing = _missing(jd)
+        opt = planner.optimize(missing, [], level, max_weeks=max_weeks, parallel_tracks=tracks)
+        if opt is None:
+            continue
+        _check(opt, missing, max_weeks, tracks)
+        checked += 1
+    assert checked
+
+
+@pytest.mark.parametrize("role,level,max_weeks,tracks", [
+    ("DevOps Engineer", "advanced", 6, 2),
+    ("Machine Learning Engineer", "beginner", 3, 3),
+])
+def test_budget_is_calendar_weeks(role, level, max_weeks, tracks):
+    missing = _missing(store.get_jd(role))
+    opt = planner.optimize(missing, [], level, max_weeks=max_weeks, parallel_tracks=tracks)
+    assert opt["weeks"] <= max_weeks
+    if opt["uncovered"]:
+        assert opt["objective"] == "max_coverage"
+
+
+def test_unlimited_budget_covers_everything_teachable():
+    for jd, level in itertools.product(store.JDS, LEVELS):
+        missing = _missing(jd)
+        opt = planner.optimize(missing, [], level)
+        if opt is None:
+            continue
+        g = planner.graph()
+        teachable = [s for s in missing if s in g.by_skill]
+        assert sorted(opt["covered"]) == sorted(teachable)
+
+
+def test_held_skills_are_not_planned():
+    jd = store.get_jd("Frontend Developer")
+    held = [jd.skills_required[0].skill]
+    missing = _missing(jd, held)
+    opt = planner.optimize(missing, held, "beginner")
+    assert skills.index().resolve(held[0]) not in opt["covered"] + opt["uncovered"]
+
+
+def test_plan_courses_match_the_learner_level():
+    rank = {"beginner": 0, "intermediate": 1, "advanced": 2}
+    g = planner.graph()
+    for jd, level in itertools.product(store.JDS, LEVELS):
+        missing = _missing(jd)
+        opt = planner.optimize(missing, [], level)
+        if opt is None:
+            continue
+        prereqs = {p for i in opt["courses"] for p in g.closure(i)}
+        for i in opt["courses"]:
+            if i in prereqs:
+                continue
+            taught = g.skills[i] & set(opt["covered"])
+            assert g.rank[i] == rank[level] or taught & set(opt["off_level"]), \
+                (jd.role, level, store.COURSES[i].course_id)
+
+
+def test_retrieval_rank_breaks_near_ties():
+    # react-advanced-beg is a week longer than react-basics-beg: ranked first, it wins
+    missing = _missing(store.get_jd("Frontend Developer"))
+    ids = lambda opt: [store.COURSES[i].course_id for i in opt["courses"]]
+    assert "react-basics-beg" in ids(planner.optimize(missing, [], "beginner"))
+    preferred = [store.COURSE_POS["react-advanced-beg"]]
+    assert "react-advanced-beg" in ids(planner.optimize(missing, [], "beginner", preferred=preferred))
+
+
+def test_bound_counts_skills_taught_by_prerequisites(tmp_path):
+    # a beginner; terraform is only taught at advanced level, by a short course
+    # and by one whose intermediate prerequisite also teaches ansible
+    def course(cid, skill, difficulty, weeks, prerequisites=()):
+        return {"course_id": cid, "title": cid, "skills": [skill], "difficulty": difficulty,
+                "duration_weeks": weeks, "prerequisites": list(prerequisites), "outcomes": []}
+    courses = [
+        course("tf-short-adv", "terraform", "advanced", 1),
+        course("infra-int", "ansible", "intermediate", 1),
+        course("infra-adv", "terraform", "advanced", 1, ["Basic knowledge of ansible"]),
+        course("ansible-beg", "ansible", "beginner", 10),
+    ]
+    (tmp_path / "acme").mkdir()
+    (tmp_path / "acme" / "courses.json").write_text(json.dumps(courses), encoding="utf-8")
+    (tmp_path / "acme" / "jds.json").write_text("[]", encoding="utf-8")
+    saved = tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR
+    tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = str(tmp_path), str(tmp_path / "snapshots")
+    try:
+        with tenants.use(tenants.TenantRegistry(budget_mb=64).get("acme")):
+            opt = planner.optimize(["terraform", "ansible"], [], "beginner")
+            ids = sorted(store.COURSES[i].course_id for i in opt["courses"])
+    finally:
+        tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = saved
+    # the greedy seed takes tf-short-adv for terraform first (3 weeks in all); the bound
+    # for ansible is infra-int's week, not ansible-beg's 10, so the search finds 2 weeks
+    assert opt["optimal"] and ids == ["infra-adv", "infra-int"]
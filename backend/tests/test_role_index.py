@@ -0,0 +1,100 @@
+"""
+Role resolution: generic role nouns alone never pick a JD.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, random, statistics, string, sys, time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import store  # noqa: E402
+from app.role_index import (  # noqa: E402
+    AMBIGUITY_MARGIN, GENERIC_ROLE_WORDS, RoleIndex, _same_word, core_words, normalize_role, weighted_trigrams,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    store.load_data()
+
+
+@pytest.mark.parametrize("query", [
+    "Developer", "Engineer", "Android Developer", "Java Developer", "QA Engineer", "Data", "",
+])
+def test_unresolvable_roles_have_no_jd(query):
+    jd, _ = store.resolve_role(query)
+    assert jd is None
+
+
+@pytest.mark.parametrize("query,role", [
+    ("Backend Eng", "Backend Developer"),
+    ("Frontend Engineer", "Frontend Developer"),
+    ("Fronted Developer", "Frontend Developer"),
+    ("Sr. Machine Learning Dev", "Machine Learning Engineer"),
+    ("Dev Ops Engineer", "DevOps Engineer"),
+    ("Data Engineering", "Data Engineer"),
+])
+def test_distinguishing_words_resolve(query, role):
+    jd, conf = store.resolve_role(query)
+    assert jd is not None and jd.role == role
+    assert conf >= store.ROLE_MATCH_THRESHOLD
+
+
+def test_joined_words_only_fold_whole_words():
+    assert normalize_role("Front End Developer") == "frontend developer"
+    assert normalize_role("Feedback Endpoint Engineer") == "feedback endpoint engineer"
+
+
+def _synthetic_roles(n, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(3000)]
+    generic = sorted(GENERIC_ROLE_WORDS)
+    roles = {f"{rng.choice(words)} {rng.choice(words) + ' ' if rng.random() < .5 else ''}{rng.choice(generic)}"
+             for _ in range(int(n * 1.3))}
+    return sorted(roles)[:n], rng
+
+
+def _typo(rng, s):
+    i = rng.randrange(len(s))
+    return s[:i] + rng.choice("aeiourst") + s[i + 1:]
+
+
+def test_pruned_lookup_matches_full_scan():
+    roles, rng = _synthetic_roles(1000)
+    idx = RoleIndex(roles)
+    indexed = [(core_words(normalize_role(r)), weighted_trigrams(normalize_role(r))) for r in roles]
+    matched = 0
+    for q in [_typo(rng, r) for r in rng.sample(roles, 60)] + [r.split()[0] + " dev" for r in rng.sample(roles, 20)]:
+        norm = normalize_role(q)
+        if norm in idx._exact:
+            continue
+        grams, core = weighted_trigrams(norm), core_words(norm)
+        scored = []
+        for i, (rc, rg) in enumerate(indexed):
+            if any(_same_word(a, b) for a in core for b in rc):
+                shared = sum(min(w, rg[g]) for g, w in grams.items() if g in rg)
+                scored.append((round(2.0 * shared / (sum(grams.values()) + sum(rg.values())), 3), i))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        expect = None
+        if scored and scored[0][0] >= idx.threshold:
+            close = len(scored) > 1 and scored[1][0] >= scored[0][0] - AMBIGUITY_MARGIN
+            expect = None if close else scored[0][1]
+        assert idx.lookup(q)[0] == expect, q
+        matched += expect is not None
+    assert matched > 30
+
+
+def test_lookup_is_sub_ms_at_100k_roles():
+    roles, rng = _synthetic_roles(100_000)
+    idx = RoleIndex(roles)
+    queries = [_typo(rng, r) + " dev" for r in rng.sample(roles, 300)]
+    for q in queries[:50]:
+        idx.lookup(q)
+    times = []
+    for q in queries:
+        t = time.perf_counter()
+        idx.lookup(q)
+        times.append(time.perf_counter() - t)
+    assert statistics.median(times) < 1e-3
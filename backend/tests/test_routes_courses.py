@@ -0,0 +1,86 @@
+"""
+Catalog API: ETag revalidation per tenant, cursor paging, NDJSON export.
+
+  cd backend && python -m pytest -q tests
+"""
+import json, os, shutil, sys
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import store, tenants  # noqa: E402
+from app.api.routes_courses import router  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    store.load_data()
+    root = tmp_path_factory.mktemp("tenants")
+    # a second tenant with the very same files: same catalog version, different tenant
+    os.makedirs(root / "acme")
+    for path in store.catalog_files(store.DATA_DIR):
+        shutil.copy(path, root / "acme")
+    saved = tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR
+    tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = str(root), str(root / "snapshots")
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def tenant_scope(request: Request, call_next):     # as in app.main
+        with tenants.use(tenants.REGISTRY.get(tenants.tenant_for(request.scope))):
+            return await call_next(request)
+
+    app.include_router(router, prefix="/api")
+    yield TestClient(app)
+    tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = saved
+
+
+def test_etag_revalidates_with_304(client):
+    r = client.get("/api/courses?limit=5")
+    assert r.status_code == 200 and r.headers["vary"] == "X-Tenant"
+    etag = r.headers["etag"]
+    again = client.get("/api/courses?limit=5", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+    other = client.get("/api/courses?limit=6", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_etag_differs_per_tenant(client):
+    default = client.get("/api/courses?limit=5")
+    acme = client.get("/api/courses?limit=5", headers={"X-Tenant": "acme"})
+    assert default.json()["catalog_version"] == acme.json()["catalog_version"]
+    assert default.headers["etag"] != acme.headers["etag"]
+    r = client.get("/api/courses?limit=5", headers={"X-Tenant": "acme", "If-None-Match": default.headers["etag"]})
+    assert r.status_code == 200
+
+
+def test_cursor_pages_cover_the_catalog_once(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/courses", params=params).json()
+        seen += [c["course_id"] for c in body["courses"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(store.COURSE_POS)
+    assert len(seen) == body["total"]
+
+
+def test_bulk_fetch_lists_missing_ids(client):
+    cid = next(iter(store.COURSE_POS))
+    body = client.get("/api/courses", params={"ids": f"{cid},nope", "fields": "title"}).json()
+    assert body["courses"] == [{"course_id": cid, "title": store.get_course(cid).title}]
+    assert body["missing"] == ["nope"]
+
+
+def test_ndjson_export_is_one_course_per_line(client):
+    r = client.get("/api/courses/export.ndjson", params={"fields": "title"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.text.endswith("\n")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["course_id"] for row in rows] == sorted(store.COURSE_POS)
+    assert all(set(row) == {"course_id", "title"} for row in rows)
@@ -0,0 +1,70 @@
+"""
+NumPy fusion and top k: same order as the Python ranking they replaced
+(score descending, ties in catalog order).
+
+  cd backend && python -m pytest -q tests
+"""
+import os, random, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import scoring, store  # noqa: E402
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    store.load_data()
+
+
+def _python_ranking(scores, k):
+    return sorted(enumerate(scores), key=lambda t: (-t[1], t[0]))[:k]
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 17, 40, 200])
+def test_top_k_ties_keep_catalog_order(k):
+    rng = random.Random(k)
+    scores = np.asarray([rng.choice([0.0, 0.25, 0.5, 0.75, 1.0]) for _ in range(120)], dtype=np.float32)
+    assert scoring.top_k(scores, k) == _python_ranking(scores.tolist(), k)
+
+
+def test_weighted_fusion_matches_python_ranking():
+    n = len(store.COURSES)
+    rng = random.Random(0)
+    # dyadic scores keep float32 exact, so ties are real ties on both sides
+    bm25 = [rng.choice([0.0, 0.0, 1.0, 2.0, 4.0]) for _ in range(n)]
+    vector = [(i, rng.choice([1.0, 2.0, 3.0, 5.0])) for i in rng.sample(range(n), n // 3)]
+    level, step, cap, w_bm25, w_vec = "beginner", 0.25, 0.6, 0.5, 0.5
+
+    # the previous per-candidate Python fusion
+    top = max(bm25)
+    lo, hi = min(s for _, s in vector), max(s for _, s in vector)
+    vec = {i: (s - lo) / (hi - lo) for i, s in vector}
+    rank = scoring.DIFFICULTY_RANK
+    fused = []
+    for i, c in enumerate(store.COURSES):
+        dist = abs(rank.get(str(c.difficulty or "intermediate").lower().strip(), 1) - rank[level])
+        fused.append((w_bm25 * bm25[i] / top + w_vec * vec.get(i, 0.0)) * (1.0 - min(cap, step * dist)))
+
+    got = scoring.rank_catalog(np.asarray(bm25, dtype=np.float32), vector, level, k=25,
+                               w_bm25=w_bm25, w_vec=w_vec, level_step=step, level_cap=cap, method="weighted")
+    want = _python_ranking(fused, 25)
+    assert [i for i, _ in got] == [i for i, _ in want]
+    assert [s for _, s in got] == pytest.approx([s for _, s in want])
+
+
+def test_rrf_ranks_agreeing_lists_first():
+    n = len(store.COURSES)
+    bm25 = np.zeros(n, dtype=np.float32)
+    bm25[[3, 1, 2]] = [3.0, 2.0, 1.0]
+    got = scoring.rank_catalog(bm25, [(3, 0.9), (2, 0.8), (1, 0.7)], "intermediate", k=3,
+                               level_step=0.0, method="rrf")
+    assert [i for i, _ in got] == [3, 1, 2]     # 1 and 2 tie on rank sums: catalog order
+    assert got[0][1] == pytest.approx(1.0)      # first in both lists: w_bm25 + w_vec
+
+
+def test_unknown_fusion_method():
+    with pytest.raises(ValueError):
+        scoring.rank_catalog(np.zeros(1, dtype=np.float32), [], "beginner", k=1, method="nope")
@@ -0,0 +1,55 @@
+"""
+Skill taxonomy: aliases and typos map onto canonical skills; unknown or short names stay as they are.
+
+  cd backend && python -m pytest -q tests
+"""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import skills, store  # noqa: E402
+from app.skills import SkillIndex  # noqa: E402
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    store.load_data()
+
+
+@pytest.mark.parametrize("name,cid", [
+    ("JS", "javascript"), ("k8s", "kubernetes"), ("Node.js", "nodejs"), ("React JS", "react"),
+    ("Machine Learning", "ml"), ("sklearn", "scikitlearn"), ("golang", "go"),
+])
+def test_aliases(name, cid):
+    assert skills.canonical(name) == cid
+
+
+@pytest.mark.parametrize("name,cid", [
+    ("pyhton", "python"),           # transposition
+    ("dockr", "docker"),            # deletion
+    ("kubernetess", "kubernetes"),  # insertion
+    ("javascirpt", "javascript"),
+    ("postgers", "postgresql"),     # a typo of an alias ("postgres")
+])
+def test_typos(name, cid):
+    assert skills.canonical(name) == cid
+
+
+@pytest.mark.parametrize("name", ["jss", "xyzzyq"])
+def test_short_or_unknown_names_are_kept(name):
+    assert skills.index().canonical(name) is None
+    assert skills.canonical(name) == name
+
+
+def test_typo_ties_go_to_the_more_used_skill():
+    idx = SkillIndex(["docker", "docker", "dockes"], {})
+    assert idx.canonical("dockex") == "docker"
+    assert SkillIndex(["docker", "dockes", "dockes"], {}).canonical("dockex") == "dockes"
+
+
+def test_alias_file_overrides_vocabulary():
+    idx = SkillIndex(["golang", "go"], {"go": ["golang"]})
+    assert idx.canonical("golang") == "go"
+    assert idx.label("go") == "go"
@@ -0,0 +1,63 @@
+"""
+Tenant catalogs: each request sees its own tenant's data; the LRU evicts
+over budget and brings tenants back from their snapshot, indexes included.
+
+  cd backend && python -m pytest -q tests
+"""
+import json, os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import store, tenants  # noqa: E402
+
+
+@pytest.fixture
+def tenant_dirs(tmp_path):
+    with open(os.path.join(store.DATA_DIR, "courses.json"), encoding="utf-8") as f:
+        courses = json.load(f)
+    with open(os.path.join(store.DATA_DIR, "jds.json"), encoding="utf-8") as f:
+        jds = json.load(f)
+    for name, picked in (("acme", courses[:5]), ("globex", courses[5:8])):
+        os.makedirs(tmp_path / name)
+        (tmp_path / name / "courses.json").write_text(json.dumps(picked), encoding="utf-8")
+        (tmp_path / name / "jds.json").write_text(json.dumps(jds[:2]), encoding="utf-8")
+    saved = tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR
+    tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = str(tmp_path), str(tmp_path / "snapshots")
+    yield courses
+    tenants.TENANTS_DIR, tenants.TENANT_SNAPSHOT_DIR = saved
+
+
+def test_requests_see_their_own_tenant(tenant_dirs):
+    registry = tenants.TenantRegistry(budget_mb=64)
+    acme, globex = registry.get("acme"), registry.get("globex")
+    with tenants.use(acme):
+        assert list(store.COURSE_POS) == [c["course_id"] for c in tenant_dirs[:5]]
+        cid = tenant_dirs[0]["course_id"]
+        assert store.get_course(cid) is not None
+        with tenants.use(globex):
+            assert store.get_course(cid) is None
+            assert len(store.COURSES) == 3
+        assert store.catalog() is acme
+    assert acme.version != globex.version
+    with pytest.raises(tenants.UnknownTenant):
+        registry.get("../etc")
+
+
+def test_lru_evicts_and_restores_from_snapshot(tenant_dirs):
+    registry = tenants.TenantRegistry(budget_mb=0)      # only the tenant in use stays resident
+    acme = registry.get("acme")
+    registry.attach(acme, "probe", {"built": "while resident"})
+    registry.get("globex")
+    assert "acme" not in registry.resident()
+    assert registry.metrics()["evictions"] == 1
+    tenants._writer.submit(lambda: None).result()       # the evicted snapshot is written in the background
+
+    again = registry.get("acme")
+    assert again is not acme
+    assert registry.metrics()["loads_snapshot"] == 1
+    assert again.version == acme.version
+    assert [c.course_id for c in again.courses] == [c.course_id for c in acme.courses]
+    assert again.index("probe") == {"built": "while resident"}     # kept by the eviction snapshot
+    assert "globex" not in registry.resident()
@@ -1,5 +1,5 @@
 import { useState } from 'react'
-import { advise } from './api'
+import { advise, adviseDelta, fetchCourses } from './api'
 import PlanCard from './components/PlanCard'
 import GapMap from './components/GapMap'
 import PieTimeline from './components/PieTimeline'
@@ -9,13 +9,14 @@ export default function App(){
   const [level, setLevel] = useState('')
   const [goal, setGoal] = useState('')
   const [resp, setResp] = useState(null)
+  const [last, setLast] = useState(null)     // profile behind resp, for skill-only edits
+  const [courses, setCourses] = useState({})
   const [loading, setLoading] = useState(false)
   const [err, setErr] = useState('')
 
   const onSubmit = async (e)=>{
     e.preventDefault()
     setErr('')
-    setResp(null)
 
     if(!goal.trim() || !level){
       setErr('Please choose a level and enter a target role.')
@@ -27,12 +28,48 @@ export default function App(){
       level,
       goal_role: goal.trim()
     }
+    const token = resp?.result_token
+    const prev = last
+    setResp(null)
+    setCourses({})
+
+    const loadCourses = (plan)=>{
+      fetchCourses((plan || []).map(p => p.course_id))
+        .then(found => setCourses(prev => ({ ...prev, ...found })))
+        .catch(()=>{})
+    }
+
+    // show the gap map and a provisional plan while the reranker finishes
+    const onProgress = (event, data)=>{
+      if(event === 'gaps'){
+        setResp(prev => ({ ...(prev || {}), gap_map: data.gap_map }))
+      }else if(event === 'provisional'){
+        setResp(prev => ({ ...(prev || {}), ...data, provisional: true }))
+        loadCourses(data.plan)
+      }
+    }
+
+    // only skills changed: let the server patch the previous result
+    const skillDelta = ()=>{
+      if(!token || !prev || prev.level !== profile.level || prev.goal_role !== profile.goal_role) return null
+      const had = new Set(prev.skills.map(s => s.toLowerCase()))
+      const has = new Set(profile.skills.map(s => s.toLowerCase()))
+      return {
+        add: profile.skills.filter(s => !had.has(s.toLowerCase())),
+        remove: prev.skills.filter(s => !has.has(s.toLowerCase()))
+      }
+    }
 
     setLoading(true)
     try{
-      const data = await advise(profile)
+      const delta = skillDelta()
+      const data = (delta && await adviseDelta(token, delta.add, delta.remove))
+        || await advise(profile, onProgress)
       setResp(data)
+      setLast(profile)
+      loadCourses(data.plan)
     }catch(ex){
+      setResp(null)
       setErr(ex.message || 'Something went wrong.')
     }finally{
       setLoading(false)
@@ -44,6 +81,7 @@ export default function App(){
       const payload = {
         ...profile,
         prefs: {
+          ...(profile.prefs || {}),
           notes: resp?.notes || "",
         }
       }
@@ -73,6 +111,8 @@ export default function App(){
     setLevel('')
     setGoal('')
     setResp(null)
+    setLast(null)
+    setCourses({})
     setErr('')
   }
 
@@ -131,7 +171,9 @@ export default function App(){
         {loading && (
           <div className="loader-wrap">
             <div className="loader" />
-            <div className="loader-text">Assembling your plan…</div>
+            <div className="loader-text">
+              {resp?.provisional ? 'Refining your plan…' : 'Assembling your plan…'}
+            </div>
           </div>
         )}
 
@@ -141,7 +183,7 @@ export default function App(){
               <h2 className="section-title">Recommended Learning Path</h2>
               <div className="grid">
                 {(resp.plan || []).map((item, idx)=>(
-                  <PlanCard key={idx} item={item} />
+                  <PlanCard key={idx} item={item} course={courses[item.course_id]} />
                 ))}
               </div>
             </section>
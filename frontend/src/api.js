@@ -1,4 +1,4 @@
-export async function advise(profile){
+async function postAdvise(profile){
   const res = await fetch('/api/advise', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
@@ -11,8 +11,81 @@ export async function advise(profile){
   return res.json()
 }
 
+// Streams /api/advise/stream (NDJSON). onProgress(event, data) sees 'gaps',
+// 'provisional', 'plan' and 'usage' as they arrive; resolves to the same
+// object /api/advise returns.
+export async function advise(profile, onProgress){
+  if(typeof ReadableStream === 'undefined' || typeof TextDecoder === 'undefined'){
+    return postAdvise(profile)
+  }
+  const res = await fetch('/api/advise/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+    body: JSON.stringify(profile)
+  })
+  if(!res.ok){
+    const text = await res.text().catch(()=> '')
+    throw new Error(text || 'Failed to get advice')
+  }
+
+  const out = {}
+  const handle = (line)=>{
+    if(!line.trim()) return
+    const { event, data } = JSON.parse(line)
+    if(event === 'error') throw new Error(data.detail || 'Failed to get advice')
+    if(event === 'gaps') out.gap_map = data.gap_map
+    if(event === 'plan' || event === 'usage') Object.assign(out, data)
+    if(onProgress) onProgress(event, data)
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buf = ''
+  for(;;){
+    const { value, done } = await reader.read()
+    if(done) break
+    buf += decoder.decode(value, { stream: true })
+    let nl
+    while((nl = buf.indexOf('\n')) >= 0){
+      handle(buf.slice(0, nl))
+      buf = buf.slice(nl + 1)
+    }
+  }
+  handle(buf + decoder.decode())
+  if(!out.plan) throw new Error('Incomplete response from server')
+  return out
+}
+
+// Re-advise after a skill edit: the result of an earlier advise() (its
+// result_token) plus the skills added / removed. Resolves to null when the
+// server no longer knows the token, so the caller can fall back to advise().
+export async function adviseDelta(resultToken, add, remove){
+  const res = await fetch('/api/advise/delta', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ result_token: resultToken, add, remove })
+  })
+  if(res.status === 410) return null
+  if(!res.ok){
+    const text = await res.text().catch(()=> '')
+    throw new Error(text || 'Failed to get advice')
+  }
+  return res.json()
+}
+
 export async function fetchCourse(id){
   const res = await fetch(`/api/courses/${encodeURIComponent(id)}`)
   if(!res.ok) throw new Error('Course not found')
   return res.json()
 }
+
+// One round trip for every course in a plan: { [course_id]: course }
+export async function fetchCourses(ids){
+  const unique = [...new Set(ids || [])]
+  if(!unique.length) return {}
+  const qs = encodeURIComponent(unique.join(','))
+  const res = await fetch(`/api/courses?ids=${qs}`)
+  if(!res.ok) throw new Error('Failed to load courses')
+  const data = await res.json()
+  return Object.fromEntries((data.courses || []).map(c => [c.course_id, c]))
+}
@@ -1,17 +1,8 @@
-import { useEffect, useState } from 'react'
-import { fetchCourse } from '../api'
 import Citations from './Citations'
 
-export default function PlanCard({ item }){
-  const [c, setC] = useState(null)
-
-  useEffect(()=>{
-    let active = true
-    fetchCourse(item.course_id).then(data=>{
-      if(active) setC(data)
-    }).catch(()=>{})
-    return ()=>{ active = false }
-  }, [item.course_id])
+// `course` comes from a single bulk fetch in App (see fetchCourses)
+export default function PlanCard({ item, course }){
+  const c = course || null
 
   return (
     <div className="card">
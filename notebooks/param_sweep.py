@@ -0,0 +1,201 @@
+"""
+Offline retrieval parameter sweep: quality vs latency.
+
+Runs advisor.advise in-process for every point of a parameter grid over the
+eval personas plus synthetic profiles from every JD, scores each setting with
+the eval_runner metrics (coverage, diversity) and per-stage latency, and
+writes all settings plus the Pareto front (max coverage, max diversity,
+min p95 latency).
+
+  python notebooks/param_sweep.py --k 10,20,40 --w-bm25 0.3,0.5,0.7 --rerank-k 5,10
+  python notebooks/param_sweep.py --fusion weighted,rrf    # compare fusion methods
+  python notebooks/param_sweep.py --min-coverage 75     # also print the cheapest setting meeting the bar
+"""
+import os, sys, json, csv, math, time, random, argparse, itertools
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "notebooks"))
+
+from eval_runner import PERSONAS, coverage_pct, diversity, p95  # noqa: E402
+
+OUT_DIR = ROOT / "notebooks"
+CSV_PATH = OUT_DIR / "sweep.csv"
+JSON_PATH = OUT_DIR / "sweep_pareto.json"
+STAGES = ("bm25", "vector", "fuse", "rerank", "plan")
+LEVELS = ("beginner", "intermediate", "advanced")
+
+
+def _floats(s: str) -> List[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+@dataclass
+class SweepResult:
+    params: Dict[str, Any]
+    coverage_pct: float
+    diversity: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    stage_p95_ms: Dict[str, float]
+    degraded_rate: float
+    profiles: int
+    pareto: bool = False
+
+
+def synthetic_profiles(jds, per_role: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Per JD and level: no JD skills, then `per_role - 1` random partial subsets."""
+    rnd = random.Random(seed)
+    out = []
+    for jd in jds:
+        skills = [x.skill for x in jd.skills_required or []]
+        for level in LEVELS:
+            held = [[]]
+            for _ in range(max(0, per_role - 1)):
+                held.append(rnd.sample(skills, rnd.randint(1, max(1, len(skills) - 1))) if skills else [])
+            for h in held:
+                out.append({"skills": h, "level": level, "goal_role": jd.role})
+    return out
+
+
+def grid(args) -> List[Dict[str, Any]]:
+    pts = []
+    fusions = [f.strip() for f in args.fusion.split(",") if f.strip()]
+    for k, wb, rk, step, cap, fusion in itertools.product(
+            _ints(args.k), _floats(args.w_bm25), _ints(args.rerank_k),
+            _floats(args.level_step), _floats(args.level_cap), fusions):
+        for wv in (_floats(args.w_vec) if args.w_vec else [round(1.0 - wb, 4)]):
+            if rk > k:
+                continue      # rerank depth beyond the candidate pool is the same setting
+            pts.append({"k": k, "w_bm25": wb, "w_vec": wv, "rerank_k": rk,
+                        "level_step": step, "level_cap": cap, "fusion": fusion})
+    return pts
+
+
+def run_setting(advise, params: Dict[str, Any], profiles: List[Dict[str, Any]],
+                repeats: int, deadline_ms: Optional[float]) -> SweepResult:
+    covs, divs, lat = [], [], []
+    stages: Dict[str, List[float]] = {s: [] for s in STAGES}
+    degraded = 0
+    runs = 0
+    for prof in profiles:
+        out = None
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            out = advise(prof["skills"], prof["level"], prof["goal_role"],
+                         deadline_ms=deadline_ms, params=params)
+            lat.append((time.perf_counter() - t0) * 1000)
+            usage = out.get("usage", {})
+            for s in STAGES:
+                if s in usage.get("stages_ms", {}):
+                    stages[s].append(float(usage["stages_ms"][s]))
+            degraded += bool(usage.get("degraded"))
+            runs += 1
+        ids = [p["course_id"] for p in out["plan"]]
+        c = coverage_pct(ids, prof["goal_role"]) if ids else float("nan")
+        if not math.isnan(c):
+            covs.append(c)
+        if ids:
+            divs.append(diversity(ids))
+    s_lat = sorted(lat)
+    return SweepResult(
+        params=params,
+        coverage_pct=round(sum(covs) / len(covs), 2) if covs else float("nan"),
+        diversity=round(sum(divs) / len(divs), 3) if divs else float("nan"),
+        latency_p50_ms=round(s_lat[len(s_lat) // 2], 1) if s_lat else float("inf"),
+        latency_p95_ms=round(p95(lat), 1),
+        stage_p95_ms={s: round(p95(v), 1) for s, v in stages.items() if v},
+        degraded_rate=round(degraded / max(1, runs), 4),
+        profiles=len(profiles),
+    )
+
+
+def _dominates(a: SweepResult, b: SweepResult) -> bool:
+    ge = (a.coverage_pct >= b.coverage_pct and a.diversity >= b.diversity
+          and a.latency_p95_ms <= b.latency_p95_ms)
+    gt = (a.coverage_pct > b.coverage_pct or a.diversity > b.diversity
+          or a.latency_p95_ms < b.latency_p95_ms)
+    return ge and gt
+
+
+def mark_pareto(results: List[SweepResult]) -> List[SweepResult]:
+    valid = [r for r in results if not (math.isnan(r.coverage_pct) or math.isnan(r.diversity))]
+    for r in valid:
+        r.pareto = not any(_dominates(o, r) for o in valid if o is not r)
+    return sorted([r for r in valid if r.pareto], key=lambda r: r.latency_p95_ms)
+
+
+def write_outputs(results: List[SweepResult], front: List[SweepResult]) -> None:
+    keys = list(results[0].params) if results else []
+    with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(keys + ["coverage_pct", "diversity", "latency_p50_ms", "latency_p95_ms"]
+                   + [f"{s}_p95_ms" for s in STAGES] + ["degraded_rate", "pareto"])
+        for r in results:
+            w.writerow([r.params[k_] for k_ in keys]
+                       + [r.coverage_pct, r.diversity, r.latency_p50_ms, r.latency_p95_ms]
+                       + [r.stage_p95_ms.get(s, "") for s in STAGES]
+                       + [r.degraded_rate, int(r.pareto)])
+    with open(JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump({"front": [asdict(r) for r in front], "settings": len(results)}, f, indent=2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--k", default="10,20,40")
+    ap.add_argument("--w-bm25", default="0.3,0.5,0.7")
+    ap.add_argument("--w-vec", default="", help="default: 1 - w_bm25")
+    ap.add_argument("--rerank-k", default="5,10,20")
+    ap.add_argument("--level-step", default="0.15,0.25,0.35")
+    ap.add_argument("--level-cap", default="0.6")
+    ap.add_argument("--fusion", default="weighted", help="comma list of fusion methods: weighted, rrf")
+    ap.add_argument("--per-role", type=int, default=3, help="synthetic profiles per JD and level")
+    ap.add_argument("--repeats", type=int, default=int(os.getenv("EVAL_REPEATS", "3")))
+    ap.add_argument("--deadline-ms", type=float, default=None, help="default: ADVISE_DEADLINE_MS")
+    ap.add_argument("--min-coverage", type=float, default=None)
+    args = ap.parse_args()
+
+    from app import store
+    from app.advisor import advise
+    store.load_data()
+
+    profiles = [p["profile"] for p in PERSONAS] + synthetic_profiles(store.JDS, args.per_role)
+    points = grid(args)
+    print(f"[sweep] {len(points)} settings x {len(profiles)} profiles x {args.repeats} repeats")
+
+    # warm models / indexes so the first setting is not charged for loading
+    advise(profiles[0]["skills"], profiles[0]["level"], profiles[0]["goal_role"], deadline_ms=60000)
+
+    results: List[SweepResult] = []
+    for n, params in enumerate(points, 1):
+        r = run_setting(advise, params, profiles, args.repeats, args.deadline_ms)
+        results.append(r)
+        print(f"[{n}/{len(points)}] {params} cov={r.coverage_pct} div={r.diversity} "
+              f"p95={r.latency_p95_ms}ms degraded={r.degraded_rate}")
+
+    front = mark_pareto(results)
+    write_outputs(results, front)
+
+    print("\n================= PARETO FRONT =================")
+    for r in front:
+        print(f"p95 {r.latency_p95_ms:>7.1f} ms  cov {r.coverage_pct:>5.1f}%  div {r.diversity:.2f}  {r.params}")
+    if args.min_coverage is not None:
+        ok = [r for r in front if r.coverage_pct >= args.min_coverage]
+        if ok:
+            print(f"\ncheapest setting with coverage >= {args.min_coverage:.0f}%: {ok[0].params} "
+                  f"(p95 {ok[0].latency_p95_ms} ms)")
+        else:
+            print(f"\nno setting reaches coverage >= {args.min_coverage:.0f}%")
+    print(f"\n[done] all settings: {CSV_PATH}")
+    print(f"[done] Pareto front : {JSON_PATH}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())